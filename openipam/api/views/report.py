@@ -11,42 +11,28 @@ from rest_framework.decorators import api_view, renderer_classes, permission_cla
 
 from rest_framework_csv.renderers import CSVRenderer
 
-from django.db.models.aggregates import Count
 from django.http import HttpResponse
-from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import get_user_model
-from django.apps import apps
-from django.db.models import Q, F
-from django.utils import timezone
+from django.db.models import F
 
+from openipam.hosts.export import iter_server_hosts, streaming_csv_response
 from openipam.hosts.models import Host
-from openipam.report.models import Ports
-from openipam.report.models import database_connect, database_close
-from openipam.network.models import Network, Lease, Address
-from openipam.dns.models import DnsRecord
 from openipam.conf.ipam_settings import CONFIG, CONFIG_DEFAULTS
 from openipam.conf.settings import get_buildingmap_data
+from openipam.report.dashboard import get_dashboard_stats
+from openipam.report.lease_usage import group_lease_usage, lease_usage
+from openipam.report.stats import allowed_stats_model, cached_period_counts
+from openipam.report.weathermap import buildingmap, weathermap
 
-from functools import reduce
-
-from guardian.models import UserObjectPermission, GroupObjectPermission
 
 import copy
 
-import qsstats
-
-import operator
-
-from netaddr import IPNetwork
+from netaddr import AddrFormatError, IPNetwork
 
 import requests
 
-import itertools
-
 from tempfile import TemporaryFile
 
-from datetime import datetime, timedelta
-
 from collections import OrderedDict
 
 User = get_user_model()
@@ -60,104 +46,39 @@ class LeaseUsageView(APIView):
         network_blocks = request.GET.get("network_blocks")
         network_tags = request.GET.get("network_tags")
         by_router = request.GET.get("by_router")
+        group_by = request.GET.get("group_by")
         exclude_free = request.GET.get("exclude_free")
 
-        if network_blocks:
-            show_blocks = "&".join(
-                ["show_blocks=%s" % n for n in network_blocks.split(",")]
-            )
-            url = "https://gul.usu.edu/subnetparser.py?format=json&%s" % show_blocks
-            lease_data = requests.get(
-                url, auth=("django-openipam", "ZEraWDJ1aSLsYmzvqhUT2ZL4z2xpA9Yt")
-            )
-        elif network_tags:
-            network_tags = network_tags.split(",")
-            networks = Network.objects.filter(dhcp_group__name__in=network_tags)
-            show_blocks = "&".join(
-                ["show_blocks=%s" % str(n.network) for n in networks]
-            )
-            url = "https://gul.usu.edu/subnetparser.py?format=json&%s" % show_blocks
-            lease_data = requests.get(
-                url, auth=("django-openipam", "ZEraWDJ1aSLsYmzvqhUT2ZL4z2xpA9Yt")
+        try:
+            network_blocks = (
+                [str(IPNetwork(block)) for block in network_blocks.split(",")]
+                if network_blocks
+                else None
             )
-        else:
-            lease_data = requests.get(
-                "https://gul.usu.edu/subnetparser.py?format=json",
-                auth=("django-openipam", "ZEraWDJ1aSLsYmzvqhUT2ZL4z2xpA9Yt"),
+        except (AddrFormatError, ValueError):
+            return HttpResponse(
+                "Invalid network block.", status=status.HTTP_400_BAD_REQUEST
             )
-
-        try:
-            lease_data = lease_data.json()
-        except ValueError:
+        network_tags = network_tags.split(",") if network_tags else None
+        if by_router:
+            group_by = "router"
+        if group_by not in (None, "router", "tag", "block"):
             return HttpResponse(
-                "Error parsing JSON from GUL",
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "group_by must be one of router, tag or block.",
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        for ld in lease_data:
-            if ld["router"] is None:
-                ld["router"] = ""
-        lease_data = sorted(
-            lease_data, key=lambda k: (k["router"], IPNetwork(k["network"]))
+        lease_data = lease_usage(
+            network_blocks=network_blocks, network_tags=network_tags
         )
 
-        def get_ratio(available, total):
-            ratio = 1
-            if total != 0:
-                ratio = available * 1.0 / total
-            else:
-                ratio = None
-            return ratio
-
-        def color(ratio):
-            # Convert a number in the range [0,1] to an HTML color code
-            if ratio is None:
-                return "#77f"
-            if ratio < 0:
-                ratio = 0
-            if ratio > 1:
-                ratio = 1
-
-            r = ratio * 2.0 - 1
-            g = ratio * 2.0
-
-            if r < 0.0:
-                r = 0.0
-            if g > 1.0:
-                g = 1.0
-
-            rgb = (int((1 - r) * 255), int(g * 255), 0)
-            color = "#%02x%02x%02x" % rgb
-            return color
-
-        if not by_router:
+        if not group_by:
             for item in lease_data:
                 network = IPNetwork(item["network"])
-                child = item
-
-                if "usage" in item:
-                    child["ratio"] = get_ratio(
-                        item["usage"]["available"], item["usage"]["dynamic"]
-                    )
-                    child["utilized"] = (
-                        int((1 - child["ratio"]) * 100)
-                        if child["ratio"] is not None
-                        else 0
-                    )
-                else:
-                    child["ratio"] = 1
-                    child["utilized"] = 0
-
-                if "ratio" in item:
-                    child["style"] = color(child["ratio"])
-                else:
-                    child["style"] = "#77f"
-
-                child["size"] = network.size
                 if network.prefixlen >= 28:
-                    child["size_width"] = 50
+                    item["size_width"] = 50
                 else:
-                    child["size_width"] = (32 - 4 - network.prefixlen) ** 1.5 * 20 + 50
+                    item["size_width"] = (32 - 4 - network.prefixlen) ** 1.5 * 20 + 50
 
             lease_data = sorted(
                 lease_data,
@@ -174,46 +95,13 @@ class LeaseUsageView(APIView):
                     template_name="api/web/lease_usage.html",
                 )
 
-        grouped_lease_data = {"name": "routers", "children": [], "style": "#000033"}
-
-        for key, group in itertools.groupby(lease_data, lambda item: item["router"]):
-            if exclude_free and key is None:
-                continue
-
-            router = {
-                "name": key.replace(".gw.usu.edu", "") if key is not None else "FREE",
-                "children": [],
-            }
-
-            for item in group:
-                network = IPNetwork(item["network"])
-                child = item
-
-                if "usage" in item:
-                    child["ratio"] = get_ratio(
-                        item["usage"]["available"], item["usage"]["dynamic"]
-                    )
-                else:
-                    child["ratio"] = 1
-
-                # if key is not None:
-                if "ratio" in item:
-                    child["style"] = color(child["ratio"])
-                else:
-                    child["style"] = "#77f"
-
-                child["name"] = item["network"]
-                child["desc"] = item["portdesc"]
-                child["size"] = network.size
-                child["value"] = network.size if network.size > 256 else 256
-                del child["router"]
-
-                router["children"].append(child)
-
-            grouped_lease_data["children"].append(router)
-
         return Response(
-            grouped_lease_data,
+            group_lease_usage(
+                lease_data,
+                group_by,
+                network_blocks=network_blocks,
+                exclude_free=exclude_free,
+            ),
             status=status.HTTP_200_OK,
             template_name="api/web/lease_usage.html",
         )
@@ -264,51 +152,10 @@ class WeatherMapView(APIView):
     renderer_classes = (BrowsableAPIRenderer, JSONRenderer)
 
     def get(self, request, format=None, **kwargs):
-        # see http://peewee.readthedocs.org/en/latest/peewee/database.html#error-2006-mysql-server-has-gone-away
-        database_connect()
-
-        result = False
-
-        try:
-            result = self._get(request, format, **kwargs)
-        finally:
-            database_close()
-
-        return result
-
-    def _get(self, request, format=None, **kwargs):
         if request.query_params.get("buildings", False):
-            data = OrderedDict(copy.deepcopy(get_buildingmap_data().get("data")))
+            data = buildingmap.snapshot()
         else:
-            data = OrderedDict(copy.deepcopy(CONFIG.get("WEATHERMAP_DATA").get("data")))
-
-        all_ports = []
-        for k, v in list(data.items()):
-            all_ports.extend(v["id"])
-
-        ports = Ports.select(Ports).where(Ports.port << all_ports)
-
-        for port in ports:
-            for key, value in list(data.items()):
-                for portid in value["id"]:
-                    if port.port == portid:
-                        value["A"] = value.get("A", 0)
-                        value["Z"] = value.get("Z", 0)
-                        if port.ifoutoctets_rate:
-                            value["A"] += port.ifoutoctets_rate * 8
-                        if port.ifinoctets_rate:
-                            value["Z"] += port.ifinoctets_rate * 8
-                        value["speed"] = (
-                            value.get("speed", 0) + port.ifspeed if port.ifspeed else 0
-                        )
-                        value["timestamp"] = port.poll_time
-                        value["poll_frequency"] = 300
-                        value["isUp"] = bool(port.ifoperstatus == "up")
-
-        for key, value in list(data.items()):
-            del value["id"]
-
-        data["timestamp"] = int(datetime.now().strftime("%s"))
+            data = weathermap.snapshot()
 
         return Response(data, status=status.HTTP_200_OK)
 
@@ -322,12 +169,20 @@ class StatsAPIView(APIView):
         model = request.GET.get("model")
         column = request.GET.get("column")
 
-        model_klass = apps.get_model(app_label=app, model_name=model)
-        queryset = model_klass.objects.all()
-        qs_stats = qsstats.QuerySetStats(queryset, column, aggregate=Count("pk"))
+        model_klass = allowed_stats_model(app, model, column)
+        if model_klass is None:
+            return HttpResponse(
+                "Stats are not available for that model and column.",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        counts = cached_period_counts(
+            "%s.%s" % (model_klass._meta.label_lower, column),
+            model_klass.objects.all(),
+            column,
+        )
 
         xdata = ["Today", "This Week", "This Month"]
-        ydata = [qs_stats.this_day(), qs_stats.this_week(), qs_stats.this_month()]
+        ydata = [counts["day"], counts["week"], counts["month"]]
 
         extra_serie1 = {
             "tooltip": {
@@ -358,64 +213,30 @@ class DashboardAPIView(APIView):
     renderer_classes = (BrowsableAPIRenderer, JSONRenderer)
 
     def get(self, request, format=None, **kwargs):
-        wireless_networks = Network.objects.filter(
-            dhcp_group__name__in=["aruba_wireless", "aruba_wireless_eastern"]
-        )
-        wireless_networks_available_qs = [
-            Q(address__net_contained=network.network) for network in wireless_networks
-        ]
-
+        dashboard = get_dashboard_stats()
+        stats = dashboard["stats"]
         data = (
-            (
-                "Static Hosts",
-                "%s"
-                % Host.objects.filter(
-                    addresses__isnull=False, expires__gte=timezone.now()
-                ).count(),
-            ),
-            (
-                "Dynamic Hosts",
-                "%s"
-                % Host.objects.filter(
-                    pools__isnull=False, expires__gte=timezone.now()
-                ).count(),
-            ),
-            (
-                "Active Leases",
-                "%s" % Lease.objects.filter(ends__gte=timezone.now()).count(),
-            ),
-            ("Abandoned Leases", "%s" % Lease.objects.filter(abandoned=True).count()),
+            ("Static Hosts", "%s" % stats["static_hosts"]),
+            ("Dynamic Hosts", "%s" % stats["dynamic_hosts"]),
+            ("Active Leases", "%s" % stats["active_leases"]),
+            ("Abandoned Leases", "%s" % stats["abandoned_leases"]),
             (
                 "Networks: (Total / Wireless)",
-                "%s / %s" % (Network.objects.all().count(), wireless_networks.count()),
-            ),
-            (
-                "Available Wireless Addresses",
-                Address.objects.filter(
-                    reduce(operator.or_, wireless_networks_available_qs),
-                    leases__ends__lt=timezone.now(),
-                ).count(),
-            ),
-            (
-                "DNS A Records",
-                DnsRecord.objects.filter(dns_type__name__in=["A", "AAAA"]).count(),
-            ),
-            (
-                "DNS CNAME Records",
-                DnsRecord.objects.filter(dns_type__name="CNAME").count(),
-            ),
-            ("DNS MX Records", DnsRecord.objects.filter(dns_type__name="MX").count()),
-            (
-                "Active Users Within 1 Year",
-                User.objects.filter(
-                    last_login__gte=(timezone.now() - timedelta(days=365))
-                ).count(),
+                "%s / %s" % (stats["networks"], stats["wireless_networks"]),
             ),
+            ("Available Wireless Addresses", stats["available_wireless_addresses"]),
+            ("DNS A Records", stats["dns_a_records"]),
+            ("DNS CNAME Records", stats["dns_cname_records"]),
+            ("DNS MX Records", stats["dns_mx_records"]),
+            ("Active Users Within 1 Year", stats["active_users_within_1_year"]),
         )
 
         data = OrderedDict(data)
 
-        return Response(data, status=status.HTTP_200_OK)
+        response = Response(data, status=status.HTTP_200_OK)
+        response["X-Stats-Age"] = dashboard["age"]
+        response["X-Stats-Compute-Time"] = dashboard["compute_time"]
+        return response
 
 
 class ServerHostCSVRenderer(CSVRenderer):
@@ -434,57 +255,24 @@ class ServerHostView(APIView):
     renderer_classes = (BrowsableAPIRenderer, JSONRenderer, ServerHostCSVRenderer)
 
     def get(self, request, format=None, **kwargs):
-        hosts = (
-            Host.objects.prefetch_related("addresses")
-            .filter(
-                structured_attributes__structured_attribute_value__attribute__name="nac-profile",
-                structured_attributes__structured_attribute_value__value__startswith=CONFIG_DEFAULTS[
-                    "NAC_PROFILE_IS_SERVER_PREFIX"
-                ],
-            )
-            .annotate(
-                nac_profile=F(
-                    "structured_attributes__structured_attribute_value__value"
-                ),
-            )
-        )
-
-        user_perms_prefetch = UserObjectPermission.objects.select_related(
-            "permission", "user"
-        ).filter(
-            content_type=ContentType.objects.get_for_model(Host),
-            object_pk__in=[str(host.mac) for host in hosts],
-            permission__codename="is_owner_host",
-        )
-        group_perms_prefetch = GroupObjectPermission.objects.select_related(
-            "permission", "group"
-        ).filter(
-            content_type=ContentType.objects.get_for_model(Host),
-            object_pk__in=[str(host.mac) for host in hosts],
-            permission__codename="is_owner_host",
+        hosts = Host.objects.filter(
+            structured_attributes__structured_attribute_value__attribute__name="nac-profile",
+            structured_attributes__structured_attribute_value__value__startswith=CONFIG_DEFAULTS[
+                "NAC_PROFILE_IS_SERVER_PREFIX"
+            ],
+        ).annotate(
+            nac_profile=F("structured_attributes__structured_attribute_value__value"),
         )
 
-        data = []
-        for host in hosts:
-            owners = host.get_owners(
-                name_only=True,
-                user_perms_prefetch=user_perms_prefetch,
-                group_perms_prefetch=group_perms_prefetch,
-            )
-            data.append(
-                {
-                    "hostname": host.hostname,
-                    "mac": str(host.mac),
-                    "description": host.description,
-                    "master_ip_address": host.ip_addresses[0]
-                    if host.ip_addresses
-                    else None,
-                    "user_owners": ", ".join(owners[0]),
-                    "group_owners": ", ".join(owners[1]),
-                    "nac_profile": host.nac_profile,
-                }
+        if request.accepted_renderer.format == "csv":
+            return streaming_csv_response(
+                request.accepted_renderer.header,
+                iter_server_hosts(hosts),
+                "server-hosts.csv",
             )
 
+        data = list(iter_server_hosts(hosts))
+
         if request.accepted_renderer.format == "json":
             return Response({"data": data}, status=status.HTTP_200_OK)
         else:
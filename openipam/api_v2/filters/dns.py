@@ -2,6 +2,7 @@
 
 from django.db.models import Q
 from rest_framework import filters
+from openipam.core.search import matching_keys
 from openipam.dns.models import DhcpDnsRecord, DnsType, Domain, DnsRecord
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
@@ -39,10 +40,15 @@ class DnsFilter(FilterSet):
         """Filter based on content."""
         if value:
             try:
-                queryset = queryset.filter(
-                    Q(ip_content__address__istartswith=value)
-                    | Q(text_content__icontains=value)
-                ).distinct()
+                # The search documents' trigram index narrows the scan to likely records.
+                queryset = (
+                    queryset.filter(pk__in=matching_keys("dns", value))
+                    .filter(
+                        Q(ip_content__address__istartswith=value)
+                        | Q(text_content__icontains=value)
+                    )
+                    .distinct()
+                )
             except ValidationError:
                 queryset = queryset.none()
         return queryset
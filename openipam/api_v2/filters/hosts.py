@@ -1,12 +1,13 @@
 """Filters for hosts."""
 from django_filters import rest_framework as filters
-from openipam.hosts.models import Host, Disabled
+from openipam.core.search import matching_keys
+from openipam.hosts.models import Host, Disabled, OUI
 from netfields import NetManager  # noqa
 from guardian.shortcuts import get_objects_for_user, get_objects_for_group
 from openipam.user.models import User
 from django.contrib.auth.models import Group
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from ipaddress import ip_interface
 from openipam.network.models import Lease
 from rest_framework import filters as rest_filters
@@ -67,7 +68,8 @@ class HostFilter(filters.FilterSet):
     def filter_disabled(self, queryset, name, value):
         """Filter based on disabled."""
         # No foreign-key relationship to the disabled field (since unregistered MACs can be
-        # disabled), so we have to do a subquery.
+        # disabled), so we have to do a subquery. The summary's flag is not read, since a
+        # host whose summary is not written yet would match neither value.
         if value:
             return queryset.filter(mac__in=Disabled.objects.values_list("mac", flat=True))
         else:
@@ -75,10 +77,10 @@ class HostFilter(filters.FilterSet):
 
     def filter_vendor(self, queryset, name, value):
         """Filter based on vendor."""
-        return queryset.extra(
-            where=["hosts.mac >= ouis.start AND hosts.mac <= ouis.stop AND ouis.shortname ILIKE %s"],
-            params=[f"%{value}%"],
-            tables=["ouis"],
+        # Hosts not summarized yet are matched against the ouis table directly.
+        oui_match = OUI.objects.filter(start__lte=OuterRef("mac"), stop__gte=OuterRef("mac"), shortname__icontains=value)
+        return queryset.annotate(vendor_match=Exists(oui_match)).filter(
+            Q(summary__vendor__icontains=value) | Q(summary__isnull=True, vendor_match=True)
         )
 
     def filter_expires__gt(self, queryset, name, value):
@@ -119,11 +121,12 @@ class HostFilter(filters.FilterSet):
             value = value[1:]
             qs = queryset.exclude(hostname__icontains=value)
             return qs
-        return queryset.filter(hostname__icontains=value)
+        # The search documents' trigram index narrows the scan to likely hosts.
+        return queryset.filter(mac__in=matching_keys("host", value), hostname__icontains=value)
 
     def filter_description(self, queryset, name, value):
         """Filter based on description."""
-        return queryset.filter(description__icontains=value)
+        return queryset.filter(mac__in=matching_keys("host", value), description__icontains=value)
 
     def filter_user(self, queryset, name, value):
         """Filter based on user."""
@@ -164,6 +167,13 @@ class HostFilter(filters.FilterSet):
         except ValueError:
             pass
         else:
+            if network.num_addresses == 1:
+                # A single address is matched against the host summary's indexed arrays.
+                address = str(network.network_address)
+                return queryset.filter(
+                    Q(summary__addresses__contains=[address])
+                    | Q(summary__leases__contains=[address])
+                )
             valid_leases = Lease.objects.filter(
                 starts__lte=timezone.now(),
                 ends__gte=timezone.now(),
@@ -5,8 +5,8 @@ from openipam.hosts.models import (
     StructuredAttributeToHost,
     FreeformAttributeToHost,
     GulRecentArpBymac,
-    OUI,
 )
+from openipam.hosts.oui_index import oui_index
 from rest_framework import serializers
 from openipam.network.models import Network, Pool, DhcpGroup, Address
 from openipam.dns.models import Domain
@@ -112,12 +112,19 @@ class HostSerializer(serializers.ModelSerializer):
     )
     address_type = serializers.CharField(source="address_type.name", read_only=True)
 
-    def get_vendor(self, obj):
-        oui = OUI.objects.filter(start__lt=obj.mac).filter(stop__gt=obj.mac)
-        if oui.exists():
-            return oui.first().shortname.split("\t")[-1]
-        else:
+    def _summary(self, obj):
+        # The host's summary row, if it has one that lists no ended lease.
+        summary = getattr(obj, "summary", None)
+        if summary is None or (
+            summary.leases_expire and summary.leases_expire <= timezone.now()
+        ):
             return None
+        return summary
+
+    def get_vendor(self, obj):
+        summary = self._summary(obj)
+        vendor = summary.vendor if summary is not None else oui_index.vendor(obj.mac)
+        return vendor.split("\t")[-1] if vendor else None
 
     def get_details(self, obj):
         """Get a link to the host details page."""
@@ -136,6 +143,12 @@ class HostSerializer(serializers.ModelSerializer):
 
     def get_addresses(self, obj):
         """Get addresses for host."""
+        summary = self._summary(obj)
+        if summary is not None:
+            return {
+                "leased": [str(address) for address in summary.leases],
+                "static": [str(address) for address in summary.addresses],
+            }
         return {
             "leased": [
                 str(lease.address)
@@ -149,16 +162,24 @@ class HostSerializer(serializers.ModelSerializer):
     def get_attributes(self, obj):
         """Get attributes for host."""
 
+        prefetched = getattr(obj, "_prefetched_objects_cache", {})
+
         # Get structured attributes
-        structured_attrs = StructuredAttributeToHost.objects.filter(
-            host=obj
-        ).select_related(
-            "structured_attribute_value__attribute",
-        )
+        if "structured_attributes" in prefetched:
+            structured_attrs = obj.structured_attributes.all()
+        else:
+            structured_attrs = StructuredAttributeToHost.objects.filter(
+                host=obj
+            ).select_related(
+                "structured_attribute_value__attribute",
+            )
         # Get freeform attributes
-        freeform_attrs = FreeformAttributeToHost.objects.filter(
-            host=obj
-        ).select_related("attribute")
+        if "freeform_attributes" in prefetched:
+            freeform_attrs = obj.freeform_attributes.all()
+        else:
+            freeform_attrs = FreeformAttributeToHost.objects.filter(
+                host=obj
+            ).select_related("attribute")
         # Assemble a dictionary of all attributes
         attributes = {}
         for attr in structured_attrs:
@@ -1,4 +1,5 @@
 from rest_framework import serializers as lib_serializers
+from openipam.core.models import SearchDocument
 from openipam.hosts.models import StructuredAttributeValue, Attribute
 
 
@@ -32,3 +33,13 @@ class AttributeSerializer(lib_serializers.ModelSerializer):
     class Meta:
         model = Attribute
         fields = "__all__"
+
+
+class SearchResultSerializer(lib_serializers.ModelSerializer):
+    type = lib_serializers.ReadOnlyField(source="object_type")
+    id = lib_serializers.ReadOnlyField(source="object_id")
+    rank = lib_serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SearchDocument
+        fields = ["type", "id", "title", "rank"]
@@ -16,6 +16,8 @@ from openipam.network.models import (
     SharedNetwork,
     NetworkRange,
     NetworkToVlan,
+    NetworkUtilization,
+    NetworkUtilizationHistory,
     Lease,
 )
 from rest_framework import serializers as base_serializers
@@ -449,3 +451,35 @@ class BuildingToVlanSerializer(ModelSerializer):
 
         model = BuildingToVlan
         fields = "__all__"
+
+
+UTILIZATION_FIELDS = [
+    "available",
+    "static",
+    "dynamic",
+    "leased",
+    "reserved",
+    "abandoned",
+    "expired",
+    "total",
+    "unleased",
+    "available_ratio",
+]
+
+
+class NetworkUtilizationHistorySerializer(ModelSerializer):
+    """Serializer for one bucket of a network's utilization history."""
+
+    class Meta:
+        model = NetworkUtilizationHistory
+        fields = ["bucket"] + UTILIZATION_FIELDS
+
+
+class NetworkUtilizationSerializer(ModelSerializer):
+    """Serializer for a network's utilization rollup."""
+
+    network = CharField(source="network_id", read_only=True)
+
+    class Meta:
+        model = NetworkUtilization
+        fields = ["network", "refreshed"] + UTILIZATION_FIELDS
@@ -0,0 +1,80 @@
+from django.contrib.admin.models import LogEntry, ADDITION
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from openipam.api_v2.filters.hosts import HostFilter
+from openipam.api_v2.views.base import LogsPagination
+from openipam.core.search import refresh_search_documents
+from openipam.hosts.models import Disabled, Host, HostSummary, OUI
+from openipam.user.models import User
+
+from datetime import timedelta
+
+
+class PaginationTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="admin")
+        now = timezone.now()
+        # Created out of time order, so id order and action_time order differ.
+        self.entries = [
+            LogEntry.objects.create(
+                user=user,
+                action_time=now - timedelta(hours=hours),
+                object_repr="entry %s" % hours,
+                action_flag=ADDITION,
+            )
+            for hours in [2, 0, 3, 1]
+        ]
+
+    def paginate(self, queryset, **params):
+        request = Request(APIRequestFactory().get("/logs/", params))
+        paginator = LogsPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator, [entry.object_repr for entry in page]
+
+    def test_cursor_keeps_non_keyset_ordering(self):
+        queryset = LogEntry.objects.order_by("-action_time")
+        paginator, page = self.paginate(queryset, cursor="", page_size=3)
+        self.assertEqual(page, ["entry 0", "entry 1", "entry 2"])
+        self.assertIsNone(paginator.keyset)
+
+    def test_cursor_pages_descending_keys(self):
+        queryset = LogEntry.objects.order_by("-pk")
+        paginator, page = self.paginate(queryset, cursor="", page_size=3)
+        self.assertEqual(page, ["entry 1", "entry 3", "entry 0"])
+        self.assertIsNotNone(paginator.keyset)
+        self.assertEqual(paginator.keyset.ordering, ("-pk",))
+
+
+class HostFilterTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="admin")
+        self.host = Host.objects.create(
+            changed_by=user,
+            hostname="unsummarized.valid",
+            mac="001122000001",
+            expires=timezone.now() + timedelta(days=1),
+        )
+        OUI.objects.create(start="001122000000", stop="001122ffffff", shortname="Acme")
+
+    def filter(self, **params):
+        return list(HostFilter(params, queryset=Host.objects.all()).qs)
+
+    def test_hosts_without_summary(self):
+        # The summary is written on commit, which this test never reaches.
+        self.assertFalse(HostSummary.objects.exists())
+        self.assertEqual(self.filter(disabled="false"), [self.host])
+        self.assertEqual(self.filter(disabled="true"), [])
+        self.assertEqual(self.filter(vendor="acme"), [self.host])
+        self.assertEqual(self.filter(vendor="other"), [])
+
+        Disabled.objects.create(mac=self.host.mac, changed_by=self.host.changed_by)
+        self.assertEqual(self.filter(disabled="true"), [self.host])
+
+    def test_hostname_through_search_documents(self):
+        refresh_search_documents("host", [self.host.mac])
+        self.assertEqual(self.filter(hostname="summarized"), [self.host])
+        self.assertEqual(self.filter(hostname="other"), [])
@@ -38,6 +38,7 @@ router.register(r"report/recent-stats", views.report.RecentStatsViewSet)
 urlpatterns = [
     path("", include(router.urls)),
     path("admin/stats/", misc.DashboardAPIView.as_view()),
+    path("search/", misc.SearchAPIView.as_view(), name="search"),
     path("groups/", views.users.GroupView.as_view()),
     path("login/", views.auth.login_request, name="login"),
     path("get_csrf/", views.auth.get_csrf_token, name="get_csrf"),
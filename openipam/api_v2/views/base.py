@@ -1,9 +1,80 @@
 """Base API views."""
 
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from django.db import connection
+from django.db.models.query import QuerySet
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
 
+def estimated_count(queryset):
+    """Estimate the row count of an unfiltered queryset from pg_class.reltuples.
+
+    Filtered querysets, and tables that have never been analyzed, fall back to
+    an exact COUNT(*).
+    """
+    if queryset.query.where or queryset.query.distinct:
+        return queryset.count()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+
+    if not row or row[0] <= 0:
+        return queryset.count()
+    return row[0]
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination keyed on the ordering the queryset already has.
+
+    Each page is a ``WHERE key > position`` lookup instead of an OFFSET, so
+    the cost does not grow with page depth.
+    """
+
+    # Fields that are indexed and (nearly) unique enough to page on.
+    keyset_fields = ("hostname", "mac", "address", "changed", "trigger_id")
+
+    def pageable_key(self, queryset):
+        """Return the first ordering key if it can be paged on, else None.
+
+        Expressions, and fields outside ``keyset_fields``, cannot be.
+        """
+        pk_name = queryset.model._meta.pk.name
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not ordering:
+            return pk_name
+        key = ordering[0]
+        pageable = self.keyset_fields + (pk_name, "pk")
+        if isinstance(key, str) and key.lstrip("-") in pageable:
+            return key
+        return None
+
+    def get_ordering(self, request, queryset, view):
+        """Get the keyset ordering for a queryset."""
+        pk_name = queryset.model._meta.pk.name
+        key = self.pageable_key(queryset)
+        if key is None:
+            # Page on the primary key, in the direction of the original key.
+            first = (list(queryset.query.order_by) or queryset.model._meta.ordering)[0]
+            descending = (
+                first.startswith("-")
+                if isinstance(first, str)
+                else getattr(first, "descending", False)
+            )
+            key = "-" + pk_name if descending else pk_name
+
+        if key.lstrip("-") in (pk_name, "pk"):
+            return (key,)
+        # Break ties on the primary key so pages are deterministic.
+        return (key, "-" + pk_name if key.startswith("-") else pk_name)
+
+
 # Using page number pagination for v2 API, rather than limit/offset pagination.
 # We're using it for the following reasons:
 # 1. It closely matches how the data will be displayed in the UI
@@ -22,6 +93,52 @@ class APIPagination(PageNumberPagination):
     # will blend together. This is why a paginated UI is better for this. This
     # isn't your social media feed.
 
+    # Scripts that walk every page can opt in to keyset pagination by passing
+    # ?cursor= (empty for the first page). In cursor mode the count is only
+    # returned when asked for, with ?count=exact or ?count=estimate (which
+    # skips the COUNT(*)). Page numbers always use the exact count: an estimate
+    # that came up short would make the last real pages 404. Listings ordered
+    # on anything keyset pagination cannot page on stay on page numbers, so
+    # their order is kept.
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate a queryset by page number, or by cursor if requested."""
+        self.count_mode = request.query_params.get(self.count_query_param)
+        self.keyset = None
+
+        if (
+            self.cursor_query_param in request.query_params
+            and isinstance(queryset, QuerySet)
+            and KeysetPagination().pageable_key(queryset) is not None
+        ):
+            page_size = self.get_page_size(request)
+            if not page_size:
+                return None
+            self.keyset = KeysetPagination()
+            self.keyset.page_size = page_size
+            self.keyset.cursor_query_param = self.cursor_query_param
+            self.object_list = queryset
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Get the paginated response."""
+        if self.keyset is None:
+            return super().get_paginated_response(data)
+
+        response = OrderedDict()
+        if self.count_mode == "estimate":
+            response["count"] = estimated_count(self.object_list)
+        elif self.count_mode == "exact":
+            response["count"] = self.object_list.count()
+        response["next"] = self.keyset.get_next_link()
+        response["previous"] = self.keyset.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
 
 class LogsPagination(APIPagination):
     """Pagination for logs endpoints."""
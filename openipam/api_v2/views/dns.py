@@ -10,15 +10,19 @@ from django.contrib.contenttypes.models import ContentType
 from django.utils.encoding import force_text
 from django.contrib.auth.models import Group
 from django.db.models import Count
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from guardian.shortcuts import get_objects_for_user
+from openipam.conf.ipam_settings import CONFIG
+from openipam.dns.bulk import DnsRecordBatch
 from openipam.dns.models import DnsRecord, Domain, DnsType, DnsView, DhcpDnsRecord
+from openipam.dns.zone_export import iter_json_lines, iter_zone_file, record_changes
 from openipam.user.models import User
 from .base import APIModelViewSet, APIPagination
 from ..filters.dns import DhcpDnsFilter, DnsFilter, DnsTypeFilter, DomainFilter
 from ..filters.base import RelatedPermissionFilter
-from ..permissions import DnsRecordPermissions
+from ..permissions import APIAdminPermission, DnsRecordPermissions
 from ..serializers.dns import (
     DNSSerializer,
     DomainSerializer,
@@ -140,6 +144,73 @@ class DnsViewSet(APIModelViewSet):
         data = serializer.data.copy()
         return Response(data)
     
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def bulk(self, request: Request, *args, **kwargs):
+        """
+        Create or update many DNS records at once.
+
+        Takes a list (or {"records": [...]}) of objects with name, dns_type and
+        content, an optional ttl, and an id to update an existing record.
+        Valid records are saved; the response lists the id or the errors of
+        each item, in the order given.
+        """
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("records")
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "Expected a list of records."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > CONFIG["DNS_BULK_MAX_RECORDS"]:
+            return Response(
+                {
+                    "detail": "At most %s records can be sent at once."
+                    % CONFIG["DNS_BULK_MAX_RECORDS"]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        batch = DnsRecordBatch(request.user, items)
+        batch.is_valid()
+        records = batch.save()
+
+        results = []
+        for index in range(len(items)):
+            if index in batch.errors:
+                results.append({"index": index, "errors": batch.errors[index]})
+            else:
+                record, created = records[index]
+                results.append({"index": index, "id": record.pk, "created": created})
+
+        if not batch.errors:
+            response_status = status.HTTP_200_OK
+        elif not records:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+        return Response(
+            {
+                "saved": len(records),
+                "failed": len(batch.errors),
+                "results": results,
+            },
+            status=response_status,
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[APIAdminPermission],
+    )
+    def changes(self, request: Request, *args, **kwargs):
+        """Return DNS record changes, in every domain, since ?since=<trigger id>."""
+        return change_feed_response(request)
+
     @action(
         detail=False,
         methods=["get"],
@@ -203,6 +274,22 @@ class DnsViewSet(APIModelViewSet):
         return self.get_paginated_response(serializer.data)
 
 
+def change_feed_response(request, domain=None):
+    try:
+        since = int(request.query_params.get("since", 0))
+        limit = int(request.query_params.get("limit", 0)) or None
+    except ValueError:
+        return Response(
+            {"detail": "since and limit must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    changes, next_since = record_changes(since=since, domain=domain, limit=limit)
+    data = {"since": since, "next": next_since, "changes": changes}
+    if domain:
+        data["serial"] = domain.notified_serial
+    return Response(data)
+
+
 class DomainViewSet(APIModelViewSet):
     """API endpoint that allows domains to be viewed or edited."""
 
@@ -376,6 +463,63 @@ class DomainViewSet(APIModelViewSet):
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def _can_export(self, request, domain):
+        return (
+            request.user.is_ipamadmin
+            or request.user.has_perm("dns.is_owner_domain", domain)
+            or request.user.has_perm("dns.change_domain", domain)
+        )
+
+    @action(
+        detail=True, methods=["get"], permission_classes=[permissions.IsAuthenticated]
+    )
+    def zone(self, request, name=None):
+        """
+        Stream every record in a domain.
+
+        ?output=zone (the default) gives an RFC 1035 zone file, ?output=jsonl
+        one JSON object per record.  ?view=<name> includes that view's records.
+        """
+        domain = get_object_or_404(Domain, name=name)
+        if not self._can_export(request, domain):
+            return Response(
+                {"detail": "You do not have permission to export this domain."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        view = None
+        if request.query_params.get("view"):
+            view = get_object_or_404(DnsView, name=request.query_params["view"])
+
+        if request.query_params.get("output") == "jsonl":
+            response = StreamingHttpResponse(
+                iter_json_lines(domain, view=view), content_type="application/jsonl"
+            )
+        else:
+            response = StreamingHttpResponse(
+                iter_zone_file(domain, view=view), content_type="text/dns"
+            )
+        response["X-Zone-Serial"] = domain.notified_serial or ""
+        return response
+
+    @action(
+        detail=True, methods=["get"], permission_classes=[permissions.IsAuthenticated]
+    )
+    def changes(self, request, name=None):
+        """
+        Return the changes to a domain's records since ?since=<trigger id>.
+
+        Pass the returned "next" as "since" to continue; "serial" is the
+        domain's notified_serial, which moves whenever its records change.
+        """
+        domain = get_object_or_404(Domain, name=name)
+        if not self._can_export(request, domain):
+            return Response(
+                {"detail": "You do not have permission to export this domain."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        return change_feed_response(request, domain)
+
     @action(detail=True, methods=["get"])
     def users(self, request, name=None):
         """Get users with permissions on a domain."""
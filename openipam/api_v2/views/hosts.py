@@ -7,6 +7,11 @@ from openipam.hosts.models import (
     StructuredAttributeToHost,
     FreeformAttributeToHost,
 )
+from openipam.hosts.export import (
+    HOST_EXPORT_HEADER,
+    iter_host_export,
+    streaming_csv_response,
+)
 from openipam.network import models as network_models
 from openipam.user.models import User
 from ..serializers import network as network_serializers
@@ -29,7 +34,7 @@ from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
 from django.core import exceptions as core_exceptions
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from guardian.shortcuts import get_objects_for_user
 from netfields import NetManager  # noqa: F401 needed for net_contains
 from django_filters.rest_framework import DjangoFilterBackend
@@ -42,9 +47,32 @@ from openipam.network.models import DhcpGroup
 class HostViewSet(APIModelViewSet):
     """API endpoint that allows hosts to be viewed or edited."""
 
+    # Everything HostSerializer reads is loaded here for the whole page, so
+    # serializing a page costs the same number of queries at any page size.
     queryset = (
-        Host.objects.prefetch_related("addresses", "leases", "pools")
-        .select_related("dhcp_group", "changed_by")
+        Host.objects.with_owners()
+        .with_disabled()
+        .prefetch_related(
+            Prefetch(
+                "addresses",
+                queryset=network_models.Address.objects.prefetch_related("arecords"),
+            ),
+            "leases",
+            "pools",
+            "mac_history",
+            Prefetch(
+                "structured_attributes",
+                queryset=StructuredAttributeToHost.objects.select_related(
+                    "structured_attribute_value__attribute"
+                ),
+            ),
+            Prefetch(
+                "freeform_attributes",
+                queryset=FreeformAttributeToHost.objects.select_related("attribute"),
+            ),
+        )
+        # The host summary row carries the vendor and current addresses.
+        .select_related("dhcp_group", "changed_by", "address_type_id", "summary")
         .order_by("hostname")
     )
 
@@ -291,6 +319,14 @@ class HostViewSet(APIModelViewSet):
         serializer = self.get_serializer(pagination, many=True)
         return self.get_paginated_response(serializer.data)
 
+    @action(methods=["get"], detail=False)
+    def export(self, request, *args, **kwargs):
+        """Stream the filtered host list as CSV."""
+        hosts = self.filter_queryset(Host.objects.all())
+        return streaming_csv_response(
+            HOST_EXPORT_HEADER, iter_host_export(hosts), "hosts.csv"
+        )
+
 
 class DisableView(views.APIView):
     """API endpoints for disabling and enabling hosts.
@@ -2,17 +2,16 @@
 
 from rest_framework import status, viewsets as lib_viewsets
 from rest_framework.views import APIView
-from ..serializers.misc import AttributeSerializer, StructuredAttributeValueSerializer
+from ..serializers.misc import (
+    AttributeSerializer,
+    SearchResultSerializer,
+    StructuredAttributeValueSerializer,
+)
 from openipam.hosts.models import Attribute, StructuredAttributeValue
 from django.db.models import Prefetch
-from openipam.network.models import Network, Lease, Address
-from openipam.hosts.models import Host
-from django.utils import timezone
-from openipam.dns.models import DnsRecord
-from functools import reduce
-import operator
-from datetime import timedelta
-from django.db.models import Q
+from openipam.conf.ipam_settings import CONFIG
+from openipam.core.search import search
+from openipam.report.dashboard import get_dashboard_stats
 from rest_framework.response import Response
 from collections import OrderedDict
 from django.contrib.auth import get_user_model
@@ -49,62 +48,62 @@ class AttributeViewSet(lib_viewsets.ReadOnlyModelViewSet):
 
 class DashboardAPIView(APIView):
     def get(self, request, format=None, **kwargs):
-        wireless_networks = Network.objects.filter(
-            dhcp_group__name__in=["aruba_wireless", "aruba_wireless_eastern"]
-        )
-        wireless_networks_available_qs = [
-            Q(address__net_contained=network.network) for network in wireless_networks
-        ]
-
+        dashboard = get_dashboard_stats()
+        stats = dashboard["stats"]
         data = {
-            "all_hosts": {
-                "count": Host.objects.all().count(),
-            },
-            "expired_hosts": {
-                "count": Host.objects.filter(expires__lte=timezone.now()).count(),
-            },
-            "static_hosts": {
-                "count": Host.objects.filter(
-                    addresses__isnull=False, expires__gte=timezone.now()
-                ).count(),
-            },
-            "dynamic_hosts": {
-                "count": Host.objects.filter(
-                    pools__isnull=True, expires__gte=timezone.now()
-                ).count(),
-            },
-            "active_leases": {
-                "count": Lease.objects.filter(ends__gte=timezone.now()).count(),
-            },
-            "abandoned_leases": {
-                "count": Lease.objects.filter(abandoned=True).count(),
-            },
+            "all_hosts": {"count": stats["all_hosts"]},
+            "expired_hosts": {"count": stats["expired_hosts"]},
+            "static_hosts": {"count": stats["static_hosts"]},
+            "dynamic_hosts": {"count": stats["dynamic_hosts"]},
+            "active_leases": {"count": stats["active_leases"]},
+            "abandoned_leases": {"count": stats["abandoned_leases"]},
             "networks_total": {
-                "count": Network.objects.all().count(),
-                "wireless_count": wireless_networks.count(),
+                "count": stats["networks"],
+                "wireless_count": stats["wireless_networks"],
             },
             "available_wireless_addresses": {
-                "count": Address.objects.filter(
-                    reduce(operator.or_, wireless_networks_available_qs),
-                    leases__ends__lt=timezone.now(),
-                ).count(),
-            },
-            "dns_a_records": {
-                "count": DnsRecord.objects.filter(
-                    dns_type__name__in=["A", "AAAA"]
-                ).count(),
-            },
-            "dns_cname_records": {
-                "count": DnsRecord.objects.filter(dns_type__name="CNAME").count(),
-            },
-            "dns_mx_records": {
-                "count": DnsRecord.objects.filter(dns_type__name="MX").count(),
+                "count": stats["available_wireless_addresses"],
             },
+            "dns_a_records": {"count": stats["dns_a_records"]},
+            "dns_cname_records": {"count": stats["dns_cname_records"]},
+            "dns_mx_records": {"count": stats["dns_mx_records"]},
             "active_users_within_1_year": {
-                "count": User.objects.filter(
-                    last_login__gte=(timezone.now() - timedelta(days=365))
-                ).count(),
+                "count": stats["active_users_within_1_year"],
+            },
+            "cache": {
+                "computed_at": dashboard["computed_at"],
+                "compute_time": dashboard["compute_time"],
+                "age": dashboard["age"],
             },
         }
 
         return Response(data, status=status.HTTP_200_OK)
+
+
+class SearchAPIView(APIView):
+    """
+    Search hosts, DNS records, networks and users at once.
+
+    ``q`` is the search text (at least 2 characters), ``type`` an optional
+    comma-separated list of object types, and ``limit`` the number of
+    results.  Only object types the user may view are searched.
+    """
+
+    def get(self, request, format=None, **kwargs):
+        query = request.query_params.get("q", "").strip()
+        if len(query) < 2:
+            return Response(
+                {"detail": "The search must be at least 2 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        object_types = [t for t in request.query_params.get("type", "").split(",") if t]
+        try:
+            limit = int(request.query_params.get("limit", 25))
+        except ValueError:
+            limit = 25
+        limit = min(max(limit, 1), CONFIG.get("SEARCH_MAX_RESULTS"))
+
+        results = search(request.user, query, object_types)[:limit]
+        return Response(
+            {"query": query, "results": SearchResultSerializer(results, many=True).data}
+        )
@@ -6,6 +6,9 @@ from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 
 from django.db.models import Q
+from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 from ..permissions import ReadRestrictObjectPermissions
 
@@ -26,6 +29,8 @@ from ..serializers.network import (
     VlanSerializer,
     DefaultPoolSerializer,
     LeaseSerializer,
+    NetworkUtilizationSerializer,
+    NetworkUtilizationHistorySerializer,
 )
 from ..filters.network import NetworkFilter, AddressFilterSet
 from .base import APIPagination
@@ -45,10 +50,20 @@ from openipam.network.models import (
     SharedNetwork,
     Building,
     BuildingToVlan,
+    NetworkUtilization,
 )
+from openipam.core.search import queue_search_refresh
+from openipam.network.allocation import free_address_counts
+from openipam.network.utilization import (
+    queue_utilization_refresh,
+    refresh_utilization,
+)
+from openipam.conf.ipam_settings import CONFIG
 from rest_framework import viewsets, status
 from netfields import NetManager  # noqa
 from ipaddress import ip_address
+from datetime import timedelta
+import time
 from guardian.shortcuts import get_objects_for_user
 from .base import APIModelViewSet
 
@@ -181,6 +196,60 @@ class NetworkViewSet(APIModelViewSet):
         serializer = self.get_serializer(address)
         return Response(serializer.data)
 
+    @action(
+        detail=True,
+        methods=["get"],
+        filter_backends=[],
+        pagination_class=None,
+        url_path=r"utilization",
+        url_name="utilization",
+    )
+    def utilization(self, request, pk=None):
+        """
+        Return the address and lease counts of a network from the utilization
+        rollup, with its history over the last ``days`` days (default 7).
+        """
+        network = self.get_object()
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            return Response(status=400, data={"detail": "Invalid days."})
+        days = max(0, min(days, CONFIG.get("NETWORK_UTILIZATION_HISTORY_DAYS")))
+
+        try:
+            utilization = NetworkUtilization.objects.get(network=network)
+        except NetworkUtilization.DoesNotExist:
+            # Not counted yet; a new network, most likely.
+            refresh_utilization([network])
+            utilization = NetworkUtilization.objects.get(network=network)
+
+        history = network.utilization_history.filter(
+            bucket__gte=timezone.now() - timedelta(days=days)
+        ).order_by("bucket")
+
+        data = NetworkUtilizationSerializer(utilization).data
+        data["history"] = NetworkUtilizationHistorySerializer(history, many=True).data
+        return Response(data)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        filter_backends=[],
+        pagination_class=None,
+        url_path=r"free-addresses",
+        url_name="free-addresses",
+    )
+    def free_addresses(self, request, pk=None):
+        """
+        Return how many addresses of a network the requesting user could
+        assign to a host, and the lowest of them (the next one handed out).
+        """
+        network = self.get_object()
+        counts = free_address_counts([network], user=request.user)
+        data = {"network": str(network.network)}
+        data.update(counts[str(network.network)])
+        return Response(data)
+
     @action(
         detail=True,
         methods=["get"],
@@ -196,6 +265,7 @@ class NetworkViewSet(APIModelViewSet):
         Lease.objects.filter(
             address__address__net_contained_or_equal=network.network, abandoned=True
         ).update(abandoned=False, host="000000000000")
+        queue_utilization_refresh([network])
         return Response(status=200, data={"detail": "Abandoned leases released."})
 
     @action(
@@ -234,47 +304,33 @@ class NetworkViewSet(APIModelViewSet):
         network = Network.objects.get(network=pk)
         new_network = request.query_params.get("new_network", None)
         if new_network:
-            # Update primary key
-            Network.objects.filter(network=network).update(network=new_network)
-            new_network = Network.objects.filter(network=new_network).first()
-
-            addresses = []
-            existing_addresses = [
-                address.address
-                for address in Address.objects.filter(
-                    address__net_contained_or_equal=new_network
-                )
-            ]
-
-            for address in new_network.network:
-                if address not in existing_addresses:
-                    reserved = False
-                    if address in (
-                        new_network.gateway,
-                        new_network.network[0],
-                        new_network.network[-1],
-                    ):
-                        reserved = True
-                    pool = (
-                        DefaultPool.objects.get_pool_default(address)
-                        if not reserved
-                        else None
+            started = time.monotonic()
+            try:
+                with transaction.atomic():
+                    # Update primary key
+                    Network.objects.filter(network=network).update(
+                        network=new_network,
+                        changed=timezone.now(),
+                        changed_by=request.user,
                     )
-                    addresses.append(
-                        # TODO: Need to set pool eventually.
-                        Address(
-                            address=address,
-                            network=new_network,
-                            reserved=reserved,
-                            pool=pool,
-                            changed_by=request.user,
-                        )
+                    # update() skips the signals that keep search documents current.
+                    queue_search_refresh("network", [network.network, new_network])
+                    new_network = Network.objects.get(network=new_network)
+                    created, deleted = Address.objects.provision_network(
+                        new_network, user=request.user
                     )
-            if addresses:
-                Address.objects.bulk_create(addresses)
+            except ValidationError as e:
+                return Response(status=400, data={"detail": e.messages})
 
-            network.save()
-            return Response(status=200, data={"detail": "Network resized."})
+            return Response(
+                status=200,
+                data={
+                    "detail": "Network resized.",
+                    "created": created,
+                    "deleted": deleted,
+                    "seconds": round(time.monotonic() - started, 3),
+                },
+            )
         else:
             return Response(status=400, data={"detail": "Invalid network."})
 
@@ -12,15 +12,14 @@ from rest_framework.renderers import (
 from rest_framework import permissions as base_permissions
 
 from rest_framework_csv.renderers import CSVRenderer
-from django.contrib.contenttypes.models import ContentType
 from django.db.models import F
 
+from openipam.hosts.export import iter_server_hosts, streaming_csv_response
 from openipam.hosts.models import Host, GulRecentArpBymac, User
 from openipam.dns.models import DnsRecord
 
 from openipam.conf.ipam_settings import CONFIG_DEFAULTS
 
-from guardian.models import UserObjectPermission, GroupObjectPermission
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from datetime import timedelta
@@ -32,12 +31,9 @@ from ..serializers.report import (
     DnsRecordSerializer,
     RecentStatsSerializer,
 )
-from datetime import datetime
-from django.core.cache import cache
-from django.db.models import Count
 from rest_framework import permissions
 from rest_framework.response import Response
-from qsstats import QuerySetStats
+from openipam.report.stats import cached_period_counts
 
 
 class ExposedHostCSVRenderer(CSVRenderer):
@@ -59,54 +55,22 @@ class ExposedHostViewSet(ReadOnlyModelViewSet):
     serializer_class = HostSerializer
 
     def list(self, request, format=None):
-        hosts = (
-            Host.objects.prefetch_related("addresses")
-            .filter(
-                structured_attributes__structured_attribute_value__attribute__name="nac-profile",
-                structured_attributes__structured_attribute_value__value__startswith=CONFIG_DEFAULTS[
-                    "NAC_PROFILE_IS_SERVER_PREFIX"
-                ],
-            )
-            .annotate(
-                nac_profile=F(
-                    "structured_attributes__structured_attribute_value__value"
-                ),
-            )
-        )
-        user_perms_prefetch = UserObjectPermission.objects.select_related(
-            "permission", "user"
-        ).filter(
-            content_type=ContentType.objects.get_for_model(Host),
-            object_pk__in=[str(host.mac) for host in hosts],
-            permission__codename="is_owner_host",
+        hosts = Host.objects.filter(
+            structured_attributes__structured_attribute_value__attribute__name="nac-profile",
+            structured_attributes__structured_attribute_value__value__startswith=CONFIG_DEFAULTS[
+                "NAC_PROFILE_IS_SERVER_PREFIX"
+            ],
+        ).annotate(
+            nac_profile=F("structured_attributes__structured_attribute_value__value"),
         )
-        group_perms_prefetch = GroupObjectPermission.objects.select_related(
-            "permission", "group"
-        ).filter(
-            content_type=ContentType.objects.get_for_model(Host),
-            object_pk__in=[str(host.mac) for host in hosts],
-            permission__codename="is_owner_host",
-        )
-        data = []
-        for host in hosts:
-            owners = host.get_owners(
-                name_only=True,
-                user_perms_prefetch=user_perms_prefetch,
-                group_perms_prefetch=group_perms_prefetch,
-            )
-            data.append(
-                {
-                    "hostname": host.hostname,
-                    "mac": str(host.mac),
-                    "description": host.description,
-                    "master_ip_address": (
-                        host.ip_addresses[0] if host.ip_addresses else None
-                    ),
-                    "user_owners": ", ".join(owners[0]),
-                    "group_owners": ", ".join(owners[1]),
-                    "nac_profile": host.nac_profile,
-                }
+        if request.accepted_renderer.format == "csv":
+            return streaming_csv_response(
+                request.accepted_renderer.header,
+                iter_server_hosts(hosts),
+                "exposed-server-hosts.csv",
             )
+
+        data = list(iter_server_hosts(hosts))
         page = self.paginate_queryset(data)
         if page is not None:
             return self.get_paginated_response(page)
@@ -226,39 +190,19 @@ class RecentStatsViewSet(ReadOnlyModelViewSet):
     serializer_class = RecentStatsSerializer
     queryset = Host.objects.none()
 
-    def get_cached_stats(self, queryset, date_field, cache_prefix, aggregate=None):
-        stats = QuerySetStats(
-            queryset, date_field, aggregate=aggregate, today=datetime.now()
-        )
-        today_cache_key = f"{cache_prefix}_today"
-        week_cache_key = f"{cache_prefix}_week"
-        month_cache_key = f"{cache_prefix}_month"
-
-        today_stats = cache.get(today_cache_key)
-        week_stats = cache.get(week_cache_key)
-        month_stats = cache.get(month_cache_key)
-
-        if today_stats is None:
-            today_stats = stats.this_day()
-            cache.set(today_cache_key, today_stats)
-        if week_stats is None:
-            week_stats = stats.this_week()
-            cache.set(week_cache_key, week_stats)
-        if month_stats is None:
-            month_stats = stats.this_month()
-            cache.set(month_cache_key, month_stats)
-
-        return today_stats, week_stats, month_stats
+    def get_cached_stats(self, queryset, date_field, cache_prefix):
+        counts = cached_period_counts(cache_prefix, queryset, date_field)
+        return counts["day"], counts["week"], counts["month"]
 
     def list(self, request):
         hosts_today, hosts_week, hosts_month = self.get_cached_stats(
-            Host.objects.all(), "changed", "hosts", aggregate=Count("mac")
+            Host.objects.all(), "changed", "hosts.host.changed"
         )
         users_today, users_week, users_month = self.get_cached_stats(
-            User.objects.all(), "date_joined", "users"
+            User.objects.all(), "date_joined", "user.user.date_joined"
         )
         dns_today, dns_week, dns_month = self.get_cached_stats(
-            DnsRecord.objects.all(), "changed", "dns"
+            DnsRecord.objects.all(), "changed", "dns.dnsrecord.changed"
         )
 
         data = {
@@ -0,0 +1,6 @@
+def invalidate_typeahead(sender, update_fields=None, **kwargs):
+    from openipam.autocomplete.typeahead import typeahead_indexes
+
+    for index in typeahead_indexes.values():
+        if index.watches(sender, update_fields):
+            index.invalidate()
@@ -1 +1,132 @@
-# Create your tests here.
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+
+from openipam.autocomplete.typeahead import Entry, typeahead_index, tokens
+from openipam.autocomplete.typeahead import _PrefixTable
+from openipam.core.tests.test_models import IPAMTestCase
+from openipam.core.utils.local_snapshot import LocalSnapshot
+from openipam.network.models import Network
+
+import threading
+
+
+class PrefixTableTest(SimpleTestCase):
+    def setUp(self):
+        names = ["John Smith jsmith@usu.edu", "Jane Smithers", "Bob Jones"]
+        self.table = _PrefixTable(
+            [
+                Entry(i, "user:%s" % i, (name,), tuple(tokens([name])))
+                for i, name in enumerate(names)
+            ]
+        )
+
+    def search(self, words, limit=5):
+        return [entry.pk for entry in self.table.search(words, limit)]
+
+    def test_prefixes_and_words(self):
+        self.assertEqual(self.search(["smith"]), [0, 1])
+        self.assertEqual(self.search(["SMITH"]), [0, 1])
+        self.assertEqual(self.search(["usu"]), [0])
+        self.assertEqual(self.search(["jsmith@usu"]), [0])
+        self.assertEqual(self.search(["nobody"]), [])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search(["smith", "ja"]), [1])
+        self.assertEqual(self.search(["jo", "smith"]), [0])
+
+    def test_limit(self):
+        self.assertEqual(len(self.search(["j"], limit=2)), 2)
+
+
+class TypeaheadIndexTest(IPAMTestCase):
+    def setUp(self):
+        self.networks = [
+            {"network": "10.9.0.0/24", "name": "typeahead-net", "gateway": "10.9.0.1"}
+        ]
+        self.dns_domains = []
+        self.dns_records = []
+        self.hosts = []
+        self.pools = []
+        self.address_types = []
+        self.index = typeahead_index(Network)
+        self.index.invalidate()
+        return super(TypeaheadIndexTest, self).setUp()
+
+    def tearDown(self):
+        self.index.invalidate()
+
+    def test_search_and_invalidate(self):
+        entries = self.index.search(["typeahead"], 5)
+        self.assertEqual([entry.key for entry in entries], ["net:10.9.0.0/24"])
+        self.assertEqual(entries[0].parts, ("Network", "typeahead-net", "10.9.0.0/24"))
+        self.assertEqual(len(self.index.search(["10.9.0"], 5)), 1)
+
+        Network.objects.get(network="10.9.0.0/24").delete()
+        self.assertEqual(self.index.search(["typeahead"], 5), [])
+
+
+class BackgroundRebuildTest(SimpleTestCase):
+    class Counter(LocalSnapshot):
+        version_key = "ipam_test_counter_version"
+        recheck_setting = "AUTOCOMPLETE_INDEX_RECHECK_SECONDS"
+        rebuild_in_background = True
+
+        def __init__(self):
+            super(BackgroundRebuildTest.Counter, self).__init__()
+            self.builds = 0
+            self.release = threading.Event()
+
+        def build(self):
+            if self.builds:
+                self.release.wait(5)
+            self.builds += 1
+            return self.builds
+
+    def test_stale_copy_served_while_rebuilding(self):
+        counter = self.Counter()
+        self.assertEqual(counter.snapshot, 1)
+
+        # Another worker changed the data.
+        cache.set(counter.version_key, "changed", None)
+        counter._checked = 0.0
+        self.assertEqual(counter.snapshot, 1)
+
+        counter.release.set()
+        counter._rebuild_thread.join(5)
+        counter._checked = 0.0
+        self.assertEqual(counter.snapshot, 2)
+
+
+class TransactionSnapshotTest(TestCase):
+    class Counter(LocalSnapshot):
+        version_key = "ipam_test_transaction_counter_version"
+        recheck_setting = "AUTOCOMPLETE_INDEX_RECHECK_SECONDS"
+
+        def __init__(self):
+            super(TransactionSnapshotTest.Counter, self).__init__()
+            self.builds = 0
+
+        def build(self):
+            self.builds += 1
+            return self.builds
+
+    def test_built_once_per_invalidation(self):
+        counter = self.Counter()
+        counter.invalidate()
+        self.assertEqual(counter.snapshot, 1)
+        self.assertEqual(counter.snapshot, 1)
+        self.assertIsNone(counter._snapshot)
+
+        counter.invalidate()
+        self.assertEqual(counter.snapshot, 2)
+
+        try:
+            with transaction.atomic():
+                counter.invalidate()
+                self.assertEqual(counter.snapshot, 3)
+                raise ValueError
+        except ValueError:
+            pass
+        # The savepoint's invalidate() was rolled back; the outer one stands.
+        self.assertEqual(counter.snapshot, 4)
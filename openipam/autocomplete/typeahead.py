@@ -0,0 +1,281 @@
+from django.apps import apps
+from django.db import close_old_connections
+
+from openipam.conf.ipam_settings import CONFIG
+from openipam.core.utils.local_snapshot import LocalSnapshot
+
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Field values are also indexed by their words and the parts of those, so
+# "smith" finds "John Smith" and "usu" finds "jsmith@usu.edu".
+_part_split = re.compile(r"[@._/-]+")
+
+# ``key`` is the id the host advanced search filters on ("user:jsmith");
+# ``parts`` the formatted label, model name first.
+Entry = namedtuple("Entry", ["pk", "key", "parts", "tokens"])
+
+
+def tokens(values):
+    """The lowercased values and their words, for prefix matching."""
+    found = set()
+    for value in values:
+        value = str(value).lower()
+        if value:
+            found.add(value)
+            for word in value.split():
+                found.add(word)
+                found.update(part for part in _part_split.split(word) if part)
+    return found
+
+
+def field_value(obj, field):
+    # "attribute__name" follows the relation, as a queryset lookup would.
+    for part in field.split("__"):
+        if obj is None:
+            return ""
+        obj = getattr(obj, part)
+    return "" if obj is None else obj
+
+
+class _PrefixTable(object):
+    """
+    Sorted ``(token, entry)`` pairs for one model.
+
+    The tokens starting with a prefix are a contiguous run found by
+    bisection, and a token equal to the prefix sorts first within it.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        pairs = sorted(
+            (token, i) for i, entry in enumerate(entries) for token in entry.tokens
+        )
+        self.keys = [token for token, i in pairs]
+        self.ids = [i for token, i in pairs]
+
+    def _range(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        return start, bisect_left(self.keys, prefix + "\uffff", start)
+
+    def search(self, words, limit):
+        """
+        The first ``limit`` entries with a token starting with each of
+        ``words``, walking the run of the most selective word.
+        """
+        words = [word.lower() for word in words if word]
+        if not words:
+            return []
+        ranges = sorted(
+            ((self._range(word), word) for word in words),
+            key=lambda item: item[0][1] - item[0][0],
+        )
+        (start, stop), _ = ranges[0]
+        others = [word for _, word in ranges[1:]]
+
+        found = []
+        seen = set()
+        for i in self.ids[start:stop]:
+            if i in seen:
+                continue
+            seen.add(i)
+            entry = self.entries[i]
+            if all(
+                any(token.startswith(word) for token in entry.tokens) for word in others
+            ):
+                found.append(entry)
+                if len(found) >= limit:
+                    break
+        return found
+
+
+class TypeaheadIndex(LocalSnapshot):
+    """
+    Process-local prefix index over one model's autocomplete fields.
+
+    Each entry's label is formatted when the index is built, with the
+    relations it needs selected up front, so answering a keystroke never
+    touches the database.  Saves and deletes of ``model`` (or of the
+    ``depends_on`` models its labels read) invalidate it, and the old index
+    answers until the new one is built.
+    """
+
+    recheck_setting = "AUTOCOMPLETE_INDEX_RECHECK_SECONDS"
+    rebuild_in_background = True
+
+    def __init__(
+        self, model, fields, formatter, key=None, select_related=(), depends_on=()
+    ):
+        super(TypeaheadIndex, self).__init__()
+        self.model = model
+        self.fields = fields
+        self.formatter = formatter
+        self.key = key
+        self.select_related = select_related
+        self.depends_on = depends_on
+        self.version_key = "ipam_typeahead_%s_version" % model.replace(".", "_")
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+    def watches(self, sender, update_fields=None):
+        """Whether a save of ``sender`` touching ``update_fields`` can change entries."""
+        label = sender._meta.label
+        if label in self.depends_on:
+            return True
+        if label != self.model:
+            return False
+        if update_fields is None:
+            return True
+        return bool(
+            set(update_fields) & set(field.split("__")[0] for field in self.fields)
+        )
+
+    def build(self):
+        model = self.get_model()
+        name = model.__name__.lower()
+        queryset = model.objects.all()
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        entries = [
+            Entry(
+                obj.pk,
+                self.key(obj) if self.key else "%s:%s" % (name, obj.pk),
+                tuple(str(part) for part in self.formatter(obj)),
+                tuple(tokens(field_value(obj, field) for field in self.fields)),
+            )
+            for obj in queryset.iterator()
+        ]
+        return _PrefixTable(entries)
+
+    def search(self, words, limit):
+        return self.snapshot.search(words, limit)
+
+
+typeahead_indexes = OrderedDict(
+    (index.model, index)
+    for index in [
+        TypeaheadIndex(
+            "user.User",
+            ["username", "first_name", "last_name", "email"],
+            lambda x: ["User", x, x.get_full_name()],
+            key=lambda x: "user:%s" % x.username,
+        ),
+        TypeaheadIndex(
+            "auth.Group",
+            ["name"],
+            lambda x: ["Group", x],
+            key=lambda x: "group:%s" % x.name,
+        ),
+        TypeaheadIndex(
+            "network.Network",
+            ["network", "name"],
+            lambda x: ["Network", x.name, x],
+            key=lambda x: "net:%s" % x.network,
+        ),
+        TypeaheadIndex(
+            "hosts.StructuredAttributeValue",
+            ["attribute__name", "value"],
+            lambda x: ["Attribute", x.attribute, x.value],
+            key=lambda x: "sattr:%s" % x.value,
+            select_related=["attribute"],
+            depends_on=["hosts.Attribute"],
+        ),
+        TypeaheadIndex(
+            "network.AddressType",
+            ["name", "description"],
+            lambda x: ["Address Type", x],
+            key=lambda x: "atype:%s" % x.pk,
+        ),
+        TypeaheadIndex(
+            "auth.Permission",
+            ["name", "codename", "content_type__app_label"],
+            lambda x: ["Permission", x.content_type.app_label, x.name],
+            select_related=["content_type"],
+            depends_on=["contenttypes.ContentType"],
+        ),
+        TypeaheadIndex(
+            "contenttypes.ContentType",
+            ["app_label", "model"],
+            lambda x: ["Content Type", x.app_label, x.model],
+        ),
+        TypeaheadIndex(
+            "network.DhcpGroup",
+            ["name"],
+            lambda x: ["DHCP Group", x.name],
+        ),
+    ]
+)
+
+
+def typeahead_index(model):
+    """The ``TypeaheadIndex`` of ``model`` (a class or "app.Model" label), or None."""
+    label = model if isinstance(model, str) else model._meta.label
+    return typeahead_indexes.get(label)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=CONFIG.get("AUTOCOMPLETE_WORKERS"),
+                    thread_name_prefix="typeahead",
+                )
+    return _executor
+
+
+def _search(index, words, limit):
+    try:
+        return index.search(words, limit)
+    except Exception:
+        logger.exception("Typeahead search of %s failed", index.model)
+        return []
+    finally:
+        # A (re)build queries the database from this pool thread.
+        close_old_connections()
+
+
+def search_all(models, words, limit=None, budget=None):
+    """
+    Search the indexes of ``models`` concurrently for entries matching
+    every one of ``words`` as a prefix, up to ``limit`` per model.
+
+    Returns ``(results, incomplete)``: ``results`` maps each model that
+    answered within ``budget`` seconds to its entries, and ``incomplete``
+    lists the models that did not.  Those keep (re)building in the
+    background, so a later keystroke finds them ready.
+    """
+    if limit is None:
+        limit = CONFIG.get("AUTOCOMPLETE_RESULTS_PER_MODEL")
+    if budget is None:
+        budget = CONFIG.get("AUTOCOMPLETE_BUDGET_SECONDS")
+
+    executor = _get_executor()
+    futures = OrderedDict()
+    for model in models:
+        index = typeahead_index(model)
+        if index is not None:
+            futures[model] = executor.submit(_search, index, words, limit)
+
+    done, not_done = wait(list(futures.values()), timeout=budget)
+    results = OrderedDict()
+    incomplete = []
+    for model, future in futures.items():
+        if future in done:
+            results[model] = future.result()
+        else:
+            incomplete.append(model)
+    return results, incomplete
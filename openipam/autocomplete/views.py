@@ -1,12 +1,11 @@
+from openipam.autocomplete.typeahead import search_all
 from openipam.hosts.models import (
     StructuredAttributeValue,
 )
 from openipam.network.models import AddressType, DhcpGroup, Network
 from openipam.user.models import User
 from django.contrib.auth.models import Group, Permission
-from django.db.models import Q
 from django.views import View
-from functools import reduce
 from django.http import JsonResponse
 from django.contrib.contenttypes.models import ContentType
 
@@ -42,99 +41,32 @@ class IPAMSearchAutoComplete(View):
     @classmethod
     def always_use_pk(cls):
         new_class = type(cls.__name__, (cls,), {})
-        new_class._default_id_generator = lambda self, x: x.pk
-        new_class._id_generators = {}
+        new_class._use_pk = True
         return new_class
 
     _word_split = False
-
-    def _default_id_generator(self, x):
-        f"{x.__class__.__name__.lower()}:{x.pk}"
-
-    _id_generators = {
-        User: lambda x: f"user:{x.username}",
-        Group: lambda x: f"group:{x.name}",
-        Network: lambda x: f"net:{x.network}",
-        StructuredAttributeValue: lambda x: f"sattr:{x.value}",
-        AddressType: lambda x: f"atype:{x.pk}",
-    }
+    _use_pk = False
 
     _models_to_search = []
 
-    # All of the models that this class supports searching. If it is not
-    # in here, it will not be searched.
-    _search_fields = {
-        User: ["username", "first_name", "last_name", "email"],
-        Group: ["name"],
-        Network: ["network", "name"],
-        StructuredAttributeValue: ["attribute__name", "value"],
-        AddressType: ["name", "description"],
-        Permission: ["name", "codename", "content_type__app_label"],
-        ContentType: ["app_label", "model"],
-        DhcpGroup: ["name"],
-    }
-
-    _formatters = {
-        StructuredAttributeValue: lambda x: ["Attribute", x.attribute, x.value],
-        Network: lambda x: ["Network", x.name, x],
-        AddressType: lambda x: ["Address Type", x],
-        User: lambda x: ["User", x, x.get_full_name()],
-        Group: lambda x: ["Group", x],
-        Permission: lambda x: ["Permission", x.content_type.app_label, x.name],
-        ContentType: lambda x: ["Content Type", x.app_label, x.model],
-        DhcpGroup: lambda x: ["DHCP Group", x.name],
-    }
-
-    def get_queryset(self, model_class=None):
-        if not model_class:
-            querysets = [self.get_queryset(model) for model in self._models_to_search]
-            return querysets
-        else:
-            try:
-                return model_class.objects.all().filter(
-                    self.get_search_filters(model_class)
-                )[
-                    :5
-                ]  # Limit to 3 results per model
-            except KeyError:
-                # If the model is not in _search_fields, return an empty queryset.
-                return model_class.objects.none()
-
-    def get_search_filters(self, model_class):
-        # Produce a list of filters for each field in _search_fields for this model.
-        filters = []
-        for q in self.q:
-            filters.append(
-                [
-                    Q(**{f"{field}__icontains": q})
-                    for field in self._search_fields[model_class]
-                ]
-            )
-
-        # OR all of the filters for each query together.
-        filters = [reduce(lambda x, y: x | y, filter) for filter in filters]
-
-        # AND all of the filters for each field together.
-        return reduce(lambda x, y: x & y, filters)
-
-    def serialize(self, obj):
-        model_class = obj.__class__
-
-        try:
-            formatted = self._formatters[model_class](obj)
-            formatted = [str(x) for x in formatted]
-            if len(self._models_to_search) == 1:
-                # If there is only one model, don't show the model name. The
-                # user should already know what they're searching for.
-                formatted = formatted[1:]
-            return " | ".join(formatted)
-        except KeyError:
-            # If the model is not in _formatters, use a fallback that relies on
-            # the model's __str__ method.
-            if len(self._models_to_search) == 1:
-                return str(obj)
-            else:
-                return f"{model_class.__name__} | {obj}"
+    def get_results(self):
+        """
+        Search every model's typeahead index at once, within the latency
+        budget.  Returns ``(results, incomplete)`` as ``search_all`` does.
+        """
+        return search_all(self._models_to_search, self.q)
+
+    def get_id(self, entry):
+        # The id used to identify the object in the results.
+        return entry.pk if self._use_pk else entry.key
+
+    def serialize(self, entry):
+        parts = entry.parts
+        if len(self._models_to_search) == 1:
+            # If there is only one model, don't show the model name. The
+            # user should already know what they're searching for.
+            parts = parts[1:]
+        return " | ".join(parts)
 
     def get(self, request, *args, **kwargs):
         self.q = request.GET.get("q", "")
@@ -142,37 +74,22 @@ class IPAMSearchAutoComplete(View):
             return JsonResponse({"results": []})
         if self._word_split:
             # treat each word as a separate query
-            self.q = self.q.split(" ")
+            self.q = self.q.split()
         else:
             self.q = [self.q]
-        querysets = self.get_queryset()
-        # results = [*queryset for queryset in querysets]
-        results = []
-        for queryset in querysets:
-            results.extend(queryset)
 
-        # Generate the ID used to identify the object in the results.
-        def get_id(obj):
-            try:
-                return self._id_generators[obj.__class__](obj)
-            except KeyError:
-                # If the model is not in _id_generators, use a fallback that
-                # relies on the model's pk.
-                return self._default_id_generator(obj)
-
-        results = [
-            {
-                "id": get_id(obj),
-                "text": self.serialize(obj),
-            }
-            for obj in results
-        ]
-
-        return JsonResponse(
-            {
-                "results": results,
-            }
-        )
+        results, incomplete = self.get_results()
+        response = {
+            "results": [
+                {"id": self.get_id(entry), "text": self.serialize(entry)}
+                for entries in results.values()
+                for entry in entries
+            ]
+        }
+        if incomplete:
+            # Models still (re)building their index; a later keystroke gets them.
+            response["incomplete"] = [model._meta.label for model in incomplete]
+        return JsonResponse(response)
 
 
 GroupAutocomplete = IPAMSearchAutoComplete.searching_models(Group).always_use_pk()
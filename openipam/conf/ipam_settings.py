@@ -35,6 +35,46 @@ CONFIG_DEFAULTS = {
     "STATIC_HOST_EXPIRY_THRESHOLD_WEEKS": 5 * 52,
     "DYNAMIC_HOST_EXPIRY_THRESHOLD_WEEKS": 2 * 52,
     "NAC_PROFILE_IS_SERVER_PREFIX": "expose_",
+    "PREFIX_INDEX_RECHECK_SECONDS": 5,
+    "PERMISSION_CLOSURE_TIMEOUT": 60 * 60,
+    "HOST_EXPORT_CHUNK_SIZE": 2000,
+    "OUI_INDEX_RECHECK_SECONDS": 60,
+    "DNS_TYPE_REGISTRY_RECHECK_SECONDS": 60,
+    "DOMAIN_INDEX_RECHECK_SECONDS": 5,
+    "DNS_BULK_MAX_RECORDS": 5000,
+    "DNS_EXPORT_CHUNK_SIZE": 2000,
+    "DNS_CHANGE_FEED_LIMIT": 1000,
+    "NOTIFICATION_CHUNK_SIZE": 100,
+    "NOTIFICATION_LDAP_WORKERS": 8,
+    "LDAP_SYNC_PAGE_SIZE": 500,
+    "LDAP_SYNC_WORKERS": 8,
+    "NETWORK_UTILIZATION_BATCH_SIZE": 50,
+    "NETWORK_UTILIZATION_MAX_AGE_SECONDS": 5 * 60,
+    "NETWORK_UTILIZATION_BUCKET_SECONDS": 60 * 60,
+    "NETWORK_UTILIZATION_HISTORY_DAYS": 90,
+    "DASHBOARD_STATS_TTL_SECONDS": 60,
+    "DASHBOARD_STATS_MAX_STALE_SECONDS": 60 * 60,
+    "DASHBOARD_STATS_REFRESH_TIMEOUT": 5 * 60,
+    "STATS_CACHE_SECONDS": 5 * 60,
+    "WEATHERMAP_POLL_SECONDS": 300,
+    "LEASE_USAGE_MAX_AGE_SECONDS": 60,
+    "LEASE_USAGE_REFRESH_TIMEOUT": 10 * 60,
+    "LIBRENMS_MAX_CONNECTIONS": 4,
+    "LIBRENMS_STALE_TIMEOUT": 300,
+    "HOST_SUMMARY_BATCH_SIZE": 1000,
+    "HOST_SUMMARY_MAX_AGE_SECONDS": 5 * 60,
+    "HOST_SUMMARY_REFRESH_TIMEOUT": 5 * 60,
+    "SEARCH_MAX_RESULTS": 100,
+    "AUTOCOMPLETE_RESULTS_PER_MODEL": 5,
+    "AUTOCOMPLETE_BUDGET_SECONDS": 0.25,
+    "AUTOCOMPLETE_WORKERS": 8,
+    "AUTOCOMPLETE_INDEX_RECHECK_SECONDS": 5,
+    # Models and date columns the chart stats API may be asked about.
+    "STATS_ALLOWED_COLUMNS": {
+        "hosts.host": ["changed", "expires"],
+        "user.user": ["date_joined", "last_login"],
+        "dns.dnsrecord": ["changed"],
+    },
 }
 
 USER_CONFIG = getattr(settings, "OPENIPAM", {})
@@ -1,6 +1,5 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Group
 from django.core.mail.backends.smtp import EmailBackend
 from django.core.mail.backends.console import EmailBackend as ConsoleEmailBackend
 
@@ -78,30 +77,14 @@ class _IPAMLDAPUser(_LDAPUser):
     #     self._user.groups = groups
 
     def _mirror_groups(self):
-        source = AuthSource.objects.get(name="LDAP")
-        source_id = source.pk
+        from openipam.user.utils.ldap_sync import mirror_ldap_groups
 
-        target_group_names = frozenset(self._get_groups().get_group_names())
-        static_groups = list(
-            self._user.groups.exclude(source__source=source).iterator()
+        # Groups from other sources (static, django-only groups) are kept.
+        mirror_ldap_groups(
+            {self._user.pk: self._get_groups().get_group_names()},
+            AuthSource.objects.get(name="LDAP"),
         )
 
-        # if target_group_names != current_group_names:
-        existing_groups = list(
-            Group.objects.filter(name__in=target_group_names).iterator()
-        )
-
-        new_groups = []
-        for name in target_group_names:
-            if name not in existing_groups:
-                obj, created = Group.objects.get_or_create(name=name)
-                if obj.source.source_id != source_id:
-                    obj.source.source_id = source_id
-                    obj.source.save()
-                new_groups.append(obj)
-
-        self._user.groups = static_groups + existing_groups + new_groups
-
 
 class LoggingEmailBackend(EmailBackend):
     def send_messages(self, email_messages):
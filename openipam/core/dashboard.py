@@ -12,9 +12,7 @@ And to activate the app index dashboard::
 
 from django.utils.translation import ugettext_lazy as _
 from django.urls import reverse_lazy
-from django.db.models.aggregates import Count
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 
 from admin_tools.dashboard import modules, Dashboard, AppIndexDashboard
 from admin_tools.utils import get_admin_site_name
@@ -22,10 +20,7 @@ from admin_tools.utils import get_admin_site_name
 from openipam.conf.ipam_settings import CONFIG
 from openipam.hosts.models import Host
 from openipam.core.modules import HTMLContentModule
-
-from datetime import datetime
-
-import qsstats
+from openipam.report.stats import cached_period_counts
 
 User = get_user_model()
 
@@ -98,40 +93,12 @@ class IPAMIndexDashboard(Dashboard):
             self.children.append(IPAMAppList(_("Administration"), models=()))
 
         # append recent stats module
-        hosts = Host.objects.all()
-        hosts_stats = qsstats.QuerySetStats(
-            hosts, "changed", aggregate=Count("mac"), today=datetime.now()
+        hosts_stats = cached_period_counts(
+            "hosts.host.changed", Host.objects.all(), "changed"
+        )
+        users_stats = cached_period_counts(
+            "user.user.date_joined", User.objects.all(), "date_joined"
         )
-        users = User.objects.all()
-        users_stats = qsstats.QuerySetStats(users, "date_joined", today=datetime.now())
-
-        hosts_today = cache.get("hosts_today")
-        hosts_week = cache.get("hosts_week")
-        hosts_month = cache.get("hosts_month")
-
-        if hosts_today is None:
-            hosts_today = hosts_stats.this_day()
-            cache.set("hosts_today", hosts_today)
-        if hosts_week is None:
-            hosts_week = hosts_stats.this_week()
-            cache.set("hosts_week", hosts_week)
-        if hosts_month is None:
-            hosts_month = hosts_stats.this_month()
-            cache.set("hosts_month", hosts_month)
-
-        users_today = cache.get("users_today")
-        users_week = cache.get("users_week")
-        users_month = cache.get("users_month")
-
-        if users_today is None:
-            users_today = users_stats.this_day()
-            cache.set("users_today", users_today)
-        if users_week is None:
-            users_week = users_stats.this_week()
-            cache.set("users_week", users_week)
-        if users_month is None:
-            users_month = users_stats.this_month()
-            cache.set("users_month", users_month)
 
         self.children.append(
             HTMLContentModule(
@@ -151,12 +118,12 @@ class IPAMIndexDashboard(Dashboard):
                 </div>
             """
                 % {
-                    "hosts_today": hosts_today,
-                    "hosts_week": hosts_week,
-                    "hosts_month": hosts_month,
-                    "users_today": users_today,
-                    "users_week": users_week,
-                    "users_month": users_month,
+                    "hosts_today": hosts_stats["day"],
+                    "hosts_week": hosts_stats["week"],
+                    "hosts_month": hosts_stats["month"],
+                    "users_today": users_stats["day"],
+                    "users_week": users_stats["week"],
+                    "users_month": users_stats["month"],
                 },
             )
         )
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+
+class RefreshCommand(BaseCommand):
+    """
+    Base for commands that rebuild a rollup table, either the stale rows
+    or (with ``--all``) every row.  Subclasses set ``noun`` and implement
+    ``refresh_all`` and ``refresh_stale``, each returning the number of
+    rows refreshed.
+    """
+
+    noun = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age",
+            action="store",
+            dest="max_age",
+            type=int,
+            default=None,
+            help="only refresh %s refreshed more than this many seconds ago"
+            % self.noun,
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            dest="all",
+            default=False,
+            help="refresh every one of the %s" % self.noun,
+        )
+        parser.add_argument(
+            "--batch-size",
+            action="store",
+            dest="batch_size",
+            type=int,
+            default=None,
+            help="%s to refresh per transaction" % self.noun,
+        )
+
+    def refresh_all(self, batch_size):
+        raise NotImplementedError
+
+    def refresh_stale(self, max_age, batch_size):
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            count = self.refresh_all(batch_size=options["batch_size"])
+        else:
+            count = self.refresh_stale(
+                max_age=options["max_age"], batch_size=options["batch_size"]
+            )
+        self.stdout.write("%s %s refreshed" % (count, self.noun))
@@ -24,6 +24,14 @@ class Command(BaseCommand):
             default=False,
             help="server port",
         )
+        parser.add_argument(
+            "--max-age",
+            action="store",
+            dest="max_age",
+            type=int,
+            default=None,
+            help="recount networks whose utilization is older than this many seconds",
+        )
 
     def handle(self, *args, **options):
         server = options["server"]
@@ -35,4 +43,4 @@ class Command(BaseCommand):
         else:
             port = int(port)
 
-        push_data(server, port)
+        push_data(server, port, max_age=options["max_age"])
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from openipam.core.search import SOURCES, rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search documents behind the global search."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "object_types",
+            nargs="*",
+            help="object types to rebuild (%s); all by default" % ", ".join(SOURCES),
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["object_types"]) - set(SOURCES)
+        if unknown:
+            raise CommandError("Unknown object types: %s" % ", ".join(sorted(unknown)))
+
+        counts = rebuild_search_documents(options["object_types"])
+        for object_type, count in counts.items():
+            self.stdout.write("%s: %s documents" % (object_type, count))
@@ -2,14 +2,16 @@
 Update search fields.
 """
 from __future__ import print_function
+from django.apps import apps
 from django.core.management.base import BaseCommand, CommandError
-from django.core.exceptions import ImproperlyConfigured
-from django.db import models
 
 
 class Command(BaseCommand):
     help = "Update search fields"
-    args = "appname [model]"
+
+    def add_arguments(self, parser):
+        parser.add_argument("app", nargs="?")
+        parser.add_argument("model", nargs="?")
 
     def handle(self, app=None, model=None, **options):
         if not app:
@@ -18,8 +20,8 @@ class Command(BaseCommand):
         # check application
 
         try:
-            app_module = models.get_app(app)
-        except ImproperlyConfigured:
+            app_config = apps.get_app_config(app)
+        except LookupError:
             raise CommandError("There is no enabled application matching '%s'." % app)
 
         app_models = []
@@ -27,13 +29,12 @@ class Command(BaseCommand):
         # get models
 
         if model:
-            m = models.get_model(app, model)
-            if not m:
+            try:
+                app_models.append(app_config.get_model(model))
+            except LookupError:
                 raise CommandError("There is no model '%s'." % model)
-
-            app_models.append(models.get_model(app, model))
         else:
-            app_models += models.get_models(app_module)
+            app_models += app_config.get_models()
 
         # get models only with search managers
 
@@ -0,0 +1,50 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+
+
+class Migration(migrations.Migration):
+    dependencies = [("core", "0001_initial")]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_type", models.CharField(max_length=32)),
+                ("object_id", models.CharField(max_length=255)),
+                ("title", models.CharField(max_length=255)),
+                ("text", models.TextField()),
+                ("vector", django.contrib.postgres.search.SearchVectorField()),
+                ("updated", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "search_documents",
+                "unique_together": {("object_type", "object_id")},
+            },
+        ),
+        migrations.AddIndex(
+            model_name="searchdocument",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["text"],
+                name="search_documents_text_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="searchdocument",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["vector"], name="search_documents_vector"
+            ),
+        ),
+    ]
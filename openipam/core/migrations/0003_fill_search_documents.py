@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def fill_search_documents(apps, schema_editor):
+    # The sources are raw SQL over the live tables, so the historical models
+    # are not needed.
+    from openipam.core.search import rebuild_search_documents
+
+    rebuild_search_documents()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0002_searchdocument"),
+        ("hosts", "0003_hostsummary"),
+        ("network", "0002_networkutilization"),
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop)
+    ]
@@ -1,6 +1,8 @@
 # monkey-pathching django admin
 from django.conf import settings
 from django.contrib.admin import widgets
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django import forms
 from django.db import models
 from django.db.models.signals import post_save
@@ -39,6 +41,36 @@ class FeatureRequest(models.Model):
         ordering = ("-submitted",)
 
 
+class SearchDocument(models.Model):
+    """
+    One searchable object (a host, DNS record, network or user), kept up to
+    date by ``openipam.core.search``.  ``text`` is the lowercased searchable
+    text for trigram matching, and ``vector`` its weighted tsvector.
+    """
+
+    object_type = models.CharField(max_length=32)
+    object_id = models.CharField(max_length=255)
+    title = models.CharField(max_length=255)
+    text = models.TextField()
+    vector = SearchVectorField()
+    updated = models.DateTimeField()
+
+    def __str__(self):
+        return "%s:%s" % (self.object_type, self.object_id)
+
+    class Meta:
+        db_table = "search_documents"
+        unique_together = ("object_type", "object_id")
+        indexes = [
+            GinIndex(
+                fields=["text"],
+                name="search_documents_text_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(fields=["vector"], name="search_documents_vector"),
+        ]
+
+
 class FilteredSelectMultiple(forms.SelectMultiple):
     """
     removing 2 select fields widget
@@ -0,0 +1,281 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection, transaction
+from django.db.models import F, IntegerField, Q
+from django.db.models.functions import Cast, Greatest
+
+from netfields import CidrAddressField, MACAddressField
+
+from openipam.core.utils.on_commit import queue_on_commit
+
+from collections import OrderedDict
+
+# Output fields for casting a document's object_id back to its key.
+KEY_FIELDS = {
+    "integer": IntegerField,
+    "macaddr": MACAddressField,
+    "cidr": CidrAddressField,
+}
+
+
+class SearchSource(object):
+    """
+    How the rows of one table become search documents.
+
+    ``fields`` are ``(sql expression, weight)`` pairs: all of them make up
+    the document text, and each is weighted in its tsvector.  ``model_fields``
+    are the model fields they are built from, so saves that touch none of
+    them (a login updating ``last_login``) are not re-indexed.
+    """
+
+    def __init__(
+        self,
+        object_type,
+        model,
+        permission,
+        table,
+        key,
+        key_type,
+        title,
+        fields,
+        model_fields,
+    ):
+        self.object_type = object_type
+        self.model = model
+        self.permission = permission
+        self.table = table
+        self.key = key
+        self.key_type = key_type
+        self.title = title
+        self.fields = fields
+        self.model_fields = model_fields
+
+    def select_sql(self, where=""):
+        text = "lower(concat_ws(' ', %s))" % ", ".join(sql for sql, _ in self.fields)
+        vector = " || ".join(
+            "setweight(to_tsvector('simple', coalesce(%s, '')), '%s')" % (sql, weight)
+            for sql, weight in self.fields
+        )
+        return """
+            SELECT %(object_type)s, {key}::text, left(coalesce({title}, ''), 255),
+                    {text}, {vector}, now()
+                FROM {table} {where}
+        """.format(
+            key=self.key,
+            title=self.title,
+            text=text,
+            vector=vector,
+            table=self.table,
+            where=where,
+        )
+
+    def refresh(self, ids):
+        """Rebuild the documents of ``ids``, and drop those no longer in the table."""
+        ids_sql = "%%(ids)s::%s[]" % self.key_type
+        params = {"object_type": self.object_type, "ids": [str(pk) for pk in ids]}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                INSERT_QUERY
+                % self.select_sql("WHERE %s = ANY(%s)" % (self.key, ids_sql)),
+                params,
+            )
+            cursor.execute(
+                """
+                DELETE FROM search_documents
+                    WHERE object_type = %%(object_type)s
+                        AND object_id = ANY(SELECT unnest(%(ids)s)::text)
+                        AND object_id <> ALL(
+                            SELECT %(key)s::text FROM %(table)s
+                                WHERE %(key)s = ANY(%(ids)s)
+                        )
+            """
+                % {"ids": ids_sql, "key": self.key, "table": self.table},
+                params,
+            )
+
+    def rebuild(self):
+        """Replace every document of this type in one transaction."""
+        params = {"object_type": self.object_type}
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM search_documents WHERE object_type = %(object_type)s",
+                params,
+            )
+            cursor.execute(INSERT_QUERY % self.select_sql(), params)
+            return cursor.rowcount
+
+
+INSERT_QUERY = """
+    INSERT INTO search_documents (object_type, object_id, title, text, vector, updated)
+    %s
+    ON CONFLICT (object_type, object_id) DO UPDATE SET
+        title = EXCLUDED.title,
+        text = EXCLUDED.text,
+        vector = EXCLUDED.vector,
+        updated = EXCLUDED.updated
+"""
+
+SOURCES = OrderedDict(
+    (source.object_type, source)
+    for source in [
+        SearchSource(
+            "host",
+            "hosts.Host",
+            "hosts.view_host",
+            table="hosts",
+            key="hosts.mac",
+            key_type="macaddr",
+            title="hosts.hostname",
+            fields=[
+                ("hosts.hostname", "A"),
+                ("hosts.mac::text", "A"),
+                ("hosts.description", "B"),
+            ],
+            model_fields=["mac", "hostname", "description"],
+        ),
+        SearchSource(
+            "dns",
+            "dns.DnsRecord",
+            "dns.view_dnsrecord",
+            table="dns_records",
+            key="dns_records.id",
+            key_type="integer",
+            title="dns_records.name",
+            fields=[
+                ("dns_records.name", "A"),
+                ("dns_records.text_content", "B"),
+                ("host(dns_records.ip_content)", "B"),
+            ],
+            model_fields=["name", "text_content", "ip_content"],
+        ),
+        SearchSource(
+            "network",
+            "network.Network",
+            "network.view_network",
+            table="networks",
+            key="networks.network",
+            key_type="cidr",
+            title="networks.network::text",
+            fields=[
+                ("networks.network::text", "A"),
+                ("networks.name", "A"),
+                ("networks.description", "B"),
+            ],
+            model_fields=["network", "name", "description"],
+        ),
+        SearchSource(
+            "user",
+            "user.User",
+            "user.view_user",
+            table="users",
+            key="users.id",
+            key_type="integer",
+            title="users.username",
+            fields=[
+                ("users.username", "A"),
+                ("users.first_name", "B"),
+                ("users.last_name", "B"),
+                ("users.email", "B"),
+            ],
+            model_fields=["username", "first_name", "last_name", "email"],
+        ),
+    ]
+)
+
+
+def source_for_model(model):
+    """Return the ``SearchSource`` indexing ``model``, or None."""
+    label = model._meta.label_lower
+    for source in SOURCES.values():
+        if source.model.lower() == label:
+            return source
+    return None
+
+
+def refresh_search_documents(object_type, ids):
+    """Rebuild the search documents of ``ids`` of ``object_type``."""
+    ids = set(ids)
+    if ids:
+        SOURCES[object_type].refresh(ids)
+    return len(ids)
+
+
+def rebuild_search_documents(object_types=None):
+    """
+    Rebuild every search document of ``object_types`` (all of them by
+    default).  Returns ``{object_type: documents}``.
+    """
+    return OrderedDict(
+        (object_type, source.rebuild())
+        for object_type, source in SOURCES.items()
+        if not object_types or object_type in object_types
+    )
+
+
+def queue_search_refresh(object_type, ids):
+    """
+    Refresh the search documents of ``ids`` once the current transaction
+    commits.  Objects queued by many saves in one transaction are refreshed
+    together.
+    """
+    queue_on_commit(
+        ("search", object_type),
+        (str(pk) for pk in ids if pk is not None),
+        lambda pending: refresh_search_documents(object_type, pending),
+    )
+
+
+def allowed_object_types(user, object_types=None):
+    """The object types (of ``object_types``, if given) ``user`` may view."""
+    return [
+        object_type
+        for object_type, source in SOURCES.items()
+        if (not object_types or object_type in object_types)
+        and user.has_perm(source.permission)
+    ]
+
+
+def search(user, query, object_types=None):
+    """
+    Return the search documents matching ``query`` that ``user`` may view,
+    best first, annotated with ``rank``.
+
+    A document matches if its text contains ``query`` (served by the
+    trigram index) or its tsvector matches it as words.  The rank is the
+    better of the trigram similarity and the weighted full-text rank.
+    """
+    from openipam.core.models import SearchDocument
+
+    query = query.strip().lower()
+    object_types = allowed_object_types(user, object_types)
+    if not query or not object_types:
+        return SearchDocument.objects.none()
+
+    tsquery = SearchQuery(query, config="simple")
+    return (
+        SearchDocument.objects.filter(object_type__in=object_types)
+        .filter(Q(text__contains=query) | Q(vector=tsquery))
+        .annotate(
+            rank=Greatest(
+                TrigramSimilarity("text", query), SearchRank(F("vector"), tsquery)
+            )
+        )
+        .order_by("-rank", "title")
+    )
+
+
+def matching_keys(object_type, value):
+    """
+    A subquery of the primary keys of ``object_type`` whose search text
+    contains ``value``, for narrowing a ``__icontains`` filter to the rows
+    the trigram index finds: ``qs.filter(pk__in=matching_keys("host", v))``.
+    """
+    from openipam.core.models import SearchDocument
+
+    source = SOURCES[object_type]
+    return (
+        SearchDocument.objects.filter(
+            object_type=object_type, text__contains=value.lower()
+        )
+        .annotate(key=Cast("object_id", KEY_FIELDS[source.key_type]()))
+        .values("key")
+    )
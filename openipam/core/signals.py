@@ -0,0 +1,7 @@
+def refresh_search_document(sender, instance, update_fields=None, **kwargs):
+    from openipam.core.search import queue_search_refresh, source_for_model
+
+    source = source_for_model(sender)
+    if update_fields is not None and not set(update_fields) & set(source.model_fields):
+        return
+    queue_search_refresh(source.object_type, [instance.pk])
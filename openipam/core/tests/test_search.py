@@ -0,0 +1,52 @@
+from openipam.core.models import SearchDocument
+from openipam.core.search import (
+    matching_keys,
+    rebuild_search_documents,
+    refresh_search_documents,
+    search,
+)
+from openipam.core.tests.test_models import IPAMTestCase
+from openipam.network.models import Network
+from openipam.user.models import User
+
+
+class SearchDocumentTest(IPAMTestCase):
+    def setUp(self):
+        self.networks = [
+            {"network": "10.9.0.0/24", "name": "searchable-net", "gateway": "10.9.0.1"}
+        ]
+        self.dns_domains = []
+        self.dns_records = []
+        self.hosts = []
+        self.pools = []
+        self.address_types = []
+        return super(SearchDocumentTest, self).setUp()
+
+    def test_rebuild_and_search(self):
+        counts = rebuild_search_documents(["network"])
+        self.assertEqual(list(counts.items()), [("network", 1)])
+
+        results = list(search(self.user_model, "Searchable"))
+        self.assertEqual(
+            [(result.object_type, result.object_id) for result in results],
+            [("network", "10.9.0.0/24")],
+        )
+        self.assertGreater(results[0].rank, 0)
+        self.assertEqual(
+            list(Network.objects.filter(pk__in=matching_keys("network", "able-n"))),
+            list(Network.objects.filter(network="10.9.0.0/24")),
+        )
+
+        nobody = User.objects.create(username="nobody")
+        self.assertEqual(list(search(nobody, "searchable")), [])
+
+    def test_refresh(self):
+        Network.objects.filter(network="10.9.0.0/24").update(name="renamed-net")
+        refresh_search_documents("network", ["10.9.0.0/24"])
+        self.assertIn(
+            "renamed-net", SearchDocument.objects.get(object_type="network").text
+        )
+
+        Network.objects.filter(network="10.9.0.0/24").delete()
+        refresh_search_documents("network", ["10.9.0.0/24"])
+        self.assertFalse(SearchDocument.objects.filter(object_type="network").exists())
@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from openipam.conf.ipam_settings import CONFIG
+
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSnapshot(object):
+    """
+    A read-only copy of some table data, held in process memory.
+
+    Subclasses set ``version_key`` and ``recheck_setting`` and implement
+    ``build()``.  The copy is rebuilt lazily after ``invalidate()``.  Other
+    worker processes notice through a version stamp kept in the Django cache,
+    which is checked at most every ``CONFIG[recheck_setting]`` seconds.
+
+    With ``rebuild_in_background``, a stale copy keeps being served while a
+    background thread rebuilds it, so readers never wait on a rebuild once
+    the first copy exists.
+    """
+
+    version_key = None
+    recheck_setting = None
+    rebuild_in_background = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._checked = 0.0
+        self._rebuild_thread = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def _current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    @property
+    def snapshot(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked < CONFIG.get(
+            self.recheck_setting
+        ):
+            return self._snapshot
+
+        with self._lock:
+            version = self._current_version()
+            if self._snapshot is None or version != self._version:
+                pending = self._pending_invalidation()
+                if pending is not None:
+                    return self._transaction_snapshot(pending)
+                if self._snapshot is not None and self.rebuild_in_background:
+                    self._start_rebuild(version)
+                else:
+                    self._snapshot = self.build()
+                    self._version = version
+            self._checked = now
+            return self._snapshot
+
+    def _start_rebuild(self, version):
+        if self._rebuild_thread is None or not self._rebuild_thread.is_alive():
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild, args=(version,), daemon=True
+            )
+            self._rebuild_thread.start()
+
+    def _rebuild(self, version):
+        try:
+            snapshot = self.build()
+            with self._lock:
+                self._snapshot = snapshot
+                self._version = version
+        except Exception:
+            logger.exception("Rebuilding %s failed", self.version_key)
+        finally:
+            # The build queried the database from this thread.
+            connection.close()
+
+    def _bump_version(self):
+        getattr(connection, "_local_snapshots", {}).pop(self.version_key, None)
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+
+    def _pending_invalidation(self):
+        # The on_commit entry queued by the last invalidate() in this thread's
+        # open transaction, or None.  Committing or rolling back the
+        # transaction (or savepoint) discards the entry.
+        pending = None
+        for entry in connection.run_on_commit:
+            if entry[1] == self._bump_version:
+                pending = entry
+        return pending
+
+    def _transaction_snapshot(self, pending):
+        # A copy built from rows this transaction may still roll back, so it
+        # is kept on the connection rather than shared, and only for as long
+        # as ``pending`` is the transaction's last invalidate().
+        snapshots = getattr(connection, "_local_snapshots", None)
+        if snapshots is None:
+            snapshots = connection._local_snapshots = {}
+        cached = snapshots.get(self.version_key)
+        if cached is None or cached[0] is not pending:
+            cached = snapshots[self.version_key] = (pending, self.build())
+        return cached[1]
+
+    def invalidate(self):
+        # Drop our copy now (or mark it stale, to keep serving it while it is
+        # rebuilt), and tell the other workers once the change is committed.
+        if self.rebuild_in_background:
+            self._version = None
+            self._checked = 0.0
+        else:
+            self._snapshot = None
+        transaction.on_commit(self._bump_version)
@@ -1,28 +1,7 @@
-from django.db import connection
-import socket
-
-available = """count((leases.ends < NOW() AND NOT leases.abandoned) OR (addresses.pool IS NOT NULL AND leases.address IS NULL) OR NULL)"""
-
-query = """SELECT addresses.network,
-  extract(epoch from now())::bigint as epoch,
-  {available} AS available,
-  count(addresses.mac) AS static,
-  count(addresses.pool) AS dynamic,
-  count(leases.address IS NOT NULL AND NOT leases.abandoned AND leases.ends > NOW() OR NULL) AS leased,
-  count(addresses.reserved OR NULL) AS reserved,
-  count(leases.abandoned OR NULL) AS abandoned,
-  count(leases.ends < now() AND NOT leases.abandoned OR NULL) AS expired,
-  count( 1 ) AS total,
-  count(leases.address IS NULL AND addresses.pool IS NOT NULL OR NULL) AS unleased,
-  CASE WHEN count(addresses.pool) > 0
-    THEN {available} / count(addresses.pool)::float
-    ELSE 1.0
-  END AS available_ratio
-FROM addresses LEFT OUTER JOIN leases ON addresses.address = leases.address
-GROUP BY addresses.network;
-"""
+from openipam.network.models import NetworkUtilization
+from openipam.network.utilization import refresh_stale_utilization
 
-query = query.format(available=available)
+import socket
 
 query_colnames = [
     "network",
@@ -40,12 +19,25 @@ query_colnames = [
 ]
 
 
-def push_data(carbon_server, carbon_port):
+def get_counts(max_age=None):
+    """
+    Return one row per network, in ``query_colnames`` order, from the
+    network_utilization rollup.  Networks counted more than ``max_age``
+    seconds ago are recounted first.
+    """
+    refresh_stale_utilization(max_age=max_age)
+    counts = []
+    for utilization in NetworkUtilization.objects.order_by("network"):
+        row = [str(utilization.network_id), int(utilization.refreshed.timestamp())]
+        row += [getattr(utilization, name) for name in query_colnames[2:]]
+        counts.append(row)
+    return counts
+
+
+def push_data(carbon_server, carbon_port, max_age=None):
+    counts = get_counts(max_age=max_age)
     carbon_s = socket.socket()
     carbon_s.connect((carbon_server, carbon_port))
-    cursor = connection.cursor()
-    cursor.execute(query)
-    counts = cursor.fetchall()
     graphite_data = []
     for count in counts:
         net = count[0]
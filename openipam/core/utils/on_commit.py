@@ -0,0 +1,28 @@
+from django.db import transaction
+
+import threading
+
+_pending = threading.local()
+
+
+def _flush(key, fn):
+    queues = getattr(_pending, "queues", None)
+    ids = queues.pop(key, None) if queues else None
+    if ids:
+        fn(ids)
+
+
+def queue_on_commit(key, ids, fn):
+    """
+    Call ``fn`` with ``ids`` once the current transaction commits.  Ids
+    queued under the same ``key`` by many saves in one transaction are
+    collected into one set and handed to ``fn`` in a single call.
+    """
+    ids = set(ids)
+    if not ids:
+        return
+    queues = getattr(_pending, "queues", None)
+    if queues is None:
+        queues = _pending.queues = {}
+    queues.setdefault(key, set()).update(ids)
+    transaction.on_commit(lambda: _flush(key, fn))
@@ -0,0 +1,593 @@
+from django.contrib.admin.models import LogEntry, ADDITION, CHANGE
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.encoding import force_text
+
+from guardian.shortcuts import get_objects_for_user
+
+from openipam.core.search import queue_search_refresh
+from openipam.dns.domain_index import DomainTrie, domain_index
+from openipam.dns.models import DnsRecord, DnsType, Domain
+from openipam.dns.signals import bump_domain_serials
+from openipam.dns.validators import validate_fqdn
+from openipam.hosts.models import Host
+from openipam.network.models import Address
+from openipam.user.utils.permission_closure import get_permission_closure, is_all
+
+from collections import defaultdict
+
+import ipaddress
+
+
+# Relations are checked against the preloaded sets, not one query per record.
+RELATION_FIELDS = [
+    "domain",
+    "host",
+    "dns_type",
+    "dns_view",
+    "ip_content",
+    "changed_by",
+]
+
+UPDATE_FIELDS = [
+    "domain",
+    "host",
+    "dns_type",
+    "name",
+    "text_content",
+    "ip_content",
+    "ttl",
+    "priority",
+    "changed",
+    "changed_by",
+]
+
+
+class DnsRecordBatch(object):
+    """
+    Validate and save a batch of DNS records with a fixed number of queries.
+
+    Each item is a dict with ``name``, ``dns_type`` and ``content``, plus an
+    optional ``ttl``, and an ``id`` when it updates an existing record.  The
+    checks are those of ``DnsManager.add_or_update_record`` and
+    ``DnsRecord.full_clean``, but the user's permissions, the domains, the
+    addresses and hosts referred to, and every existing record sharing a name
+    with the batch are loaded once, and the items are then validated in
+    memory, against the database and against each other.
+
+    Items that fail are reported in ``errors`` by index; the rest are written
+    with ``bulk_create``/``bulk_update`` when ``save()`` is called.
+    """
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = list(items)
+        self.errors = {}
+        self.records = {}
+
+        self.a_type_ids = set(
+            dns_type.pk
+            for dns_type in (DnsType.objects.A, DnsType.objects.AAAA)
+            if dns_type
+        )
+        self.cname_type = DnsType.objects.get_by_name("CNAME")
+
+    def add_error(self, index, field, messages):
+        if isinstance(messages, ValidationError):
+            if hasattr(messages, "error_dict"):
+                for key, value in messages.message_dict.items():
+                    self.add_error(index, key, value)
+                return
+            messages = messages.messages
+        elif isinstance(messages, str):
+            messages = [messages]
+        self.errors.setdefault(index, {}).setdefault(field, []).extend(messages)
+
+    def is_valid(self):
+        self.errors = {}
+        self.records = {}
+
+        parsed = self._parse()
+        self._load(parsed)
+        for index, item in parsed:
+            if index in self.errors:
+                continue
+            try:
+                self.records[index] = self._build(index, item)
+            except ValidationError as e:
+                self.add_error(index, "non_field_errors", e)
+
+        return not self.errors
+
+    def _parse(self):
+        registry = DnsType.objects.registry
+        parsed = []
+        for index, item in enumerate(self.items):
+            if not isinstance(item, dict):
+                self.add_error(index, "non_field_errors", "Expected an object.")
+                continue
+
+            name = str(item.get("name") or "").lower().strip()
+            content = str(item.get("content") or "").strip()
+            dns_type = registry.get_by_name(
+                str(item.get("dns_type") or "").upper().strip()
+            )
+
+            if not name:
+                self.add_error(index, "name", "Domain name cannot be blank.")
+            else:
+                try:
+                    validate_fqdn(name)
+                except ValidationError as e:
+                    self.add_error(index, "name", e)
+            if not dns_type:
+                self.add_error(index, "dns_type", "The Dns Type selected is not valid.")
+            if not content:
+                self.add_error(
+                    index, "content", "Content is required to create a DNS record."
+                )
+
+            record_id = item.get("id")
+            if record_id is not None:
+                try:
+                    record_id = int(record_id)
+                except (TypeError, ValueError):
+                    self.add_error(index, "id", "A valid integer is required.")
+                    record_id = None
+
+            ip_content = None
+            if dns_type and dns_type.is_a_record and content:
+                try:
+                    ip_content = str(ipaddress.ip_address(content))
+                except ValueError:
+                    self.add_error(
+                        index,
+                        "content",
+                        "Static IP does not exist for content: %s" % content,
+                    )
+
+            parsed.append(
+                (
+                    index,
+                    {
+                        "id": record_id,
+                        "name": name,
+                        "dns_type": dns_type,
+                        "content": content,
+                        "ip_content": ip_content,
+                        "ttl": item.get("ttl"),
+                    },
+                )
+            )
+        return parsed
+
+    def _load(self, parsed):
+        user = self.user
+        valid = [item for index, item in parsed if index not in self.errors]
+
+        # Records being updated, and whether the user may change them.
+        ids = set(item["id"] for item in valid if item["id"] is not None)
+        self.existing = DnsRecord.objects.in_bulk(list(ids)) if ids else {}
+        self.changeable_ids = (
+            set(
+                DnsRecord.objects.by_change_perms(user)
+                .filter(pk__in=ids)
+                .values_list("pk", flat=True)
+            )
+            if ids
+            else set()
+        )
+
+        # Permissions
+        self.can_add = user.has_perm("dns.add_dnsrecord")
+        self.dns_type_ids = set(
+            get_objects_for_user(
+                user,
+                ["dns.add_records_to_dnstype", "dns.change_dnstype"],
+                any_perm=True,
+                use_groups=True,
+            ).values_list("pk", flat=True)
+        )
+        self.domain_ids = get_permission_closure(user)["dns_domains"]
+
+        # Domains, from the suffix index, falling back to one query for any
+        # name it has not seen yet.
+        names = set(item["name"] for item in valid)
+        self.domains = {}
+        missing = set()
+        for name in names:
+            domain = domain_index.resolve(name)
+            if domain:
+                self.domains[name] = domain
+            else:
+                missing.add(name)
+        if missing:
+            suffixes = set()
+            for name in missing:
+                labels = name.split(".")
+                suffixes.update(".".join(labels[i:]) for i in range(len(labels)))
+            trie = DomainTrie()
+            for domain in Domain.objects.filter(name__in=suffixes):
+                trie.insert(domain.name, domain)
+            for name in missing:
+                self.domains[name] = trie.longest_match(name)
+
+        # Addresses for A and AAAA records.
+        ips = set(item["ip_content"] for item in valid if item["ip_content"])
+        self.addresses = {}
+        self.dns_addresses = set()
+        if ips:
+            self.addresses = {
+                str(a.address): a for a in Address.objects.filter(address__in=ips)
+            }
+            self.dns_addresses = set(
+                str(address)
+                for address in Address.objects.by_dns_change_perms(user)
+                .filter(address__in=ips)
+                .values_list("address", flat=True)
+            )
+
+        # Hosts named by the content of PTR, HINFO and SSHFP records, through
+        # their A records, and by the content of CNAME, TXT and SRV records.
+        host_contents = set(
+            item["content"]
+            for item in valid
+            if item["dns_type"].name in ["PTR", "HINFO", "SSHFP"]
+        )
+        self.arecord_hosts = {}
+        if host_contents:
+            for name, mac in DnsRecord.objects.filter(
+                name__in=host_contents, ip_content__host__isnull=False
+            ).values_list("name", "ip_content__host_id"):
+                self.arecord_hosts.setdefault(name, str(mac))
+        hostname_contents = set(
+            item["content"]
+            for item in valid
+            if item["dns_type"].name in ["CNAME", "TXT", "SRV"]
+        )
+        self.hostnames = (
+            {
+                hostname: str(mac)
+                for hostname, mac in Host.objects.filter(
+                    hostname__in=hostname_contents
+                ).values_list("hostname", "mac")
+            }
+            if hostname_contents
+            else {}
+        )
+
+        # Addresses of the hosts a PTR may point at.
+        macs = set(self.arecord_hosts.values())
+        macs.update(
+            str(address.host_id)
+            for address in self.addresses.values()
+            if address.host_id
+        )
+        self.host_addresses = defaultdict(set)
+        self.dns_host_macs = set()
+        if macs:
+            for mac, address in Address.objects.filter(host__in=macs).values_list(
+                "host_id", "address"
+            ):
+                self.host_addresses[str(mac)].add(str(address))
+            self.dns_host_macs = set(
+                str(mac)
+                for mac in Address.objects.by_dns_change_perms(user)
+                .filter(host__in=macs)
+                .values_list("host_id", flat=True)
+            )
+
+        # Every existing record sharing a name with the batch, for the
+        # duplicate and CNAME checks.  Rows are (name, type, view, text, ip).
+        self.rows = {}
+        self.rows_by_name = defaultdict(set)
+        if names:
+            for (
+                pk,
+                name,
+                type_id,
+                view_id,
+                text_content,
+                ip_content,
+            ) in DnsRecord.objects.filter(name__in=names).values_list(
+                "pk",
+                "name",
+                "dns_type_id",
+                "dns_view_id",
+                "text_content",
+                "ip_content_id",
+            ):
+                self._add_row(
+                    pk,
+                    (
+                        name,
+                        type_id,
+                        view_id,
+                        text_content,
+                        str(ip_content) if ip_content else None,
+                    ),
+                )
+
+    def _add_row(self, key, row):
+        old = self.rows.get(key)
+        if old:
+            self.rows_by_name[old[0]].discard(key)
+        self.rows[key] = row
+        self.rows_by_name[row[0]].add(key)
+
+    def _others(self, key, name):
+        return [
+            self.rows[other]
+            for other in self.rows_by_name.get(name, ())
+            if other != key
+        ]
+
+    def _build(self, index, item):
+        user = self.user
+        dns_type = item["dns_type"]
+
+        if item["id"] is not None:
+            created = False
+            record = self.existing.get(item["id"])
+            if record is None:
+                raise ValidationError(
+                    {"id": ["DNS record %s does not exist." % item["id"]]}
+                )
+            if record.pk not in self.changeable_ids:
+                raise ValidationError(
+                    "Invalid credentials: user %s does not have permissions to change DNS record %s."
+                    % (user, record.pk)
+                )
+            if dns_type.pk != record.dns_type_id:
+                record.clear_content()
+            key = record.pk
+        else:
+            created = True
+            record = DnsRecord()
+            key = ("new", index)
+            if not self.can_add:
+                raise ValidationError(
+                    "Invalid credentials: user %s does not have permissions"
+                    " to add DNS records. Please contact an IPAM administrator." % user
+                )
+
+        record.changed_by = user
+        record.dns_type = dns_type
+        record.name = item["name"]
+        if item["ttl"]:
+            record.ttl = item["ttl"]
+
+        host_mac = None
+        if dns_type.is_a_record:
+            address = self.addresses.get(item["ip_content"])
+            if address is None:
+                raise ValidationError(
+                    {
+                        "content": [
+                            "Static IP does not exist for content: %s" % item["content"]
+                        ]
+                    }
+                )
+            record.ip_content = address
+            record.text_content = None
+            host_mac = str(address.host_id) if address.host_id else None
+        else:
+            record.ip_content = None
+            record.text_content = item["content"]
+
+        if dns_type.name in ["PTR", "HINFO", "SSHFP"]:
+            host_mac = self.arecord_hosts.get(item["content"])
+            if not host_mac:
+                raise ValidationError(
+                    "An 'A' Record for '%s' needs to exists to create '%s' records."
+                    % (item["content"], dns_type.name)
+                )
+        elif not dns_type.is_a_record:
+            current = str(record.host_id) if record.host_id else None
+            host_mac = self.hostnames.get(item["content"], current)
+        record.host_id = host_mac
+
+        record.set_priority()
+
+        domain = self.domains.get(record.name)
+        if not domain:
+            raise ValidationError(
+                {
+                    "name": [
+                        "Cannot create name %s: no matching domain exists" % record.name
+                    ]
+                }
+            )
+        if domain.type == "SLAVE":
+            raise ValidationError(
+                {
+                    "name": [
+                        "Cannot create name %s: not authoritative for domain"
+                        % record.name
+                    ]
+                }
+            )
+        record.domain = domain
+
+        self._clean(record, key)
+
+        row = (
+            record.name,
+            dns_type.pk,
+            record.dns_view_id,
+            record.text_content,
+            str(record.ip_content_id) if record.ip_content_id else None,
+        )
+        self._add_row(key, row)
+        return record, created
+
+    def _clean(self, record, key):
+        """The checks of ``DnsRecord.full_clean``, against the preloaded data."""
+        errors = {}
+        dns_type = record.dns_type
+
+        try:
+            models.Model.clean_fields(record, exclude=RELATION_FIELDS)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+
+        others = self._others(key, record.name)
+
+        if dns_type.is_a_record:
+            if any(
+                other[1] in self.a_type_ids
+                and other[2] is None
+                and other[4] == str(record.ip_content_id)
+                for other in others
+            ):
+                errors.setdefault("name", []).append(
+                    "Invalid name for A or AAAA record: '%s'. "
+                    "Name already exists for IP '%s'."
+                    % (record.name, record.ip_content_id)
+                )
+
+        if dns_type.is_ptr_record:
+            if "in-addr.arpa" not in record.name and "ip6.arpa" not in record.name:
+                errors.setdefault("name", []).append(
+                    "Invalid name for PTR record: %s" % record.name
+                )
+            elif any(other[1] == dns_type.pk for other in others):
+                errors.setdefault("name", []).append(
+                    "Invalid name for PTR record: %s. Name already exists."
+                    % record.name
+                )
+
+        if record.text_content:
+            try:
+                record.validate_text_content_format()
+                if any(
+                    other[1] == dns_type.pk and other[3] == record.text_content
+                    for other in others
+                ):
+                    raise ValidationError(
+                        "DNS Record with name: '%s', type: '%s', "
+                        "and content: '%s' already exists."
+                        % (record.name, dns_type, record.text_content)
+                    )
+            except ValidationError as e:
+                errors.setdefault("text_content", []).extend(e.messages)
+
+        if record.priority is None and dns_type.name in ["MX", "SRV"]:
+            errors.setdefault("priority", []).append(
+                "Priority must exist for MX and SRV records."
+            )
+
+        if dns_type.is_cname_record:
+            if record.name == record.text_content:
+                errors.setdefault("dns_type", []).append(
+                    "Name and Text Content cannot match for CNAME records."
+                )
+            if any(other[1] == dns_type.pk for other in others):
+                errors.setdefault("dns_type", []).append(
+                    "Trying to create CNAME record while other records exist: %s"
+                    % record.name
+                )
+        elif self.cname_type and any(
+            other[1] == self.cname_type.pk and other[2] == record.dns_view_id
+            for other in others
+        ):
+            errors.setdefault("dns_type", []).append(
+                "Trying to create record while CNAME record exists:  %s" % record.name
+            )
+
+        if errors:
+            raise ValidationError(errors)
+
+        self._clean_relations(record)
+
+    def _clean_relations(self, record):
+        """The checks of ``DnsRecord.clean``, against the preloaded data."""
+        user = self.user
+        dns_type = record.dns_type
+
+        if dns_type.is_host_type and not record.host_id:
+            raise ValidationError(
+                "A Host needs to be assigned DNS Records of type '%s'" % dns_type.name
+            )
+
+        if dns_type.is_ptr_record:
+            address = record.name.split(".")
+            address.reverse()
+            address = ".".join(address[2:])
+            if address not in self.host_addresses.get(record.host_id, ()):
+                raise ValidationError(
+                    "Invalid PTR Record.  Host %s has no address %s."
+                    % (record.text_content, address)
+                )
+
+        if dns_type.pk not in self.dns_type_ids:
+            raise ValidationError(
+                "Invalid credentials: user %s does not have permissions"
+                " to add '%s' records" % (user, dns_type.name)
+            )
+
+        if not is_all(self.domain_ids) and str(record.domain_id) not in self.domain_ids:
+            raise ValidationError(
+                "Invalid credentials: user %s does not have permissions"
+                " to add DNS records to the domain provided. Please "
+                "contact an IPAM administrator to ensure you have "
+                "the proper permissions." % user
+            )
+
+        if dns_type.is_a_record and str(record.ip_content_id) not in self.dns_addresses:
+            raise ValidationError(
+                "Invalid credentials: user %s does not have permissions"
+                " to add DNS records to the address provided. "
+                "Please contact an IPAM administrator "
+                "to ensure you have the proper host and/or network permissions." % user
+            )
+
+        if dns_type.is_ptr_record and record.host_id not in self.dns_host_macs:
+            raise ValidationError(
+                "Invalid credentials: user %s does not have permissions"
+                " to add or modify DNS Records for Host '%s'"
+                % (user, record.text_content)
+            )
+
+    def save(self, change_message="API bulk call."):
+        """Write the valid records and their log entries; returns them by index."""
+        created = [record for record, is_new in self.records.values() if is_new]
+        updated = [record for record, is_new in self.records.values() if not is_new]
+
+        now = timezone.now()
+        for record in updated:
+            # bulk_update does not apply auto_now.
+            record.changed = now
+
+        with transaction.atomic():
+            DnsRecord.objects.bulk_create(created)
+            DnsRecord.objects.bulk_update(updated, UPDATE_FIELDS)
+
+            content_type_id = ContentType.objects.get_for_model(DnsRecord).pk
+            LogEntry.objects.bulk_create(
+                [
+                    LogEntry(
+                        user_id=self.user.pk,
+                        content_type_id=content_type_id,
+                        object_id=str(record.pk),
+                        object_repr=force_text(record)[:200],
+                        action_flag=ADDITION if is_new else CHANGE,
+                        change_message=change_message,
+                    )
+                    for record, is_new in self.records.values()
+                ]
+            )
+
+            # bulk_create and bulk_update send no post_save signals.
+            domain_ids = set()
+            for record, is_new in self.records.values():
+                domain_ids.add(record.domain_id)
+                domain_ids.add(getattr(record, "_loaded_domain_id", None))
+            bump_domain_serials(domain_ids)
+            queue_search_refresh(
+                "dns", [record.pk for record, _ in self.records.values()]
+            )
+
+        return self.records
@@ -0,0 +1,123 @@
+from django.db.models import Q
+
+from openipam.core.utils.local_snapshot import LocalSnapshot
+
+from functools import reduce
+
+import operator
+import re
+
+
+# Domains per generated regex; keeps each pattern well inside PostgreSQL's
+# regex size limits.
+_REGEX_CHUNK = 200
+
+
+class DomainTrie(object):
+    """
+    Trie of domain names keyed on their labels, right to left.
+
+    Each node is a ``[children, value]`` list, so finding the longest stored
+    suffix of a name is one dict lookup per label.
+    """
+
+    def __init__(self, names=()):
+        self._root = [{}, None]
+        for name in names:
+            self.insert(name, name)
+
+    @staticmethod
+    def _labels(name):
+        return reversed(name.strip().rstrip(".").split("."))
+
+    def insert(self, name, value):
+        node = self._root
+        for label in self._labels(name):
+            node = node[0].setdefault(label, [{}, None])
+        node[1] = value
+
+    def longest_match(self, name):
+        found = None
+        node = self._root
+        for label in self._labels(name):
+            node = node[0].get(label)
+            if node is None:
+                break
+            if node[1] is not None:
+                found = node[1]
+        return found
+
+    def shortest_match(self, name):
+        node = self._root
+        for label in self._labels(name):
+            node = node[0].get(label)
+            if node is None:
+                return None
+            if node[1] is not None:
+                return node[1]
+        return None
+
+
+def collapse_domains(domain_names):
+    """Drop names that are subdomains of another name in ``domain_names``."""
+    trie = DomainTrie(domain_names)
+    return sorted(
+        set(name for name in domain_names if trie.shortest_match(name) == name)
+    )
+
+
+def names_under(names, domain_names):
+    """Return the members of ``names`` that are, or fall under, one of ``domain_names``."""
+    trie = DomainTrie(domain_names)
+    return set(name for name in names if trie.shortest_match(name) is not None)
+
+
+def names_under_q(field, domain_names):
+    """
+    Build one filter matching ``field`` values that are, or fall under, one of
+    ``domain_names``.  Returns None when ``domain_names`` is empty.
+    """
+    domains = collapse_domains(domain_names)
+    if not domains:
+        return None
+
+    q_list = [Q(**{"%s__in" % field: domains})]
+    for i in range(0, len(domains), _REGEX_CHUNK):
+        pattern = "|".join(re.escape(name) for name in domains[i : i + _REGEX_CHUNK])
+        q_list.append(Q(**{"%s__regex" % field: r"\.(%s)$" % pattern}))
+    return reduce(operator.or_, q_list)
+
+
+class DomainSuffixIndex(LocalSnapshot):
+    """
+    Process-local map from a DNS name to its authoritative ``Domain``,
+    rebuilt after the dns signals invalidate it.
+    """
+
+    version_key = "ipam_domain_suffix_index_version"
+    recheck_setting = "DOMAIN_INDEX_RECHECK_SECONDS"
+
+    def build(self):
+        from openipam.dns.models import Domain
+
+        # Store raw rows and build a fresh instance per lookup, so callers
+        # never share (or save back) a cached object.
+        field_names = [field.attname for field in Domain._meta.concrete_fields]
+        trie = DomainTrie()
+        for values in Domain.objects.values_list(*field_names):
+            trie.insert(values[field_names.index("name")], values)
+        trie.field_names = field_names
+        return trie
+
+    def resolve(self, name):
+        """Return the most specific ``Domain`` containing ``name``, or None."""
+        from openipam.dns.models import Domain
+
+        snapshot = self.snapshot
+        values = snapshot.longest_match(name)
+        if values is None:
+            return None
+        return Domain.from_db(Domain.objects.db, snapshot.field_names, values)
+
+
+domain_index = DomainSuffixIndex()
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from openipam.dns.models import Domain, DnsView
+from openipam.dns.zone_export import iter_json_lines, iter_zone_file
+
+
+class Command(BaseCommand):
+    args = ""
+    help = "Write a domain's DNS records to stdout as a zone file or JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("domain", help="Name of the domain to export")
+        parser.add_argument(
+            "--jsonl",
+            action="store_true",
+            help="Write one JSON object per record instead of a zone file",
+        )
+        parser.add_argument("--view", help="Include the records of this DNS view")
+
+    def handle(self, *args, **options):
+        try:
+            domain = Domain.objects.get(name=options["domain"])
+            view = (
+                DnsView.objects.get(name=options["view"]) if options["view"] else None
+            )
+        except (Domain.DoesNotExist, DnsView.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        lines = iter_json_lines if options["jsonl"] else iter_zone_file
+        for line in lines(domain, view=view):
+            self.stdout.write(line, ending="")
@@ -1,4 +1,5 @@
-from django.db.models import Manager, Q
+from django.db.models import F, Manager, Q, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.core.exceptions import ValidationError
 from django.db.models.query import QuerySet
 from django.contrib.auth import get_user_model
@@ -6,13 +7,13 @@ from django.contrib.auth.models import Group
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE
 from django.contrib.contenttypes.models import ContentType
 from django.utils.encoding import force_text
-from django.core.cache import cache
-
-from functools import reduce
 
 from guardian.shortcuts import get_objects_for_user, get_objects_for_group
 
-import operator
+from openipam.core.utils.local_snapshot import LocalSnapshot
+from openipam.user.utils.permission_closure import closure_q, get_permission_closure
+
+import time
 
 
 class DomainQuerySet(QuerySet):
@@ -104,23 +105,27 @@ class DomainQuerySet(QuerySet):
             else:
                 return self.all()
         else:
-            domain_perms = get_objects_for_user(
-                user,
-                [
-                    "dns.is_owner_domain",
-                    "dns.add_records_to_domain",
-                    "dns.change_domain",
-                ],
-                any_perm=True,
-            ).values_list("name", flat=True)
+            closure = get_permission_closure(user)
 
-            qs = self.filter(name__in=list(domain_perms))
+            qs = self.filter(closure_q(closure, "dns_domains", "pk"))
 
             if pk:
                 qs = qs.filter(pk=pk).first()
 
             return qs
 
+    def bump_serial(self):
+        """
+        Advance ``notified_serial`` on these domains so DNS servers polling it
+        know to fetch the change feed.  Serials follow the clock (seconds since
+        the epoch) but always increase.
+        """
+        return self.update(
+            notified_serial=Greatest(
+                Coalesce(F("notified_serial"), 0) + 1, Value(int(time.time()))
+            )
+        )
+
 
 class DNSQuerySet(QuerySet):
     def by_change_perms(self, user_or_group, pk=None, ids_only=False):
@@ -135,42 +140,21 @@ class DNSQuerySet(QuerySet):
             else:
                 return self.all()
         else:
-            if isinstance(user_or_group, User):
-                get_objects_for_user_or_group = get_objects_for_user
-            elif isinstance(user_or_group, Group):
-                get_objects_for_user_or_group = get_objects_for_group
-            else:
+            from openipam.hosts.models import Host
+
+            if not isinstance(user_or_group, (User, Group)):
                 raise Exception("A valid user or goup must is required.")
 
-            host_perms = get_objects_for_user_or_group(
-                user_or_group,
-                ["hosts.is_owner_host", "hosts.change_host"],
-                any_perm=True,
-            )
-            host_perms_mac_list = [host.mac for host in host_perms]
-            host_perms_name_list = [host.hostname for host in host_perms]
-            domain_perms = get_objects_for_user_or_group(
-                user_or_group,
-                ["dns.is_owner_domain", "dns.change_domain"],
-                any_perm=True,
-            ).values_list("name", flat=True)
-            network_perms = get_objects_for_user_or_group(
-                user_or_group,
-                ["network.is_owner_network", "network.change_network"],
-                any_perm=True,
-            ).values_list("network", flat=True)
+            closure = get_permission_closure(user_or_group)
+            host_q = closure_q(closure, "hosts", "mac")
 
             qs = self.filter(
-                Q(ip_content__host__in=host_perms_mac_list)
-                | Q(text_content__in=host_perms_name_list)
-                | Q(ip_content__network__in=network_perms)
+                Q(ip_content__host__in=Host.objects.filter(host_q).values("mac"))
+                | Q(text_content__in=Host.objects.filter(host_q).values("hostname"))
+                | closure_q(closure, "networks", "ip_content__network")
+                | closure_q(closure, "domains", "domain")
             )
 
-            domain_q_list = [Q(domain__name=domain) for domain in domain_perms]
-            if domain_q_list:
-                domain_qs = self.filter(reduce(operator.or_, domain_q_list))
-                qs = qs | domain_qs
-
             if pk:
                 qs = qs.filter(mac=pk)
                 return qs[0] if qs else None
@@ -262,31 +246,91 @@ class DnsManager(Manager):
             raise ValidationError("Static IP does not exist for content: %s" % content)
 
 
+class DnsTypeRegistry(object):
+    """
+    Read-only view of the ``dns_types`` table, indexed by name and by id.
+
+    Rows are stored as values and each lookup builds a fresh ``DnsType``, so
+    callers never share (or save back) a cached object.  The
+    ``is_<name>_record`` flags are worked out once per type and set on each
+    instance, so they do not go through ``DnsType.__getattr__``.
+    """
+
+    def __init__(self, model, field_names, rows):
+        self.model = model
+        self.field_names = field_names
+        rows = list(rows)
+        name_index = field_names.index("name")
+        pk_index = field_names.index(model._meta.pk.attname)
+
+        flag_names = set(row[name_index].lower() for row in rows)
+        flag_names.add("a")
+        self._flags = {}
+        for row in rows:
+            dns_type = model.from_db(model._base_manager.db, field_names, row)
+            self._flags[row[pk_index]] = {
+                flag: getattr(dns_type, flag)
+                for flag in ("is_%s_record" % flag_name for flag_name in flag_names)
+            }
+
+        self._by_name = {row[name_index]: row for row in rows}
+        self._by_id = {row[pk_index]: row for row in rows}
+
+    def _instance(self, row):
+        if row is None:
+            return None
+        dns_type = self.model.from_db(
+            self.model._base_manager.db, self.field_names, row
+        )
+        dns_type.__dict__.update(self._flags[dns_type.pk])
+        return dns_type
+
+    def get_by_name(self, name):
+        return self._instance(self._by_name.get(name))
+
+    def get_by_id(self, pk):
+        return self._instance(self._by_id.get(pk))
+
+
+class DnsTypeIndex(LocalSnapshot):
+    version_key = "ipam_dns_type_registry_version"
+    recheck_setting = "DNS_TYPE_REGISTRY_RECHECK_SECONDS"
+
+    def build(self):
+        from openipam.dns.models import DnsType
+
+        field_names = [field.attname for field in DnsType._meta.concrete_fields]
+        return DnsTypeRegistry(
+            DnsType, field_names, DnsType._base_manager.values_list(*field_names)
+        )
+
+
+dns_type_index = DnsTypeIndex()
+
+
 class DnsTypeManager(Manager):
     @property
-    def _cached_queryset(self):
-        queryset = cache.get("ipam_dns_types")
-        if not queryset:
-            queryset = list(super(DnsTypeManager, self).get_queryset().all())
-            cache.set("ipam_dns_types", queryset)
-        return queryset
+    def registry(self):
+        return dns_type_index.snapshot
+
+    def get_by_name(self, name):
+        return self.registry.get_by_name(name)
+
+    def get_by_id(self, pk):
+        return self.registry.get_by_id(pk)
 
     @property
     def A(self):
-        filtered = [record for record in self._cached_queryset if record.name == "A"]
-        return filtered[0] if filtered else None
+        return self.get_by_name("A")
 
     @property
     def AAAA(self):
-        filtered = [record for record in self._cached_queryset if record.name == "AAAA"]
-        return filtered[0] if filtered else None
+        return self.get_by_name("AAAA")
 
     @property
     def PTR(self):
-        filtered = [record for record in self._cached_queryset if record.name == "PTR"]
-        return filtered[0] if filtered else None
+        return self.get_by_name("PTR")
 
     @property
     def MX(self):
-        filtered = [record for record in self._cached_queryset if record.name == "MX"]
-        return filtered[0] if filtered else None
+        return self.get_by_name("MX")
@@ -1,7 +1,7 @@
 from django.db import models
 from django.db.models import Q
 from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_save, post_delete
 from django.conf import settings
 
 from openipam.dns.managers import (
@@ -16,6 +16,13 @@ from openipam.dns.validators import (
     validate_srv_content,
     validate_sshfp_content,
 )
+from openipam.dns.domain_index import domain_index
+from openipam.core.signals import refresh_search_document
+from openipam.dns.signals import (
+    bump_record_domain_serial,
+    invalidate_dns_type_registry,
+    invalidate_domain_index,
+)
 from openipam.user.signals import remove_obj_perms_connected_with_user
 
 from guardian.shortcuts import get_objects_for_user
@@ -99,6 +106,13 @@ class DnsRecord(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(DnsRecord, cls).from_db(db, field_names, values)
+        # So a record moved to another domain bumps the serial of both.
+        instance._loaded_domain_id = instance.__dict__.get("domain_id")
+        return instance
+
     @property
     def content(self):
         return self.ip_content if self.ip_content else self.text_content
@@ -279,25 +293,28 @@ class DnsRecord(models.Model):
                         {"name": ["Invalid name for PTR record: %s. Name already exists." % self.name]}
                     )
 
-    def clean_text_content(self):
+    def validate_text_content_format(self):
         # Validate text content based on dns type
         # TODO: more of these need to be added
-        try:
-            if self.text_content:
-                if self.dns_type.name in ["NS", "CNAME", "PTR", "MX"]:
-                    validate_fqdn(self.text_content)
+        if self.dns_type.name in ["NS", "CNAME", "PTR", "MX"]:
+            validate_fqdn(self.text_content)
+
+        elif self.dns_type.is_soa_record:
+            validate_soa_content(self.text_content)
 
-                elif self.dns_type.is_soa_record:
-                    validate_soa_content(self.text_content)
+        elif self.dns_type.is_srv_record:
+            validate_srv_content(self.text_content)
 
-                elif self.dns_type.is_srv_record:
-                    validate_srv_content(self.text_content)
+        elif self.dns_type.is_sshfp_record:
+            validate_sshfp_content(self.text_content)
 
-                elif self.dns_type.is_sshfp_record:
-                    validate_sshfp_content(self.text_content)
+        elif self.dns_type.is_a_record:
+            raise ValidationError("Text Content should not be assigned with A records.")
 
-                elif self.dns_type.is_a_record:
-                    raise ValidationError("Text Content should not be assigned with A records.")
+    def clean_text_content(self):
+        try:
+            if self.text_content:
+                self.validate_text_content_format()
 
                 # Validate Existing Records
                 dns_exists = DnsRecord.objects.filter(
@@ -377,12 +394,15 @@ class DnsRecord(models.Model):
                 names_list.append(Q(name=".".join(names)))
                 names.pop(0)
             if names_list:
-                domain = (
-                    Domain.objects.filter(reduce(operator.or_, names_list))
-                    .extra(select={"length": "Length(name)"})
-                    .order_by("-length")
-                    .first()
-                )
+                domain = domain_index.resolve(self.name)
+                if not domain:
+                    # The index may not have seen a domain created moments ago.
+                    domain = (
+                        Domain.objects.filter(reduce(operator.or_, names_list))
+                        .extra(select={"length": "Length(name)"})
+                        .order_by("-length")
+                        .first()
+                    )
                 if domain:
                     self.domain = domain
                 else:
@@ -474,15 +494,12 @@ class DnsType(models.Model):
         return "%s" % self.name
 
     def __getattr__(self, name):
+        # Types from DnsType.objects.registry have these flags precomputed.
         if name.startswith("is_") and name.endswith("_record"):
-
-            def _is_record(abrev):
-                if abrev == "a":
-                    return True if self.name in ["A", "AAAA"] else False
-                else:
-                    return True if self.name == abrev.upper() else False
-
-            return _is_record(name.split("_")[1])
+            abrev = name.split("_")[1]
+            if abrev == "a":
+                return self.name in ["A", "AAAA"]
+            return self.name == abrev.upper()
         else:
             raise AttributeError("%r object has no attribute %r" % (self.__class__, name))
 
@@ -580,3 +597,11 @@ class RecordMunged(models.Model):
 
 # Register Signals
 pre_delete.connect(remove_obj_perms_connected_with_user, sender=DnsType)
+post_save.connect(invalidate_dns_type_registry, sender=DnsType)
+post_delete.connect(invalidate_dns_type_registry, sender=DnsType)
+post_save.connect(invalidate_domain_index, sender=Domain)
+post_delete.connect(invalidate_domain_index, sender=Domain)
+post_save.connect(bump_record_domain_serial, sender=DnsRecord)
+post_delete.connect(bump_record_domain_serial, sender=DnsRecord)
+post_save.connect(refresh_search_document, sender=DnsRecord)
+post_delete.connect(refresh_search_document, sender=DnsRecord)
@@ -0,0 +1,34 @@
+from openipam.core.utils.on_commit import queue_on_commit
+
+
+def invalidate_dns_type_registry(sender, **kwargs):
+    from openipam.dns.managers import dns_type_index
+
+    dns_type_index.invalidate()
+
+
+def invalidate_domain_index(sender, **kwargs):
+    from openipam.dns.domain_index import domain_index
+
+    domain_index.invalidate()
+
+
+def _bump_serials(domain_ids):
+    from openipam.dns.models import Domain
+
+    Domain.objects.filter(pk__in=domain_ids).bump_serial()
+
+
+def bump_domain_serials(domain_ids):
+    """
+    Bump ``notified_serial`` on ``domain_ids`` once the transaction commits.
+    Domains queued by many record changes in one transaction are bumped in
+    one statement.
+    """
+    queue_on_commit("domain_serials", (pk for pk in domain_ids if pk), _bump_serials)
+
+
+def bump_record_domain_serial(sender, instance, **kwargs):
+    bump_domain_serials(
+        [instance.domain_id, getattr(instance, "_loaded_domain_id", None)]
+    )
@@ -7,6 +7,9 @@ Replace this with more appropriate tests for your application.
 
 from django.test import TestCase
 
+from openipam.core.tests.test_models import IPAMTestCase
+from openipam.hosts.models import Host
+
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,3 +17,190 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class DnsTypeRegistryTest(TestCase):
+    fixtures = ["dns_types"]
+
+    def test_registry(self):
+        from openipam.dns.models import DnsType
+
+        a_type = DnsType.objects.A
+        with self.assertNumQueries(0):
+            self.assertEqual(DnsType.objects.A, a_type)
+            self.assertEqual(DnsType.objects.get_by_id(a_type.pk), a_type)
+            self.assertTrue(DnsType.objects.AAAA.is_a_record)
+            self.assertFalse(DnsType.objects.PTR.is_a_record)
+            self.assertTrue(DnsType.objects.MX.is_mx_record)
+
+            # Each lookup is a separate copy of the cached row.
+            self.assertIsNot(DnsType.objects.A, a_type)
+            a_type.name = "changed"
+            self.assertEqual(DnsType.objects.get_by_name("A").name, "A")
+
+
+class DomainTrieTest(TestCase):
+    def test_suffix_matching(self):
+        from openipam.dns.domain_index import (
+            DomainTrie,
+            collapse_domains,
+            names_under,
+        )
+
+        trie = DomainTrie(["usu.edu", "it.usu.edu"])
+        self.assertEqual(trie.longest_match("host.it.usu.edu"), "it.usu.edu")
+        self.assertEqual(trie.longest_match("host.usu.edu"), "usu.edu")
+        self.assertIsNone(trie.longest_match("notusu.edu"))
+
+        self.assertEqual(collapse_domains(["it.usu.edu", "usu.edu"]), ["usu.edu"])
+        self.assertEqual(
+            names_under(["a.usu.edu", "usu.edu", "badusu.edu"], ["usu.edu"]),
+            {"a.usu.edu", "usu.edu"},
+        )
+
+
+class DnsRecordBatchTest(IPAMTestCase):
+    networks = [
+        {
+            "network": "192.168.0.0/24",
+            "name": "rfc1918-192-168-0",
+            "gateway": "192.168.0.1",
+        }
+    ]
+    dns_domains = [
+        {"name": "valid", "type": "NATIVE"},
+        {"name": "slave", "type": "SLAVE"},
+    ]
+    dns_records = []
+    pools = []
+    address_types = []
+    hosts = [
+        {
+            "hostname": "static-host.valid",
+            "mac": "ffffff000000",
+            "address": "192.168.0.3",
+        }
+    ]
+
+    def test_bulk_records(self):
+        from django.contrib.admin.models import LogEntry
+        from openipam.dns.bulk import DnsRecordBatch
+        from openipam.dns.models import DnsRecord
+
+        items = [
+            {"name": "static-host.valid", "dns_type": "A", "content": "192.168.0.3"},
+            {"name": "www.valid", "dns_type": "CNAME", "content": "static-host.valid"},
+            {"name": "www.valid", "dns_type": "CNAME", "content": "other.valid"},
+            {"name": "txt.valid", "dns_type": "TXT", "content": "hello"},
+            {"name": "txt.slave", "dns_type": "TXT", "content": "hello"},
+            {"name": "missing.valid", "dns_type": "A", "content": "10.0.0.1"},
+        ]
+        batch = DnsRecordBatch(self.user_model, items)
+        self.assertFalse(batch.is_valid())
+        self.assertEqual(sorted(batch.errors), [2, 4, 5])
+
+        records = batch.save()
+        self.assertEqual(sorted(records), [0, 1, 3])
+        self.assertEqual(str(records[0][0].host_id), str(Host.objects.get().mac))
+        self.assertEqual(records[1][0].host.hostname, "static-host.valid")
+        self.assertEqual(
+            DnsRecord.objects.filter(name__in=["www.valid", "txt.valid"]).count(), 2
+        )
+        self.assertEqual(LogEntry.objects.count(), 3)
+
+        update = DnsRecordBatch(
+            self.user_model,
+            [
+                {
+                    "id": records[3][0].pk,
+                    "name": "txt.valid",
+                    "dns_type": "TXT",
+                    "content": "changed",
+                }
+            ],
+        )
+        self.assertTrue(update.is_valid())
+        update.save()
+        self.assertEqual(
+            DnsRecord.objects.get(pk=records[3][0].pk).text_content, "changed"
+        )
+
+        # Ids are cast in the parse step; a non-numeric id fails only its item.
+        update = DnsRecordBatch(
+            self.user_model,
+            [
+                {
+                    "id": str(records[3][0].pk),
+                    "name": "txt.valid",
+                    "dns_type": "TXT",
+                    "content": "string id",
+                },
+                {"id": "x", "name": "txt.valid", "dns_type": "TXT", "content": "x"},
+            ],
+        )
+        self.assertFalse(update.is_valid())
+        self.assertEqual(list(update.errors), [1])
+        self.assertIn("id", update.errors[1])
+        update.save()
+        self.assertEqual(
+            DnsRecord.objects.get(pk=records[3][0].pk).text_content, "string id"
+        )
+
+
+class ZoneExportTest(IPAMTestCase):
+    networks = [
+        {
+            "network": "192.168.0.0/24",
+            "name": "rfc1918-192-168-0",
+            "gateway": "192.168.0.1",
+        }
+    ]
+    dns_domains = [{"name": "valid", "type": "NATIVE"}]
+    dns_records = [
+        {
+            "name": "valid",
+            "dns_type": "SOA",
+            "text_content": "ns.valid hostmaster@valid 1 10800 3600 604800 3600",
+        },
+        {"name": "www.valid", "dns_type": "CNAME", "text_content": "host.valid"},
+        {
+            "name": "valid",
+            "dns_type": "MX",
+            "text_content": "mail.valid",
+            "priority": 10,
+        },
+        {"name": "valid", "dns_type": "TXT", "text_content": 'say "hi"'},
+    ]
+    pools = []
+    address_types = []
+    hosts = []
+
+    def test_zone_file(self):
+        from openipam.dns.models import Domain
+        from openipam.dns.zone_export import iter_zone_file
+
+        domain = Domain.objects.get(name="valid")
+        Domain.objects.filter(pk=domain.pk).bump_serial()
+        domain.refresh_from_db()
+        self.assertTrue(domain.notified_serial)
+
+        lines = list(iter_zone_file(domain))
+        self.assertEqual(lines[0], "$ORIGIN valid.\n")
+        self.assertEqual(
+            lines[1],
+            "valid. 14400 IN SOA ns.valid. hostmaster.valid. %s 10800 3600 604800 3600\n"
+            % domain.notified_serial,
+        )
+        self.assertEqual(
+            lines[2:],
+            [
+                "valid. 14400 IN MX 10 mail.valid.\n",
+                'valid. 14400 IN TXT "say \\"hi\\""\n',
+                "www.valid. 14400 IN CNAME host.valid.\n",
+            ],
+        )
+
+        serial = domain.notified_serial
+        Domain.objects.filter(pk=domain.pk).bump_serial()
+        domain.refresh_from_db()
+        self.assertGreater(domain.notified_serial, serial)
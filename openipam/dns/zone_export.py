@@ -0,0 +1,188 @@
+from django.db.models import Q
+
+from openipam.conf.ipam_settings import CONFIG
+from openipam.dns.models import DnsRecord
+
+import json
+
+
+RECORD_FIELDS = (
+    "pk",
+    "name",
+    "dns_type__name",
+    "ttl",
+    "priority",
+    "text_content",
+    "ip_content",
+)
+
+# Types whose content is a single domain name.
+NAME_CONTENT_TYPES = ("CNAME", "NS", "PTR", "DNAME")
+
+QUOTED_CONTENT_TYPES = ("TXT", "SPF")
+
+
+def _absolute(name):
+    return name if name.endswith(".") else name + "."
+
+
+def _quote(text):
+    if text.startswith('"'):
+        return text
+    return '"%s"' % text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _record_dict(row):
+    pk, name, dns_type, ttl, priority, text_content, ip_content = row
+    return {
+        "id": pk,
+        "name": name,
+        "type": dns_type,
+        "ttl": ttl,
+        "priority": priority,
+        "content": str(ip_content) if ip_content else text_content,
+    }
+
+
+def zone_records(domain, view=None, chunk_size=None):
+    """
+    Yield the records of ``domain`` as dicts, SOA first, then by name.
+
+    Records without a view are in every view; ``view`` adds the ones specific
+    to it.  The rows are read through a server-side cursor, ``chunk_size`` at
+    a time, so a large domain is never held in memory.
+    """
+    chunk_size = chunk_size or CONFIG.get("DNS_EXPORT_CHUNK_SIZE")
+
+    records = DnsRecord.objects.filter(domain=domain)
+    if view:
+        records = records.filter(Q(dns_view__isnull=True) | Q(dns_view=view))
+    else:
+        records = records.filter(dns_view__isnull=True)
+
+    soa = records.filter(dns_type__name="SOA")
+    for row in soa.order_by("pk").values_list(*RECORD_FIELDS):
+        yield _record_dict(row)
+
+    rows = (
+        records.exclude(dns_type__name="SOA")
+        .order_by("name", "dns_type__name", "pk")
+        .values_list(*RECORD_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield _record_dict(row)
+
+
+def zone_file_line(record, serial=None):
+    """Format one record dict as an RFC 1035 master file line."""
+    dns_type = record["type"]
+    content = record["content"] or ""
+
+    if dns_type in NAME_CONTENT_TYPES:
+        content = _absolute(content)
+    elif dns_type == "MX":
+        content = "%s %s" % (record["priority"], _absolute(content))
+    elif dns_type == "SRV":
+        # weight port target
+        fields = content.split(" ")
+        fields[-1] = _absolute(fields[-1])
+        content = "%s %s" % (record["priority"], " ".join(fields))
+    elif dns_type == "SOA":
+        # mname rname serial refresh retry expire minimum
+        fields = content.split(" ")
+        fields[0] = _absolute(fields[0])
+        fields[1] = _absolute(fields[1].replace("@", "."))
+        if serial:
+            fields[2] = str(serial)
+        content = " ".join(fields)
+    elif dns_type in QUOTED_CONTENT_TYPES:
+        content = _quote(content)
+
+    ttl = "" if record["ttl"] is None else "%s " % record["ttl"]
+    return "%s %sIN %s %s\n" % (_absolute(record["name"]), ttl, dns_type, content)
+
+
+def iter_zone_file(domain, view=None, chunk_size=None):
+    """
+    Yield ``domain`` as an RFC 1035 zone file.  The SOA serial is replaced with
+    ``Domain.notified_serial`` once one has been recorded.
+    """
+    yield "$ORIGIN %s\n" % _absolute(domain.name)
+    for record in zone_records(domain, view=view, chunk_size=chunk_size):
+        yield zone_file_line(record, serial=domain.notified_serial)
+
+
+def iter_json_lines(domain, view=None, chunk_size=None):
+    """Yield the records of ``domain`` as JSON objects, one per line."""
+    for record in zone_records(domain, view=view, chunk_size=chunk_size):
+        yield json.dumps(record) + "\n"
+
+
+def record_changes(since=0, domain=None, limit=None):
+    """
+    Return the DNS record changes logged after trigger id ``since``.
+
+    Returns ``(changes, next_since)``.  Up to ``limit`` rows of
+    ``dns_records_log`` are read in trigger order and collapsed to the latest
+    change per record, which is reported with the record's current state:
+    ``"upsert"`` with the record, or ``"delete"`` when it no longer exists (or,
+    with ``domain``, has moved out of it).  ``next_since`` is the last trigger
+    id read, to pass back as ``since`` for the next page.
+    """
+    from openipam.log.models import DnsRecordsLog
+
+    limit = limit or CONFIG.get("DNS_CHANGE_FEED_LIMIT")
+
+    log = list(
+        DnsRecordsLog.objects.filter(trigger_id__gt=since)
+        .order_by("trigger_id")
+        .values_list("trigger_id", "id", "domain")[:limit]
+    )
+    if not log:
+        return [], since
+
+    latest = {}
+    logged_domains = {}
+    for trigger_id, record_id, domain_id in log:
+        latest[record_id] = trigger_id
+        logged_domains.setdefault(record_id, []).append(domain_id)
+
+    current = {}
+    for row in DnsRecord.objects.filter(pk__in=list(latest)).values_list(
+        *RECORD_FIELDS, "domain"
+    ):
+        current[row[0]] = (row[-1], row[:-1])
+
+    changes = []
+    for record_id, trigger_id in sorted(latest.items(), key=lambda item: item[1]):
+        record_domain, row = current.get(record_id, (None, None))
+        if domain is None:
+            change_domain = record_domain or logged_domains[record_id][-1]
+        elif record_domain == domain.pk or domain.pk in logged_domains[record_id]:
+            change_domain = domain.pk
+        else:
+            continue
+
+        if row is not None and record_domain == change_domain:
+            changes.append(
+                {
+                    "trigger_id": trigger_id,
+                    "id": record_id,
+                    "domain": change_domain,
+                    "action": "upsert",
+                    "record": _record_dict(row),
+                }
+            )
+        else:
+            changes.append(
+                {
+                    "trigger_id": trigger_id,
+                    "id": record_id,
+                    "domain": change_domain,
+                    "action": "delete",
+                    "record": None,
+                }
+            )
+
+    return changes, log[-1][0]
@@ -3,19 +3,21 @@ from django.contrib.admin.models import LogEntry, CHANGE, DELETION
 from django.contrib.contenttypes.models import ContentType
 from django.utils.encoding import force_text
 from django.core import serializers
-from django.http import HttpResponse
 from django.contrib.auth import get_user_model
 
 from openipam.core.utils.messages import process_errors
 from openipam.hosts.models import (
     Host,
     Disabled,
-    HostGroupView,
-    HostUserView,
     StructuredAttributeToHost,
     FreeformAttributeToHost,
     Attribute,
 )
+from openipam.hosts.export import (
+    HOST_EXPORT_HEADER,
+    iter_host_export,
+    streaming_csv_response,
+)
 from openipam.hosts.forms import (
     HostOwnerForm,
     HostRenewForm,
@@ -25,7 +27,6 @@ from openipam.hosts.forms import (
     HostNetworkForm,
 )
 
-import csv
 import re
 
 User = get_user_model()
@@ -446,79 +447,10 @@ def populate_primary_dns(request, selected_hosts):
 
 
 def export_csv(request, selected_hosts):
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = 'attachment; filename="hosts.csv"'
-    writer = csv.writer(response)
-
-    writer.writerow(
-        [
-            "Hostname",
-            "Mac",
-            "Expires",
-            "IP Address",
-            "Mac Last Seen",
-            "IP Last Seen",
-            "Users",
-            "Groups",
-            "Description",
-        ]
-    )
-
-    host_values = selected_hosts.order_by("mac").values(
-        "mac",
-        "hostname",
-        "expires",
-        "description",
-        "addresses__address",
-        "ip_history__stopstamp",
-        "mac_history__stopstamp",
-        # "hostuserview__user__username",
-        # "hostuserview__user__email",
-        # "hostgroupview__group_name",
-    )
-    host_macs = [host["mac"] for host in host_values]
-
-    host_users = HostUserView.objects.filter(host_id__in=host_macs).values(
-        "user__username", "user__email", "host"
-    )
-    host_groups = HostGroupView.objects.filter(host_id__in=host_macs).values(
-        "group_name", "host"
+    return streaming_csv_response(
+        HOST_EXPORT_HEADER, iter_host_export(selected_hosts), "hosts.csv"
     )
 
-    for host in host_values:
-        users_str, groups_str = "", ""
-        users = filter(lambda u: u["host"] == host["mac"], host_users)
-        if users:
-            user_list = []
-            for user in users:
-                if user["user__email"]:
-                    user_list.append(
-                        f"{user['user__username']} <{user['user__email']}>"
-                    )
-                else:
-                    user_list.append(f"{user['user__username']}")
-            if user_list:
-                users_str = ",".join(user_list)
-        groups = filter(lambda g: g["host"] == host["mac"], host_groups)
-        if groups:
-            groups_str = ",".join([group["group_name"] for group in groups])
-
-        writer.writerow(
-            [
-                host["hostname"],
-                host["mac"],
-                host["expires"],
-                host["addresses__address"],
-                host["mac_history__stopstamp"],
-                host["ip_history__stopstamp"],
-                users_str,
-                groups_str,
-                host["description"],
-            ]
-        )
-
-    return response
-
 
 def change_perms_check(user, selected_hosts):
     selected_macs = [host.mac for host in selected_hosts]
@@ -0,0 +1,160 @@
+from django.http import StreamingHttpResponse
+
+from openipam.conf.ipam_settings import CONFIG
+
+from io import StringIO
+
+import csv
+
+
+HOST_EXPORT_HEADER = [
+    "Hostname",
+    "Mac",
+    "Expires",
+    "IP Address",
+    "Mac Last Seen",
+    "IP Last Seen",
+    "Users",
+    "Groups",
+    "Description",
+]
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_host_export(hosts, chunk_size=None):
+    """
+    Yield the rows of the host CSV export (see ``HOST_EXPORT_HEADER``).
+
+    Hosts are read through a server-side cursor and owners are looked up once
+    per ``chunk_size`` rows, so memory use does not grow with the export.
+    """
+    from openipam.hosts.models import Host
+
+    chunk_size = chunk_size or CONFIG.get("HOST_EXPORT_CHUNK_SIZE")
+
+    host_values = (
+        hosts.order_by("mac")
+        .values_list(
+            "mac",
+            "hostname",
+            "expires",
+            "description",
+            "addresses__address",
+            "ip_history__stopstamp",
+            "mac_history__stopstamp",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for chunk in _chunks(host_values, chunk_size):
+        owners = Host.objects.filter(mac__in=set(row[0] for row in chunk)).owners_map()
+        for (
+            mac,
+            hostname,
+            expires,
+            description,
+            address,
+            ip_stopstamp,
+            mac_stopstamp,
+        ) in chunk:
+            users, groups = owners.get(str(mac), ([], []))
+            user_list = [
+                "%s <%s>" % (user.username, user.email) if user.email else user.username
+                for user in sorted(users, key=lambda user: user.username)
+            ]
+            yield [
+                hostname,
+                mac,
+                expires,
+                address,
+                mac_stopstamp,
+                ip_stopstamp,
+                ",".join(user_list),
+                ",".join(sorted(group.name for group in groups)),
+                description,
+            ]
+
+
+def iter_server_hosts(hosts, chunk_size=None):
+    """
+    Yield the exposed server host report rows as dicts.
+
+    ``hosts`` must be annotated with ``nac_profile``.
+    """
+    from openipam.hosts.models import Host
+    from openipam.network.models import Address
+
+    chunk_size = chunk_size or CONFIG.get("HOST_EXPORT_CHUNK_SIZE")
+
+    host_values = (
+        hosts.order_by("mac")
+        .values_list("mac", "hostname", "description", "nac_profile")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for chunk in _chunks(host_values, chunk_size):
+        macs = set(row[0] for row in chunk)
+        owners = Host.objects.filter(mac__in=macs).owners_map()
+
+        master_addresses = {}
+        for mac, address in (
+            Address.objects.filter(host__in=macs)
+            .order_by("address")
+            .values_list("host", "address")
+        ):
+            master_addresses.setdefault(str(mac), str(address))
+
+        for mac, hostname, description, nac_profile in chunk:
+            users, groups = owners.get(str(mac), ([], []))
+            yield {
+                "hostname": hostname,
+                "mac": str(mac),
+                "description": description,
+                "master_ip_address": master_addresses.get(str(mac)),
+                "user_owners": ", ".join(sorted(user.username for user in users)),
+                "group_owners": ", ".join(sorted(group.name for group in groups)),
+                "nac_profile": nac_profile,
+            }
+
+
+def iter_csv(header, rows, labels=None, chunk_size=None):
+    """
+    Encode ``rows`` as CSV, yielding one string per ``chunk_size`` rows.
+
+    Rows may be sequences, or dicts, in which case ``header`` lists the keys
+    to write and ``labels`` optionally replaces them in the heading line.
+    """
+    chunk_size = chunk_size or CONFIG.get("HOST_EXPORT_CHUNK_SIZE")
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(labels or header)
+
+    for count, row in enumerate(rows, 1):
+        if isinstance(row, dict):
+            row = [row.get(key) for key in header]
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def streaming_csv_response(header, rows, filename, labels=None):
+    response = StreamingHttpResponse(
+        iter_csv(header, rows, labels=labels), content_type="text/csv"
+    )
+    response["Content-Disposition"] = 'attachment; filename="%s"' % filename
+    return response
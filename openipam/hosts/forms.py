@@ -29,6 +29,8 @@ from openipam.hosts.models import (
     StructuredAttributeToHost,
     Disabled,
 )
+from openipam.network.allocation import can_assign_to_network
+from openipam.user.utils.permission_closure import closure_q, get_permission_closure
 from openipam.core.forms import (
     BaseGroupObjectPermissionForm,
     BaseUserObjectPermissionForm,
@@ -596,22 +598,7 @@ class HostForm(forms.ModelForm):
             network = ""
 
         if network:
-            user_pools = get_objects_for_user(
-                self.user,
-                ["network.add_records_to_pool", "network.change_pool"],
-                any_perm=True,
-            )
-
-            user_nets = get_objects_for_user(
-                self.user,
-                [
-                    "network.add_records_to_network",
-                    "network.is_owner_network",
-                    "network.change_network",
-                ],
-                any_perm=True,
-            )
-            if not user_nets.filter(network=network.network):
+            if not can_assign_to_network(self.user, network):
                 raise ValidationError(
                     [
                         "You do not have access to assign this host to the network specified: %s."
@@ -620,17 +607,11 @@ class HostForm(forms.ModelForm):
                     ]
                 )
 
-            address = Address.objects.filter(
-                Q(pool__in=user_pools) | Q(pool__isnull=True),
-                Q(leases__isnull=True)
-                | Q(leases__abandoned=True)
-                | Q(leases__ends__lte=timezone.now()),
-                network=network,
-                host__isnull=True,
-                reserved=False,
-            ).order_by("address")
-
-            if not address:
+            if not (
+                Address.objects.filter(network=network)
+                .available(user=self.user)
+                .exists()
+            ):
                 raise ValidationError(
                     [
                         "There is no addresses available from the network specified: %s."
@@ -663,28 +644,15 @@ class HostForm(forms.ModelForm):
                 # Make sure this is valid.
                 validate_ipv46_address(ip_address)
 
-                user_pools = get_objects_for_user(
-                    self.user,
-                    ["network.add_records_to_pool", "network.change_pool"],
-                    any_perm=True,
-                )
-                user_nets = get_objects_for_user(
-                    self.user,
-                    [
-                        "network.add_records_to_network",
-                        "network.is_owner_network",
-                        "network.change_network",
-                    ],
-                    any_perm=True,
-                )
+                closure = get_permission_closure(self.user)
 
                 # Check address that are assigned and free to use
                 addresses = [
                     str(address)
                     for address in Address.objects.filter(
-                        Q(pool__in=user_pools)
+                        closure_q(closure, "pools", "pool")
                         | Q(pool__isnull=True)
-                        | Q(network__in=user_nets),
+                        | closure_q(closure, "dns_networks", "network"),
                         Q(leases__isnull=True)
                         | Q(leases__abandoned=True)
                         | Q(leases__ends__lte=timezone.now())
@@ -0,0 +1,202 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from openipam.conf.ipam_settings import CONFIG
+from openipam.core.utils.on_commit import queue_on_commit
+
+from datetime import timedelta
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_KEY = "ipam_host_summary_refreshing"
+
+
+SUMMARY_FIELDS = (
+    "hostname",
+    "expires",
+    "disabled",
+    "vendor",
+    "first_address",
+    "addresses",
+    "leases",
+    "leases_expire",
+    "last_mac_seen",
+    "last_ip_seen",
+)
+
+_columns = ", ".join(SUMMARY_FIELDS)
+_updates = ", ".join("%s = EXCLUDED.%s" % (field, field) for field in SUMMARY_FIELDS)
+
+# The vendor is the covering OUI range with the highest id, as in
+# HostQuerySet.with_oui; only leases that have not ended are listed.
+REFRESH_QUERY = """
+    INSERT INTO host_summary (mac, {columns}, refreshed)
+    SELECT hosts.mac, hosts.hostname, hosts.expires,
+            EXISTS (SELECT 1 FROM disabled WHERE disabled.mac = hosts.mac),
+            (SELECT ouis.shortname FROM ouis
+                WHERE hosts.mac >= ouis.start AND hosts.mac <= ouis.stop
+                ORDER BY ouis.id DESC LIMIT 1),
+            coalesce(static.first_address, leased.first_address),
+            coalesce(static.addresses, '{{}}'),
+            coalesce(leased.addresses, '{{}}'),
+            leased.expire,
+            (SELECT max(stopstamp) FROM gul_recent_arp_bymac
+                WHERE gul_recent_arp_bymac.mac = hosts.mac),
+            static.last_seen,
+            %(refreshed)s
+        FROM hosts
+        CROSS JOIN LATERAL (
+            SELECT min(addresses.address) AS first_address,
+                    array_agg(DISTINCT addresses.address) AS addresses,
+                    max(gul_recent_arp_byaddress.stopstamp) AS last_seen
+                FROM addresses
+                LEFT JOIN gul_recent_arp_byaddress
+                    ON gul_recent_arp_byaddress.address = addresses.address
+                WHERE addresses.mac = hosts.mac
+        ) AS static
+        CROSS JOIN LATERAL (
+            SELECT min(leases.address) AS first_address,
+                    array_agg(leases.address ORDER BY leases.address) AS addresses,
+                    min(leases.ends) AS expire
+                FROM leases
+                WHERE leases.mac = hosts.mac AND leases.ends > %(refreshed)s
+        ) AS leased
+        WHERE hosts.mac = ANY(%(macs)s::macaddr[])
+    ON CONFLICT (mac) DO UPDATE SET {updates}, refreshed = EXCLUDED.refreshed
+""".format(
+    columns=_columns, updates=_updates
+)
+
+# Rows for MACs that are no longer hosts (deleted, or renamed by set_mac_address).
+DELETE_QUERY = """
+    DELETE FROM host_summary
+        WHERE mac = ANY(%(macs)s::macaddr[]) AND NOT EXISTS (
+            SELECT 1 FROM hosts WHERE hosts.mac = host_summary.mac
+        )
+"""
+
+VENDOR_QUERY = """
+    UPDATE host_summary SET vendor = vendors.shortname
+        FROM (
+            SELECT host_summary.mac, (
+                SELECT ouis.shortname FROM ouis
+                    WHERE host_summary.mac >= ouis.start AND host_summary.mac <= ouis.stop
+                    ORDER BY ouis.id DESC LIMIT 1
+            ) AS shortname
+            FROM host_summary
+        ) AS vendors
+        WHERE host_summary.mac = vendors.mac
+            AND host_summary.vendor IS DISTINCT FROM vendors.shortname
+"""
+
+
+def refresh_host_summary(macs, batch_size=None):
+    """
+    Rebuild the host_summary rows of ``macs`` (``Host`` instances or MAC
+    strings) with one set-based statement per batch of ``batch_size``,
+    and drop the rows of MACs that are no longer hosts.  Returns the number
+    of MACs refreshed.
+    """
+    batch_size = batch_size or CONFIG.get("HOST_SUMMARY_BATCH_SIZE")
+    macs = sorted(set(str(getattr(mac, "mac", mac)).lower() for mac in macs if mac))
+
+    for i in range(0, len(macs), batch_size):
+        params = {"macs": macs[i : i + batch_size], "refreshed": timezone.now()}
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(REFRESH_QUERY, params)
+            cursor.execute(DELETE_QUERY, params)
+
+    return len(macs)
+
+
+def prune_host_summary():
+    """Drop summary rows for hosts that no longer exist."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            DELETE FROM host_summary WHERE NOT EXISTS (
+                SELECT 1 FROM hosts WHERE hosts.mac = host_summary.mac
+            )
+        """
+        )
+
+
+def _refresh_in_background(macs):
+    try:
+        refresh_host_summary(macs)
+    except Exception:
+        logger.exception("Host summary refresh failed")
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+        connection.close()
+
+
+def refresh_host_summary_in_background(macs):
+    """
+    Refresh the summary of ``macs`` in a background thread, for pages that
+    show a stale summary without writing to the database themselves.  Only
+    one worker (whichever takes the refresh lock in the cache) refreshes at
+    a time; the rest leave their hosts to the signals and the command.
+    """
+    if cache.add(REFRESH_LOCK_KEY, True, CONFIG.get("HOST_SUMMARY_REFRESH_TIMEOUT")):
+        threading.Thread(
+            target=_refresh_in_background, args=(list(macs),), daemon=True
+        ).start()
+
+
+def refresh_host_summary_vendors():
+    """Re-resolve every summary row's vendor, after the ouis table changes."""
+    with connection.cursor() as cursor:
+        cursor.execute(VENDOR_QUERY)
+
+
+def stale_host_summary_q(max_age=None):
+    """
+    ``Q`` on ``Host`` matching hosts whose summary is missing, lists a lease
+    that has since ended, or (with ``max_age``) was refreshed more than
+    ``max_age`` seconds ago.
+    """
+    now = timezone.now()
+    q = Q(summary__isnull=True) | Q(summary__leases_expire__lte=now)
+    if max_age is not None:
+        q |= Q(summary__refreshed__lt=now - timedelta(seconds=max_age))
+    return q
+
+
+def refresh_stale_host_summary(max_age=None, batch_size=None, hosts=None):
+    """
+    Refresh the hosts with a stale summary (see ``stale_host_summary_q``),
+    oldest first.  ARP history and lease expiry change without anything in
+    Django hearing about it, so this is run periodically.  ``hosts`` (a
+    ``Host`` queryset) limits the refresh to those hosts; without it, the
+    summary is also pruned.  Returns the number of hosts refreshed.
+    """
+    from openipam.hosts.models import Host
+
+    if max_age is None:
+        max_age = CONFIG.get("HOST_SUMMARY_MAX_AGE_SECONDS")
+    if hosts is None:
+        prune_host_summary()
+        hosts = Host.objects.all()
+
+    stale = (
+        hosts.filter(stale_host_summary_q(max_age))
+        .order_by(F("summary__refreshed").asc(nulls_first=True))
+        .values_list("mac", flat=True)
+    )
+    return refresh_host_summary(stale, batch_size=batch_size)
+
+
+def queue_host_summary_refresh(macs):
+    """
+    Refresh the summary of ``macs`` once the current transaction commits.
+    MACs queued by many saves in one transaction are refreshed together.
+    """
+    queue_on_commit(
+        "host_summary", (str(mac).lower() for mac in macs if mac), refresh_host_summary
+    )
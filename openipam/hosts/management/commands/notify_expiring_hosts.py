@@ -1,13 +1,18 @@
 # Host expiration notification
 
-from django.core.management.base import BaseCommand
-from django.core.mail import send_mail, send_mass_mail, get_connection
-from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.core.mail import EmailMessage, get_connection
 
 
 from openipam.conf.ipam_settings import CONFIG
+from openipam.hosts.management.expiry_notifications import (
+    LDAPEmailResolver,
+    RunStats,
+    hosts_by_owner,
+    mark_notified,
+    send_in_chunks,
+)
 from openipam.hosts.models import Host
-from openipam.user.utils.user_utils import populate_user_from_ldap
 
 
 class Command(BaseCommand):
@@ -37,7 +42,21 @@ class Command(BaseCommand):
             action="store_true",
             dest="noasync",
             default=False,
-            help="This flag will sent using send_mail instead of send_mass_mail",
+            help="Send one email at a time instead of in chunks",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            dest="chunk_size",
+            default=CONFIG.get("NOTIFICATION_CHUNK_SIZE"),
+            help="Emails sent per chunk; hosts are marked notified after each chunk",
+        )
+        parser.add_argument(
+            "--ldap-workers",
+            type=int,
+            dest="ldap_workers",
+            default=CONFIG.get("NOTIFICATION_LDAP_WORKERS"),
+            help="Concurrent LDAP lookups for owners without an email address",
         )
 
     def handle(self, *args, **options):
@@ -144,34 +163,38 @@ http://usu.service-now.com (Issue Tracking System)
         row_heading = "Hostname:                                MAC:                  Expiring in:   Description:"
         row_fmt = "%(hostname)-40s %(mac)-22s %(days)3s days      %(description)s"
 
+        stats = RunStats()
+
         # Get list of people who need to be notified.
-        host_qs = Host.objects.prefetch_related("pools").by_expiring(omit_guests=True)
+        with stats.phase("owners"):
+            hosts = list(
+                Host.objects.prefetch_related("pools")
+                .with_owners(expand_groups=True)
+                .by_expiring(omit_guests=True)
+            )
+            users_to_notify = hosts_by_owner(hosts)
+        stats.incr("expiring hosts", len(hosts))
+        stats.incr("owners", len(users_to_notify))
+
+        with stats.phase("ldap"):
+            resolver = LDAPEmailResolver(workers=options["ldap_workers"], stats=stats)
+            emails = resolver.resolve(list(users_to_notify))
 
-        users_to_notify = {}
         messages = []
         bad_users = []
+        with stats.phase("build"):
+            for user, host_types in list(users_to_notify.items()):
+                e_user = emails[user]
+                if not e_user:
+                    bad_users.append(user.username)
+                    continue
 
-        for host in host_qs:
-            host_users = host.get_owners(users_only=True)
-
-            for user in host_users:
-                if user not in users_to_notify:
-                    users_to_notify[user] = {"static": [], "dynamic": []}
-                if host.is_static:
-                    users_to_notify[user]["static"].append(host)
-                else:
-                    users_to_notify[user]["dynamic"].append(host)
-
-        for user, host_types in list(users_to_notify.items()):
-            if not user.email:
-                e_user = populate_user_from_ldap(user=user)
-            else:
-                e_user = user
-            if e_user and e_user.email:
                 mesg_type = "static" if host_types.get("static") else "dynamic"
                 row_hosts = []
-                for host_type, hosts in list(host_types.items()):
-                    for host in hosts:
+                macs = []
+                for host_type, hosts_of_type in list(host_types.items()):
+                    for host in hosts_of_type:
+                        macs.append(host.mac)
                         row_hosts.append(
                             row_fmt
                             % {
@@ -181,36 +204,56 @@ http://usu.service-now.com (Issue Tracking System)
                                 "description": host.description,
                             }
                         )
-                messages.append(
-                    (
-                        locals()["%s_subject" % mesg_type],
-                        locals()["%s_msg" % mesg_type]
-                        % {
-                            "name": e_user.get_full_name(),
-                            "username": e_user.username,
-                            "rows": "%s\n%s" % (row_heading, "\n".join(row_hosts)),
-                        },
-                        from_address,
-                        [e_user.email],
-                    )
+                message = EmailMessage(
+                    locals()["%s_subject" % mesg_type],
+                    locals()["%s_msg" % mesg_type]
+                    % {
+                        "name": e_user.get_full_name(),
+                        "username": e_user.username,
+                        "rows": "%s\n%s" % (row_heading, "\n".join(row_hosts)),
+                    },
+                    from_address,
+                    [e_user.email],
                 )
-            else:
-                bad_users.append(user.username)
+                messages.append((message, macs))
+        stats.incr("messages", len(messages))
 
         if not count:
-            if noasync:
-                for message in messages:
-                    self.stdout.write("Sending email to %s..." % ",".join(message[3]))
-                    send_mail(*message, fail_silently=False, connection=connection)
-            else:
-                send_mass_mail(messages, fail_silently=False, connection=connection)
+
+            def on_chunk_sent(macs):
+                if noasync:
+                    self.stdout.write(
+                        "Sent %s emails..." % stats.counts["messages sent"]
+                    )
+                if not test:
+                    mark_notified(macs)
+
+            try:
+                send_in_chunks(
+                    messages,
+                    connection or get_connection(),
+                    1 if noasync else options["chunk_size"],
+                    on_chunk_sent,
+                    stats=stats,
+                )
+            except Exception as e:
+                self.stdout.write("\n".join(stats.report()))
+                raise CommandError(
+                    "Sending stopped after %s of %s messages: %s"
+                    % (stats.counts.get("messages sent", 0), len(messages), e)
+                )
 
             if not test:
-                host_qs.update(last_notified=timezone.now())
+                # Hosts whose owners all lack an email address are done too.
+                mark_notified([host.mac for host in hosts])
 
         self.stdout.write(
             "%s Notifications have been sent for %s hosts"
-            % (len(messages), len(host_qs))
+            % (
+                len(messages) if count else stats.counts.get("messages sent", 0),
+                len(hosts),
+            )
         )
         self.stdout.write("%s users have no email address." % len(bad_users))
         self.stdout.write("\n".join(bad_users))
+        self.stdout.write("\n".join(stats.report()))
@@ -0,0 +1,19 @@
+from openipam.core.management.base import RefreshCommand
+from openipam.hosts.host_summary import (
+    refresh_host_summary,
+    refresh_stale_host_summary,
+)
+from openipam.hosts.models import Host
+
+
+class Command(RefreshCommand):
+    help = "Rebuild stale rows of the host summary the host list reads."
+    noun = "hosts"
+
+    def refresh_all(self, batch_size):
+        return refresh_host_summary(
+            Host.objects.values_list("mac", flat=True), batch_size=batch_size
+        )
+
+    def refresh_stale(self, max_age, batch_size):
+        return refresh_stale_host_summary(max_age=max_age, batch_size=batch_size)
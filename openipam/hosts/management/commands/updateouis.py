@@ -8,11 +8,22 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("-u", "--url", help="URL for wireshark 'manuf'-style file")
+        parser.add_argument(
+            "-f",
+            "--force",
+            action="store_true",
+            help="Import even if the file is unchanged since the last import",
+        )
 
     def handle(self, *args, **options):
         url = options.get("url", None)
 
         if url:
-            import_ouis(manuf=url)
+            count = import_ouis(manuf=url, force=options["force"])
         else:
-            import_ouis()
+            count = import_ouis(force=options["force"])
+
+        if count is None:
+            self.stdout.write("OUI file unchanged, skipping import.")
+        else:
+            self.stdout.write("Imported %s OUIs." % count)
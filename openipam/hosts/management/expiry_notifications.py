@@ -0,0 +1,155 @@
+from django.db import connection as db_connection
+from django.utils import timezone
+
+from openipam.hosts.models import Host
+from openipam.user.utils.user_utils import populate_user_from_ldap
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import threading
+import time
+
+
+class RunStats(object):
+    """Counters and per-phase timings for one notification run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts = OrderedDict()
+        self.timings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def incr(self, name, count=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + count
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (
+                time.monotonic() - started
+            )
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        lines = ["%s: %s" % (name, count) for name, count in self.counts.items()]
+        lines += [
+            "%s time: %.2fs" % (name, seconds) for name, seconds in self.timings.items()
+        ]
+        sent = self.counts.get("messages sent", 0)
+        send_time = self.timings.get("send")
+        if sent and send_time:
+            lines.append("send rate: %.1f messages/s" % (sent / send_time))
+        lines.append("total time: %.2fs" % elapsed)
+        return lines
+
+
+def hosts_by_owner(hosts):
+    """
+    Return ``{user: {"static": [hosts], "dynamic": [hosts]}}`` for ``hosts``.
+
+    ``hosts`` should come from ``with_owners(expand_groups=True)``, so the
+    owners of every host are resolved in a fixed number of queries.
+    """
+    owners = OrderedDict()
+    for host in hosts:
+        host_type = "static" if host.is_static else "dynamic"
+        for user in host.get_owners(users_only=True):
+            owners.setdefault(user, {"static": [], "dynamic": []})[host_type].append(
+                host
+            )
+    return owners
+
+
+class LDAPEmailResolver(object):
+    """
+    Fill in missing email addresses from LDAP on a bounded thread pool.
+
+    Results are cached by username for the life of the resolver, so a user is
+    looked up at most once per run.
+    """
+
+    def __init__(self, workers, stats=None):
+        self.workers = workers
+        self.stats = stats or RunStats()
+        self.cache = {}
+
+    def _lookup(self, username):
+        try:
+            return populate_user_from_ldap(username=username)
+        except Exception:
+            self.stats.incr("ldap failures")
+            return None
+        finally:
+            # Each worker thread has its own database connection.
+            db_connection.close()
+
+    def resolve(self, users):
+        """Return ``{user: user with an email address, or None}``."""
+        missing = sorted(
+            set(
+                user.username
+                for user in users
+                if not user.email and user.username not in self.cache
+            )
+        )
+        if missing:
+            self.stats.incr("ldap lookups", len(missing))
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for username, ldap_user in zip(
+                    missing, pool.map(self._lookup, missing)
+                ):
+                    self.cache[username] = ldap_user
+
+        resolved = {}
+        for user in users:
+            e_user = user if user.email else self.cache.get(user.username)
+            resolved[user] = e_user if e_user and e_user.email else None
+        return resolved
+
+
+def mark_notified(macs):
+    if macs:
+        Host.objects.filter(mac__in=macs).update(last_notified=timezone.now())
+
+
+def send_in_chunks(messages, connection, chunk_size, on_chunk_sent, stats=None):
+    """
+    Send ``(EmailMessage, macs)`` pairs over one open ``connection``,
+    ``chunk_size`` messages at a time.
+
+    After each chunk goes out, ``on_chunk_sent`` is called with the hosts
+    whose every message has now been sent, so a run that fails part way
+    leaves the hosts already handled marked, and the next run resumes from
+    there.  Errors from the mail backend are raised.
+    """
+    stats = stats or RunStats()
+
+    remaining = {}
+    for message, macs in messages:
+        for mac in macs:
+            remaining[mac] = remaining.get(mac, 0) + 1
+
+    connection.open()
+    try:
+        for i in range(0, len(messages), chunk_size):
+            chunk = messages[i : i + chunk_size]
+            with stats.phase("send"):
+                connection.send_messages([message for message, macs in chunk])
+
+            done = []
+            for message, macs in chunk:
+                for mac in macs:
+                    remaining[mac] -= 1
+                    if remaining[mac] == 0:
+                        done.append(mac)
+            stats.incr("messages sent", len(chunk))
+            stats.incr("chunks sent")
+            on_chunk_sent(done)
+    finally:
+        connection.close()
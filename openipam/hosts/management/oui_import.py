@@ -1,7 +1,14 @@
+from openipam.hosts.host_summary import refresh_host_summary_vendors
 from openipam.hosts.models import OUI
-from django.db import transaction
+from openipam.hosts.oui_index import oui_index
+from django.db import connection, transaction
 import requests
 
+from io import StringIO
+from tempfile import TemporaryFile
+
+import csv
+import hashlib
 import re
 
 # manuf = 'https://code.wireshark.org/review/gitweb?p=wireshark.git;a=blob_plain;f=manuf'
@@ -10,6 +17,13 @@ manuf = "file:///usr/share/wireshark/manuf"
 maxmask = 0xFFFFFFFFFFFF
 maxbits = 48
 
+# Rows parsed and COPYed into the staging table at a time.
+batch_size = 5000
+
+# The checksum of the imported file is kept as the comment on the ouis table,
+# so it is replaced in the same transaction as the rows.
+checksum_prefix = "manuf sha256:"
+
 
 def generate_mask(bits):
     if bits > 48:
@@ -20,7 +34,7 @@ def generate_mask(bits):
 
 
 def mac_to_int(mac):
-    mac = re.sub(":. -", "", mac)
+    mac = re.sub("[.: -]", "", mac)
     if len(mac) != 12:
         raise Exception("Bad MAC: %s" % mac)
 
@@ -39,21 +53,8 @@ def find_end(mac, bits):
     return int_to_mac((mac_to_int(mac) | (~generate_mask(bits)) & maxmask))
 
 
-@transaction.atomic
-def import_ouis(manuf=manuf):
-    OUI.objects.all().delete()
-
-    file_uri_prefix = "file://"
-
-    is_file = True if manuf[len(file_uri_prefix)] == file_uri_prefix else False
-
-    if is_file:
-        filename = manuf[len(file_uri_prefix) :]
-        lines = open(filename).readlines()
-    else:
-        data = requests.get(manuf)
-        lines = data.text.split("\n")
-
+def parse_manuf(lines):
+    """Yield ``(start, stop, shortname, longname)`` for each entry of a manuf file."""
     for line in lines:
         line = line.strip()
         if line and line[0] != "#":
@@ -72,7 +73,7 @@ def import_ouis(manuf=manuf):
 
             if maskbits is None:
                 if len(oui) == 6:
-                    maskbits = maxbits / 2
+                    maskbits = maxbits // 2
                 elif len(oui) == 12:
                     maskbits = maxbits
                 else:
@@ -85,12 +86,122 @@ def import_ouis(manuf=manuf):
                 oui = [oui] + (12 - len(oui)) * ["0"]
                 oui = "".join(oui)
 
-            shortname = shortname.strip()
-            longname = longname.strip()
+            yield oui, find_end(oui, maskbits), shortname.strip(), longname.strip()
+
 
-            OUI.objects.create(
-                start=oui,
-                stop=find_end(oui, maskbits),
-                shortname=shortname,
-                name=longname,
+def fetch_manuf(manuf=manuf):
+    """
+    Copy the manuf file into a temporary file, hashing it on the way.
+
+    Returns ``(file, sha256 hexdigest)`` with the file rewound to the start.
+    """
+    file_uri_prefix = "file://"
+    checksum = hashlib.sha256()
+    tmp = TemporaryFile(mode="w+", encoding="utf-8")
+
+    if manuf.startswith(file_uri_prefix):
+        with open(manuf[len(file_uri_prefix) :], encoding="utf-8") as source:
+            for line in source:
+                checksum.update(line.encode("utf-8"))
+                tmp.write(line)
+    else:
+        response = requests.get(manuf, stream=True)
+        response.raise_for_status()
+        response.encoding = response.encoding or "utf-8"
+        for chunk in response.iter_content(chunk_size=64 * 1024, decode_unicode=True):
+            checksum.update(chunk.encode("utf-8"))
+            tmp.write(chunk)
+
+    tmp.seek(0)
+    return tmp, checksum.hexdigest()
+
+
+def get_imported_checksum():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT obj_description(%s::regclass, 'pg_class')", [OUI._meta.db_table]
+        )
+        comment = cursor.fetchone()[0] or ""
+    return (
+        comment[len(checksum_prefix) :] if comment.startswith(checksum_prefix) else None
+    )
+
+
+def _copy_batch(cursor, rows):
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY oui_import (seq, start, stop, shortname, name) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+def import_ouis(manuf=manuf, force=False):
+    """
+    Replace the ``ouis`` table with the entries of a wireshark manuf file.
+
+    The file is parsed as a stream and COPYed into a temporary staging table
+    in batches, outside any transaction on ``ouis``.  The rows are then
+    swapped in with one short transaction, so vendor lookups never wait on the
+    download or the parse.  The import is skipped when the file is unchanged
+    since the last one, unless ``force`` is set.
+
+    Returns the number of rows imported, or None if the import was skipped.
+    """
+    source, checksum = fetch_manuf(manuf)
+
+    try:
+        if not force and get_imported_checksum() == checksum:
+            return None
+
+        table = connection.ops.quote_name(OUI._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                CREATE TEMPORARY TABLE oui_import (
+                    seq integer NOT NULL,
+                    start macaddr NOT NULL,
+                    stop macaddr NOT NULL,
+                    shortname varchar(255),
+                    name varchar(255)
+                )
+            """
             )
+
+            try:
+                count = 0
+                rows = []
+                for start, stop, shortname, longname in parse_manuf(source):
+                    rows.append((count, start, stop, shortname, longname))
+                    count += 1
+                    if len(rows) >= batch_size:
+                        _copy_batch(cursor, rows)
+                        rows = []
+                if rows:
+                    _copy_batch(cursor, rows)
+
+                with transaction.atomic():
+                    cursor.execute("DELETE FROM %s" % table)
+                    # Keep file order: with_oui prefers the highest id on overlaps.
+                    cursor.execute(
+                        """
+                        INSERT INTO %s (start, stop, shortname, name)
+                            SELECT start, stop, shortname, name FROM oui_import ORDER BY seq
+                    """
+                        % table
+                    )
+                    cursor.execute(
+                        "COMMENT ON TABLE %s IS %%s" % table,
+                        [checksum_prefix + checksum],
+                    )
+                    oui_index.invalidate()
+                    # Re-resolving every summary's vendor is a long statement,
+                    # so it runs once the swap has committed and released ouis.
+                    transaction.on_commit(refresh_host_summary_vendors)
+            finally:
+                cursor.execute("DROP TABLE IF EXISTS oui_import")
+    finally:
+        source.close()
+
+    return count
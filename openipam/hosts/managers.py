@@ -1,19 +1,27 @@
-from django.db.models.query import QuerySet
-from django.db.models import Q, Manager
+from django.db.models.query import QuerySet, ModelIterable
+from django.db.models import Manager
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
 from django.db import connection
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from openipam.dns.domain_index import names_under_q
 from openipam.network.models import DhcpGroup, Pool, Network
 from openipam.conf.ipam_settings import CONFIG
 from openipam.conf.settings import HOSTNAME_VALIDATION_REGEX
+from openipam.user.utils.permission_closure import (
+    closure_q,
+    get_permission_closure,
+    is_all,
+)
 
 from six import string_types
 
 from functools import reduce
 
+from guardian.models import UserObjectPermission, GroupObjectPermission
 from guardian.shortcuts import (
     get_objects_for_user,
     get_objects_for_group,
@@ -37,6 +45,98 @@ class HostQuerySet(QuerySet):
             }
         )
 
+    # (method name, kwargs) pairs run over the fetched hosts, set by
+    # with_owners() and with_disabled(); carried across clones so they survive
+    # filter() etc.
+    _batch_loaders = ()
+
+    def _clone(self):
+        clone = super(HostQuerySet, self)._clone()
+        clone._batch_loaders = self._batch_loaders
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is None
+        super(HostQuerySet, self)._fetch_all()
+        if fetched and self._iterable_class is ModelIterable and self._result_cache:
+            for loader, kwargs in self._batch_loaders:
+                getattr(self, loader)(self._result_cache, **kwargs)
+
+    def _with_loader(self, loader, **kwargs):
+        clone = self._chain()
+        clone._batch_loaders = tuple(
+            (name, kw) for name, kw in self._batch_loaders if name != loader
+        ) + ((loader, kwargs),)
+        return clone
+
+    def _owner_perms(self, macs, expand_groups=False):
+        content_type = ContentType.objects.get_for_model(self.model)
+        perm_filter = dict(
+            content_type=content_type,
+            object_pk__in=macs,
+            permission__codename="is_owner_host",
+        )
+        user_perms = UserObjectPermission.objects.select_related("user").filter(
+            **perm_filter
+        )
+        group_perms = GroupObjectPermission.objects.select_related("group").filter(
+            **perm_filter
+        )
+        if expand_groups:
+            group_perms = group_perms.prefetch_related("group__user_set")
+
+        owners = {}
+        for perm in user_perms:
+            owners.setdefault(perm.object_pk, ([], []))[0].append(perm)
+        for perm in group_perms:
+            owners.setdefault(perm.object_pk, ([], []))[1].append(perm)
+        return owners
+
+    def _attach_owners(self, hosts, expand_groups=False):
+        owners = self._owner_perms(
+            [str(host.mac) for host in hosts], expand_groups=expand_groups
+        )
+        for host in hosts:
+            user_perms, group_perms = owners.get(str(host.mac), ([], []))
+            host.prefetched_user_owners = user_perms
+            host.prefetched_group_owners = group_perms
+
+    def with_owners(self, expand_groups=False):
+        """
+        Load host owners for the whole result set in two queries, so
+        ``Host.get_owners`` and the ``user_owners``/``group_owners`` properties
+        do not query per host.  ``expand_groups`` also prefetches the members of
+        owner groups for ``get_owners(users_only=True)``.
+        """
+        return self._with_loader("_attach_owners", expand_groups=expand_groups)
+
+    def _attach_disabled(self, hosts):
+        from openipam.hosts.models import Disabled
+
+        disabled = {
+            str(obj.mac): obj
+            for obj in Disabled.objects.select_related("changed_by").filter(
+                mac__in=[host.mac for host in hosts if host.is_disabled]
+            )
+        }
+        for host in hosts:
+            host.prefetched_disabled_host = disabled.get(str(host.mac))
+
+    def with_disabled(self):
+        """Load ``Host.disabled_host`` for the whole result set in one query."""
+        return self._with_loader("_attach_disabled")
+
+    def owners_map(self):
+        """Return ``{mac: (users, groups)}`` for every host in the queryset."""
+        macs = [str(mac) for mac in self.order_by().values_list("mac", flat=True)]
+        return {
+            mac: (
+                [perm.user for perm in user_perms],
+                [perm.group for perm in group_perms],
+            )
+            for mac, (user_perms, group_perms) in self._owner_perms(macs).items()
+        }
+
     def by_owner(self, user, use_groups=False, ids_only=False):
         User = get_user_model()
 
@@ -76,21 +176,15 @@ class HostQuerySet(QuerySet):
             else:
                 return self.all()
         else:
-            host_perms = get_objects_for_user(
-                user, ["hosts.is_owner_host", "hosts.change_host"], any_perm=True
-            ).values_list("mac", flat=True)
-            domain_perms = get_objects_for_user(
-                user, ["dns.is_owner_domain", "dns.change_domain"], any_perm=True
-            ).values_list("name", flat=True)
-            network_perms = get_objects_for_user(
-                user,
-                ["network.is_owner_network", "network.change_network"],
-                any_perm=True,
-            ).values_list("network", flat=True)
-
-            perms_q_list = [Q(hostname__endswith=name) for name in domain_perms]
-            perms_q_list.append(Q(mac__in=host_perms))
-            perms_q_list.append(Q(addresses__network__in=network_perms))
+            closure = get_permission_closure(user)
+
+            if is_all(closure["domain_names"]):
+                perms_q_list = [closure_q(closure, "domains", "pk")]
+            else:
+                domains_q = names_under_q("hostname", closure["domain_names"])
+                perms_q_list = [domains_q] if domains_q else []
+            perms_q_list.append(closure_q(closure, "hosts", "mac"))
+            perms_q_list.append(closure_q(closure, "networks", "addresses__network"))
 
             qs = self.filter(reduce(operator.or_, perms_q_list))
 
@@ -0,0 +1,99 @@
+from django.db import migrations, models
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import netfields.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [("hosts", "0002_auto_20190809_1607")]
+
+    operations = [
+        migrations.CreateModel(
+            name="HostSummary",
+            fields=[
+                (
+                    "host",
+                    models.OneToOneField(
+                        db_column="mac",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="hosts.Host",
+                    ),
+                ),
+                ("hostname", models.CharField(max_length=255)),
+                ("expires", models.DateTimeField()),
+                ("disabled", models.BooleanField(default=False)),
+                (
+                    "vendor",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                (
+                    "first_address",
+                    netfields.fields.InetAddressField(
+                        blank=True, max_length=39, null=True
+                    ),
+                ),
+                (
+                    "addresses",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.GenericIPAddressField(),
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                (
+                    "leases",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.GenericIPAddressField(),
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                ("leases_expire", models.DateTimeField(blank=True, null=True)),
+                ("last_mac_seen", models.DateTimeField(blank=True, null=True)),
+                ("last_ip_seen", models.DateTimeField(blank=True, null=True)),
+                ("refreshed", models.DateTimeField()),
+            ],
+            options={"db_table": "host_summary"},
+        ),
+        migrations.AddIndex(
+            model_name="hostsummary",
+            index=models.Index(fields=["hostname"], name="host_summary_hostname_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="hostsummary",
+            index=models.Index(fields=["expires"], name="host_summary_expires_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="hostsummary",
+            index=models.Index(
+                fields=["first_address"], name="host_summary_first_address_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hostsummary",
+            index=models.Index(
+                fields=["leases_expire"], name="host_summary_leases_expire_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hostsummary",
+            index=models.Index(fields=["refreshed"], name="host_summary_refreshed_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="hostsummary",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["addresses"], name="host_summary_addresses_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hostsummary",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["leases"], name="host_summary_leases_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+def fill_host_summary(apps, schema_editor):
+    # The refresh is raw SQL over the live tables, so only the MACs are read
+    # through the historical model.
+    from openipam.hosts.host_summary import refresh_host_summary
+
+    Host = apps.get_model("hosts", "Host")
+    refresh_host_summary(Host.objects.values_list("mac", flat=True).iterator())
+
+
+class Migration(migrations.Migration):
+    dependencies = [("hosts", "0003_hostsummary")]
+
+    operations = [migrations.RunPython(fill_host_summary, migrations.RunPython.noop)]
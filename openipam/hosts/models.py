@@ -5,15 +5,17 @@ from django.utils.timezone import utc
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.db.models import Q
 from django.contrib.auth import get_user_model
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_save, post_delete
 from django.db import connection
 from django.core.validators import validate_ipv46_address
 from django.utils.functional import cached_property
 from django.contrib.contenttypes.models import ContentType
 from django.db.utils import DatabaseError
 from django.db import transaction
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 
-from netfields import MACAddressField, NetManager
+from netfields import InetAddressField, MACAddressField, NetManager
 
 from djorm_pgfulltext.fields import VectorField
 from djorm_pgfulltext.models import SearchManager
@@ -21,9 +23,14 @@ from djorm_pgfulltext.models import SearchManager
 from guardian.shortcuts import get_objects_for_user, remove_perm, assign_perm
 from guardian.models import UserObjectPermission, GroupObjectPermission
 
+from openipam.autocomplete.signals import invalidate_typeahead
 from openipam.core.mixins import DirtyFieldsMixin
+from openipam.core.search import queue_search_refresh
+from openipam.core.signals import refresh_search_document
 from openipam.hosts.validators import validate_hostname
+from openipam.hosts.host_summary import queue_host_summary_refresh
 from openipam.hosts.managers import HostManager, HostQuerySet
+from openipam.hosts.signals import refresh_host_summary_on_change
 from openipam.user.signals import remove_obj_perms_connected_with_user
 from openipam.dns.models import DhcpDnsRecord
 
@@ -469,10 +476,13 @@ class Host(DirtyFieldsMixin, models.Model):
     ):
         # users_dict = get_users_with_perms(self, attach_perms=True, with_group_users=False)
         # groups_dict = get_groups_with_perms(self, attach_perms=True)
+        prefetched = hasattr(self, "prefetched_user_owners")
         content_type = ContentType.objects.get_for_model(self)
 
         users = []
-        if user_perms_prefetch:
+        if prefetched:
+            user_perms = self.prefetched_user_owners
+        elif user_perms_prefetch:
             user_perms = list(
                 filter(
                     lambda x: x.object_pk == str(self.mac)
@@ -490,7 +500,9 @@ class Host(DirtyFieldsMixin, models.Model):
             users.append(perm.user)
 
         groups = []
-        if group_perms_prefetch:
+        if prefetched:
+            group_perms = self.prefetched_group_owners
+        elif group_perms_prefetch:
             group_perms = list(
                 filter(
                     lambda x: x.object_pk == str(self.mac)
@@ -517,9 +529,17 @@ class Host(DirtyFieldsMixin, models.Model):
         #        groups.append(group)
 
         if users_only:
-            users_from_groups = [
-                user for user in User.objects.filter(groups__in=groups)
-            ]
+            if groups and all(
+                "user_set" in getattr(group, "_prefetched_objects_cache", {})
+                for group in groups
+            ):
+                users_from_groups = [
+                    user for group in groups for user in group.user_set.all()
+                ]
+            else:
+                users_from_groups = [
+                    user for user in User.objects.filter(groups__in=groups)
+                ]
             users = list(set(users + users_from_groups))
             return users
 
@@ -602,7 +622,9 @@ class Host(DirtyFieldsMixin, models.Model):
 
     @property
     def disabled_host(self):
-        if self.is_disabled:
+        if hasattr(self, "prefetched_disabled_host"):
+            return self.prefetched_disabled_host
+        elif self.is_disabled:
             return Disabled.objects.filter(pk=self.mac).first()
         else:
             return None
@@ -616,32 +638,20 @@ class Host(DirtyFieldsMixin, models.Model):
         # TODO: Address type is old and eventually will be deprecated.
         # Try to set address type if doesn't exist if host already exists in DB.
         if self.pk and not self.address_type_id:
-            from openipam.network.models import AddressType, NetworkRange
+            from openipam.network.prefix_index import prefix_index
 
             addresses = self._addresses_cache
             pools = self._pools_cache
 
-            try:
-                # if (len(addresses) + len(pools)) > 1:
-                #     self.address_type = None
-                # elif addresses:
-                if addresses:
-                    try:
-                        ranges = NetworkRange.objects.filter(
-                            range__net_contains_or_equals=addresses[0].address
-                        )
-                        if ranges:
-                            self.address_type_id = AddressType.objects.get(
-                                ranges__in=ranges
-                            )
-                        else:
-                            raise AddressType.DoesNotExist
-                    except AddressType.DoesNotExist:
-                        self.address_type_id = AddressType.objects.get(is_default=True)
-                elif pools:
-                    self.address_type_id = AddressType.objects.get(pool=pools[0])
-            except AddressType.DoesNotExist:
-                self.address_type_id = None
+            # if (len(addresses) + len(pools)) > 1:
+            #     self.address_type = None
+            # elif addresses:
+            if addresses:
+                self.address_type_id = prefix_index.get_address_type(
+                    addresses[0].address
+                )
+            elif pools:
+                self.address_type_id = prefix_index.get_address_type_for_pool(pools[0])
 
         return self.address_type_id
 
@@ -684,6 +694,22 @@ class Host(DirtyFieldsMixin, models.Model):
                 return None
             elif len(self.ip_addresses) == 1:
                 return self.ip_addresses[0]
+            elif all(
+                "arecords" in getattr(address, "_prefetched_objects_cache", {})
+                for address in self.addresses.all()
+            ):
+                address = next(
+                    (
+                        address
+                        for address in self.addresses.all()
+                        if any(
+                            record.name == self.hostname
+                            for record in address.arecords.all()
+                        )
+                    ),
+                    None,
+                )
+                return str(address) if address else self.ip_addresses[0]
             else:
                 address = self.addresses.filter(arecords__name=self.hostname).first()
                 return str(address) if address else self.ip_addresses[0]
@@ -696,6 +722,8 @@ class Host(DirtyFieldsMixin, models.Model):
     def delete_ip_address(self, user, address):
         if isinstance(address, string_types):
             address = self.addresses.filter(address=address)
+        elif isinstance(address, models.Model):
+            address = self.addresses.filter(address=address.address)
 
         # Delete DNS PTR and A Records
         self.delete_dns_records(user=user, addresses=address)
@@ -704,8 +732,16 @@ class Host(DirtyFieldsMixin, models.Model):
         address.release(user=user)
 
     def add_ip_address(self, user=None, ip_address=None, network=None, hostname=None):
+        from openipam.network.allocation import (
+            can_assign_to_network,
+            claim_free_addresses,
+        )
         from openipam.network.models import Network, Address
         from openipam.dns.models import DnsRecord, DnsType
+        from openipam.user.utils.permission_closure import (
+            closure_q,
+            get_permission_closure,
+        )
 
         user = user or self._user
         if not user:
@@ -731,111 +767,82 @@ class Host(DirtyFieldsMixin, models.Model):
                 % (hostname, used_hostname.ip_content)
             )
 
-        user_pools = get_objects_for_user(
-            user, ["network.add_records_to_pool", "network.change_pool"], any_perm=True
-        )
-
-        user_nets = get_objects_for_user(
-            user,
-            [
-                "network.add_records_to_network",
-                "network.is_owner_network",
-                "network.change_network",
-            ],
-            any_perm=True,
-        )
+        # The address stays locked from its claim until it is assigned.
+        with transaction.atomic():
+            if network:
+                if isinstance(network, string_types):
+                    network = Network.objects.get(network=network)
+
+                if not can_assign_to_network(user, network):
+                    raise ValidationError(
+                        "You do not have access to assign host '%s' to the "
+                        "network specified: %s." % (hostname, network)
+                    )
 
-        if network:
-            if isinstance(network, string_types):
-                network = Network.objects.get(network=network)
+                # Claim the lowest free address, skipping any a concurrent
+                # request has locked, and hold it until this transaction ends.
+                claimed = claim_free_addresses(network, user=user, host=self)
+                if not claimed:
+                    raise ValidationError(
+                        "There are no avaiable addresses for the network entered: %s"
+                        % network
+                    )
+                address = claimed[0]
+
+            elif ip_address:
+                # Validate IP Address
+                try:
+                    validate_ipv46_address(ip_address)
+                except ValidationError:
+                    raise ValidationError(
+                        "IP Address %s is invalid.  Enter a valid IPv4 or IPv6 address."
+                        % ip_address
+                    )
 
-            if not user_nets.filter(network=network.network):
-                raise ValidationError(
-                    "You do not have access to assign host '%s' to the "
-                    "network specified: %s." % (hostname, network)
-                )
+                if ip_address in self.ip_addresses:
+                    raise ValidationError(
+                        "IP address %s is already assigned to this host." % ip_address
+                    )
 
-            try:
-                network_address = (
-                    Address.objects.filter(
-                        Q(pool__in=user_pools) | Q(pool__isnull=True),
+                closure = get_permission_closure(user)
+                try:
+                    # Wait for a concurrent claim of this address, then recheck it.
+                    address = Address.objects.select_for_update(of=("self",)).get(
+                        closure_q(closure, "pools", "pool")
+                        | Q(pool__isnull=True)
+                        | closure_q(closure, "dns_networks", "network"),
                         Q(leases__isnull=True)
                         | Q(leases__abandoned=True)
                         | Q(leases__ends__lte=timezone.now())
                         | Q(leases__host=self),
-                        network=network,
-                        host__isnull=True,
+                        Q(host__isnull=True) | Q(host=self),
+                        address=ip_address,
                         reserved=False,
                     )
-                    .order_by("address")
-                    .first()
-                )
-
-                if not network_address:
-                    raise Address.DoesNotExist
-                else:
-                    address = network_address
-
-            except ValidationError:
-                raise ValidationError("The network '%s' is invalid." % network)
-            except Address.DoesNotExist:
-                raise ValidationError(
-                    "There are no avaiable addresses for the network entered: %s"
-                    % network
-                )
-
-        elif ip_address:
-            # Validate IP Address
-            try:
-                validate_ipv46_address(ip_address)
-            except ValidationError:
-                raise ValidationError(
-                    "IP Address %s is invalid.  Enter a valid IPv4 or IPv6 address."
-                    % ip_address
-                )
-
-            if ip_address in self.ip_addresses:
-                raise ValidationError(
-                    "IP address %s is already assigned to this host." % ip_address
-                )
-
-            try:
-                address = Address.objects.get(
-                    Q(pool__in=user_pools)
-                    | Q(pool__isnull=True)
-                    | Q(network__in=user_nets),
-                    Q(leases__isnull=True)
-                    | Q(leases__abandoned=True)
-                    | Q(leases__ends__lte=timezone.now())
-                    | Q(leases__host=self),
-                    Q(host__isnull=True) | Q(host=self),
-                    address=ip_address,
-                    reserved=False,
-                )
-            except ValidationError:
-                raise ValidationError(
-                    "There IP Address %s is not available." % ip_address
-                )
-            except Address.DoesNotExist:
+                except ValidationError:
+                    raise ValidationError(
+                        "There IP Address %s is not available." % ip_address
+                    )
+                except Address.DoesNotExist:
+                    raise ValidationError(
+                        "There are no avaiable addresses for the IP entered: %s"
+                        % ip_address
+                    )
+            else:
                 raise ValidationError(
-                    "There are no avaiable addresses for the IP entered: %s"
-                    % ip_address
+                    "A Network or IP Address must be given to assign this host an address."
                 )
-        else:
-            raise ValidationError(
-                "A Network or IP Address must be given to assign this host an address."
-            )
 
-        # Make sure pool is clear on addresses we are assigning.
-        address.pool_id = None
-        address.host = self
-        address.changed_by = user
-        address.save()
+            # Make sure pool is clear on addresses we are assigning.
+            address.pool_id = None
+            address.host = self
+            address.changed_by = user
+            address.save()
 
-        # Update A and PTR dns records
-        self.add_dns_records(user=user, hostname=hostname, address=address)
+            # Update A and PTR dns records
+            self.add_dns_records(user=user, hostname=hostname, address=address)
 
-        return address
+            return address
 
     def delete_dns_records(
         self, user=None, delete_only_master_dns=False, delete_dchpdns=True, addresses=[]
@@ -1016,6 +1023,8 @@ class Host(DirtyFieldsMixin, models.Model):
             """,
                 [str(new_mac_address), str(self.mac)],
             )
+            queue_host_summary_refresh([self.mac, new_mac_address])
+            queue_search_refresh("host", [self.mac, new_mac_address])
             self.mac = str(new_mac_address).lower()
         elif not self.pk:
             self.mac = str(new_mac_address).lower()
@@ -1115,19 +1124,27 @@ class Host(DirtyFieldsMixin, models.Model):
     def remove_user_owners(self, users=None):
         if not users:
             users = self.get_owners(users_only=True)
+        self._clear_owners_cache()
         for user in users:
             remove_perm("is_owner_host", user, self)
 
     def remove_group_owners(self, groups=None):
         if not groups:
             users, groups = self.get_owners()
+        self._clear_owners_cache()
         for group in groups:
             remove_perm("is_owner_host", group, self)
 
+    def _clear_owners_cache(self):
+        for attr in ("owners", "prefetched_user_owners", "prefetched_group_owners"):
+            self.__dict__.pop(attr, None)
+
     def remove_owner(self, user_or_group):
+        self._clear_owners_cache()
         return remove_perm("is_owner_host", user_or_group, self)
 
     def assign_owner(self, user_or_group):
+        self._clear_owners_cache()
         return assign_perm("is_owner_host", user_or_group, self)
 
     def save(self, user=None, add_dns=True, *args, **kwargs):
@@ -1377,5 +1394,73 @@ class OUI(models.Model):
         db_table = "ouis"
 
 
+class HostSummary(models.Model):
+    """
+    One row per host with everything the host list shows, kept up to date by
+    ``openipam.hosts.host_summary`` so listing hosts reads one narrow table
+    instead of joining addresses, leases, ARP history and OUIs per page.
+    """
+
+    # No database constraint, so changing a host's MAC (which rewrites its
+    # primary key) is not blocked; rows left behind are pruned on refresh.
+    host = models.OneToOneField(
+        "Host",
+        primary_key=True,
+        db_column="mac",
+        db_constraint=False,
+        related_name="summary",
+        on_delete=models.CASCADE,
+    )
+    hostname = models.CharField(max_length=255)
+    expires = models.DateTimeField()
+    disabled = models.BooleanField(default=False)
+    vendor = models.CharField(max_length=255, blank=True, null=True)
+    # The lowest static address, or the lowest leased address.
+    first_address = InetAddressField(blank=True, null=True, store_prefix_length=False)
+    addresses = ArrayField(models.GenericIPAddressField(), default=list)
+    # Leases that had not ended when the row was refreshed.
+    leases = ArrayField(models.GenericIPAddressField(), default=list)
+    leases_expire = models.DateTimeField(blank=True, null=True)
+    last_mac_seen = models.DateTimeField(blank=True, null=True)
+    last_ip_seen = models.DateTimeField(blank=True, null=True)
+    refreshed = models.DateTimeField()
+
+    objects = NetManager()
+
+    def __str__(self):
+        return "%s" % self.host_id
+
+    @property
+    def ip_addresses(self):
+        """Static addresses, then active leases, without duplicates."""
+        ips = list(self.addresses)
+        ips.extend(ip for ip in self.leases if ip not in ips)
+        return ips
+
+    class Meta:
+        db_table = "host_summary"
+        indexes = [
+            models.Index(fields=["hostname"], name="host_summary_hostname_idx"),
+            models.Index(fields=["expires"], name="host_summary_expires_idx"),
+            models.Index(
+                fields=["first_address"], name="host_summary_first_address_idx"
+            ),
+            models.Index(
+                fields=["leases_expire"], name="host_summary_leases_expire_idx"
+            ),
+            models.Index(fields=["refreshed"], name="host_summary_refreshed_idx"),
+            GinIndex(fields=["addresses"], name="host_summary_addresses_gin"),
+            GinIndex(fields=["leases"], name="host_summary_leases_gin"),
+        ]
+
+
 # Host signals
 pre_delete.connect(remove_obj_perms_connected_with_user, sender=Host)
+post_save.connect(refresh_host_summary_on_change, sender=Host)
+post_save.connect(refresh_search_document, sender=Host)
+post_delete.connect(refresh_search_document, sender=Host)
+post_save.connect(refresh_host_summary_on_change, sender=Disabled)
+post_delete.connect(refresh_host_summary_on_change, sender=Disabled)
+for typeahead_sender in (Attribute, StructuredAttributeValue):
+    post_save.connect(invalidate_typeahead, sender=typeahead_sender)
+    post_delete.connect(invalidate_typeahead, sender=typeahead_sender)
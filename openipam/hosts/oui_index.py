@@ -0,0 +1,111 @@
+from openipam.core.utils.local_snapshot import LocalSnapshot
+
+from array import array
+from bisect import bisect_right
+
+import re
+
+
+def mac_to_int(mac):
+    # netaddr EUI objects convert directly; forms and the API hand back strings.
+    if isinstance(mac, str):
+        return int(re.sub("[^0-9a-fA-F]", "", mac), 16)
+    return int(mac)
+
+
+class _OUISnapshot(object):
+    """
+    The ``ouis`` ranges flattened into sorted, non-overlapping segments.
+
+    Manuf ranges nest (a /36 block inside a /24 OUI), so each segment is
+    labelled with the covering range that has the highest id, which is the row
+    ``HostQuerySet.with_oui`` picks.
+    """
+
+    def __init__(self):
+        from openipam.hosts.models import OUI
+
+        self.starts = array("Q")
+        self.stops = array("Q")
+        self.name_ids = array("I")
+        self.names = []
+
+        rows = [
+            (mac_to_int(start), mac_to_int(stop), pk, shortname)
+            for pk, start, stop, shortname in OUI.objects.values_list(
+                "pk", "start", "stop", "shortname"
+            )
+        ]
+        # Outer ranges before the ranges nested inside them.
+        rows.sort(key=lambda row: (row[0], -row[1]))
+
+        # Stack of (stop, winning pk, name index) for the ranges covering the cursor.
+        stack = []
+        cursor = 0
+        for start, stop, pk, shortname in rows:
+            while stack and stack[-1][0] < start:
+                cursor = self._close(stack, cursor)
+            if stack and cursor < start:
+                self._emit(cursor, start - 1, stack[-1][2])
+            cursor = start
+
+            self.names.append(shortname)
+            name_id = len(self.names) - 1
+            if stack and stack[-1][1] > pk:
+                stack.append((stop, stack[-1][1], stack[-1][2]))
+            else:
+                stack.append((stop, pk, name_id))
+
+        while stack:
+            cursor = self._close(stack, cursor)
+
+    def _close(self, stack, cursor):
+        stop, pk, name_id = stack.pop()
+        if cursor <= stop:
+            self._emit(cursor, stop, name_id)
+        return max(cursor, stop + 1)
+
+    def _emit(self, start, stop, name_id):
+        if self.stops and self.stops[-1] + 1 == start and self.name_ids[-1] == name_id:
+            self.stops[-1] = stop
+            return
+        self.starts.append(start)
+        self.stops.append(stop)
+        self.name_ids.append(name_id)
+
+    def lookup(self, mac_int):
+        i = bisect_right(self.starts, mac_int) - 1
+        if i >= 0 and mac_int <= self.stops[i]:
+            return self.names[self.name_ids[i]]
+        return None
+
+
+class OUIIndex(LocalSnapshot):
+    """
+    Process-local MAC to vendor lookup over the ``ouis`` table.
+
+    Lookups are a bisect over sorted integer arrays and never touch the
+    database.  ``import_ouis`` invalidates the index when it finishes.
+    """
+
+    version_key = "ipam_oui_index_version"
+    recheck_setting = "OUI_INDEX_RECHECK_SECONDS"
+
+    def build(self):
+        return _OUISnapshot()
+
+    def vendor(self, mac):
+        """Return the OUI shortname for ``mac``, or None."""
+        if not mac:
+            return None
+        return self.snapshot.lookup(mac_to_int(mac))
+
+    def vendors(self, macs):
+        """Return ``{str(mac): shortname}`` for a list of MACs."""
+        snapshot = self.snapshot
+        return {
+            str(mac): snapshot.lookup(mac_to_int(mac)) if mac else None for mac in macs
+        }
+
+
+oui_index = OUIIndex()
@@ -0,0 +1,5 @@
+def refresh_host_summary_on_change(sender, instance, **kwargs):
+    from openipam.hosts.host_summary import queue_host_summary_refresh
+
+    # Host and Disabled are both keyed by MAC.
+    queue_host_summary_refresh([instance.pk])
@@ -2,7 +2,18 @@
 # import ipaddr
 # from django.test import TestCase
 
-from openipam.hosts.models import Host
+from openipam.hosts.models import Host, HostSummary, OUI
+from openipam.hosts.oui_index import oui_index
+from openipam.hosts.host_summary import (
+    refresh_host_summary,
+    refresh_host_summary_vendors,
+)
+from openipam.hosts.export import iter_host_export
+from openipam.hosts.management.expiry_notifications import (
+    RunStats,
+    mark_notified,
+    send_in_chunks,
+)
 
 # from openipam.network.models import Network, Address, Pool, HostToPool, AddressType, NetworkRange
 # from openipam.dns.models import Domain, DnsRecord, DnsType
@@ -12,6 +23,8 @@ from openipam.dns.models import DnsRecord
 from openipam.core.tests.test_models import IPAMTestCase
 
 # from django.utils import timezone
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection
 from django.db import IntegrityError
 
 # import datetime
@@ -240,3 +253,88 @@ class HostTest(IPAMTestCase):
             str(DnsRecord.objects.get(name="new-ip-additional.valid").ip_content),
             "192.168.1.20",
         )
+
+    def test_with_owners(self):
+        host = self.change_and_test("owned.valid", "001020304060", "192.168.1.16")
+        owners = host.get_owners()
+        with self.assertNumQueries(3):
+            hosts = list(Host.objects.filter(pk=host.pk).with_owners())
+            self.assertEqual(hosts[0].get_owners(), owners)
+
+    def test_export(self):
+        host = self.change_and_test("exported.valid", "001020304070", "192.168.1.17")
+        rows = list(iter_host_export(Host.objects.filter(pk=host.pk), chunk_size=1))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][0], "exported.valid")
+        self.assertEqual(rows[0][6], self.user_model.username)
+
+    def test_oui_index(self):
+        OUI.objects.create(start="001122000000", stop="001122ffffff", shortname="Outer")
+        OUI.objects.create(start="001122300000", stop="0011223fffff", shortname="Inner")
+        oui_index.invalidate()
+
+        self.assertEqual(
+            oui_index.vendors(
+                ["00:11:22:00:00:01", "00:11:22:30:00:01", "00:11:23:00:00:00"]
+            ),
+            {
+                "00:11:22:00:00:01": "Outer",
+                "00:11:22:30:00:01": "Inner",
+                "00:11:23:00:00:00": None,
+            },
+        )
+        # Built from rows this test's transaction will roll back, so not kept.
+        self.assertIsNone(oui_index._snapshot)
+
+    def test_host_summary(self):
+        host = self.change_and_test("summary.valid", "001122300001", "192.168.1.19")
+        OUI.objects.create(start="001122000000", stop="001122ffffff", shortname="Outer")
+
+        self.assertEqual(refresh_host_summary([host.mac]), 1)
+        summary = HostSummary.objects.get(host=host)
+        self.assertEqual(summary.hostname, "summary.valid")
+        self.assertEqual(summary.addresses, ["192.168.1.19"])
+        self.assertEqual(str(summary.first_address), "192.168.1.19")
+        self.assertEqual(summary.leases, [])
+        self.assertEqual(summary.vendor, "Outer")
+        self.assertFalse(summary.disabled)
+
+        OUI.objects.create(start="001122300000", stop="0011223fffff", shortname="Inner")
+        refresh_host_summary_vendors()
+        summary.refresh_from_db()
+        self.assertEqual(summary.vendor, "Inner")
+
+        self.assertEqual(
+            list(
+                Host.objects.filter(
+                    summary__addresses__contains=["192.168.1.19"]
+                ).values_list("pk", flat=True)
+            ),
+            [host.pk],
+        )
+
+        Host.objects.filter(pk=host.pk).delete()
+        refresh_host_summary([host.mac])
+        self.assertFalse(HostSummary.objects.filter(host_id=host.mac).exists())
+
+    def test_send_in_chunks(self):
+        host = self.change_and_test("notified.valid", "001020304080", "192.168.1.18")
+        messages = [
+            (EmailMessage("subject", "body", "from@valid", ["%s@valid" % i]), macs)
+            for i, macs in enumerate([[host.mac], [host.mac], []])
+        ]
+        done = []
+        stats = RunStats()
+        send_in_chunks(
+            messages,
+            get_connection("django.core.mail.backends.locmem.EmailBackend"),
+            2,
+            lambda macs: done.append(macs) or mark_notified(macs),
+            stats=stats,
+        )
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(done, [[host.mac], []])
+        self.assertEqual(stats.counts["chunks sent"], 2)
+        host.refresh_from_db()
+        self.assertIsNotNone(host.last_notified)
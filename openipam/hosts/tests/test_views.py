@@ -0,0 +1,54 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from openipam.api_v2.views.hosts import HostViewSet
+from openipam.core.tests.test_models import IPAMTestCase
+
+
+class HostViewSetTest(IPAMTestCase):
+    networks = [
+        {
+            "network": "192.168.0.0/24",
+            "name": "rfc1918-192-168-0",
+            "gateway": "192.168.0.1",
+        }
+    ]
+    dns_domains = [{"name": "valid", "type": "NATIVE"}]
+    dns_records = []
+    pools = [
+        {
+            "name": "pool1",
+            "description": "",
+            "allow_unknown": False,
+            "lease_time": 1800,
+            "assignable": False,
+        }
+    ]
+    address_types = []
+    hosts = [
+        {
+            "hostname": "static-host.valid",
+            "mac": "ffffff000000",
+            "address": "192.168.0.3",
+        }
+    ] + [
+        {"hostname": "host-%03d.valid" % i, "mac": "aabbcc000%03d" % i, "pool": "pool1"}
+        for i in range(100)
+    ]
+
+    def _list_queries(self, page_size):
+        request = APIRequestFactory().get("/api/v2/hosts/", {"page_size": page_size})
+        force_authenticate(request, user=self.user_model)
+        view = HostViewSet.as_view({"get": "list"})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+            response.render()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), page_size)
+        return len(queries)
+
+    def test_list_query_count_is_constant(self):
+        self.assertEqual(self._list_queries(100), self._list_queries(5))
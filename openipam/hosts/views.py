@@ -40,11 +40,13 @@ from openipam.hosts.forms import (
 )
 from openipam.hosts.models import (
     Host,
+    HostSummary,
     Disabled,
     Attribute,
     FreeformAttributeToHost,
     StructuredAttributeValue,
 )
+from openipam.network.allocation import can_assign_to_network, claim_free_addresses
 from openipam.network.models import Address, AddressType, Network
 from openipam.hosts.actions import (
     delete_hosts,
@@ -61,6 +63,7 @@ from openipam.hosts.actions import (
     change_network_on_host,
 )
 from openipam.conf.ipam_settings import CONFIG
+from openipam.hosts.host_summary import refresh_host_summary_in_background
 
 from braces.views import PermissionRequiredMixin, SuperuserRequiredMixin
 
@@ -77,7 +80,7 @@ User = get_user_model()
 class HostListJson(PermissionRequiredMixin, BaseDatatableView):
     permission_required = "hosts.view_host"
 
-    order_columns = ("pk", "hostname", "mac", "expires", "addresses")
+    order_columns = ("pk", "hostname", "mac", "expires", "summary__first_address")
 
     # set max limit of records returned, this is used to protect our site if someone tries to attack our site
     # and make it return huge amount of data
@@ -153,8 +156,9 @@ class HostListJson(PermissionRequiredMixin, BaseDatatableView):
                         ).distinct()
                     else:
                         qs = qs.filter(
-                            Q(addresses__address=ip) | Q(leases__address__address=ip)
-                        ).distinct()
+                            Q(summary__addresses__contains=[ip])
+                            | Q(summary__leases__contains=[ip])
+                        )
                 elif search_item.startswith("net:"):
                     if search_str.endswith("/"):
                         qs = qs.none()
@@ -237,13 +241,7 @@ class HostListJson(PermissionRequiredMixin, BaseDatatableView):
                 )
                 qs = qs.filter(mac__startswith=mac_str.lower())
             if vendor_search:
-                qs = qs.extra(
-                    where=[
-                        "hosts.mac >= ouis.start and hosts.mac <= ouis.stop AND ouis.shortname ILIKE %s"
-                    ],
-                    params=["%%%s%%" % vendor_search],
-                    tables=["ouis"],
-                )
+                qs = qs.filter(summary__vendor__icontains=vendor_search)
             if ip_search:
                 if re.search("[a-zA-Z]", ip_search):
                     qs = qs.none()
@@ -282,12 +280,9 @@ class HostListJson(PermissionRequiredMixin, BaseDatatableView):
                         ).distinct()
                     else:
                         qs = qs.filter(
-                            Q(addresses__address=ip)
-                            | Q(
-                                leases__address__address=ip,
-                                leases__ends__gt=timezone.now(),
-                            )
-                        ).distinct()
+                            Q(summary__addresses__contains=[ip])
+                            | Q(summary__leases__contains=[ip])
+                        )
 
             # if group_filter:
             #     group = Group.objects.filter(pk=group_filter).first()
@@ -308,73 +303,36 @@ class HostListJson(PermissionRequiredMixin, BaseDatatableView):
 
         return qs
 
-    def raw_ordering(self):
-        order_columns = (
-            "hosts.mac",
-            "hosts.hostname",
-            "hosts.mac",
-            "hosts.expires",
-            "first_address",
-        )
-
-        # Number of columns that are used in sorting
-        order_data = self.json_data.get("order", [])
-
-        order = []
-        for item in order_data:
-            column = item["column"]
-            column_dir = item["dir"]
-            sdir = "DESC" if column_dir == "desc" else "ASC"
-            sortcol = order_columns[column]
-            order.append("%s %s" % (sortcol, sdir))
-
-        if order:
-            return ",".join(order)
-        else:
-            return "hosts.hostname"
-
     def prepare_results(self, qs):
-        qs_macs = [str(q.mac) for q in qs]
-
-        if not qs_macs:
-            value_qs = []
-        else:
-
-            def dictfetchall(cursor):
-                "Returns all rows from a cursor as a dict"
-                desc = cursor.description
-                return [
-                    dict(list(zip([col[0] for col in desc], row)))
-                    for row in cursor.fetchall()
-                ]
-
-            c = connection.cursor()
-            c.execute(
-                """
-                SELECT
-                    hosts.mac, hosts.hostname, hosts.expires, disabled.mac AS disabled,
-                    array_agg(host(addresses.address)) AS address, array_agg(host(leases.address)) AS lease,
-                    coalesce(min(addresses.address), min(leases.address)) as first_address,
-                    array_agg(leases.ends) AS ends, array_agg(gul_recent_arp_byaddress.stopstamp) AS ip_stamp,
-                    (SELECT ouis.shortname from ouis
-                        WHERE hosts.mac >= ouis.start AND hosts.mac <= ouis.stop
-                        ORDER BY ouis.id DESC LIMIT 1) AS vendor,
-                    (SELECT MAX(stopstamp) FROM gul_recent_arp_bymac
-                        WHERE hosts.mac = gul_recent_arp_bymac.mac) AS mac_stamp
-                FROM hosts
-                    LEFT OUTER JOIN addresses ON hosts.mac = addresses.mac
-                    LEFT OUTER JOIN gul_recent_arp_byaddress ON addresses.address = gul_recent_arp_byaddress.address
-                    LEFT OUTER JOIN leases ON hosts.mac = leases.mac
-                    LEFT OUTER JOIN disabled ON hosts.mac = disabled.mac
-                    LEFT OUTER JOIN ouis ON hosts.mac >= ouis.start AND hosts.mac <= ouis.stop
-                WHERE hosts.mac IN %%s
-                GROUP BY hosts.mac, hosts.hostname, hosts.expires, disabled.mac
-                ORDER BY %s
-            """
-                % self.raw_ordering(),
-                [tuple(qs_macs)],
+        hosts = list(qs)
+        qs_macs = [str(host.mac) for host in hosts]
+
+        # Summaries are shown as they are; those missing, or listing a lease
+        # that has since ended, are refreshed in the background.
+        summaries = {
+            str(summary.host_id): summary
+            for summary in HostSummary.objects.filter(host__in=qs_macs)
+        }
+        now = timezone.now()
+        stale = [
+            mac
+            for mac in qs_macs
+            if mac not in summaries
+            or (summaries[mac].leases_expire and summaries[mac].leases_expire <= now)
+        ]
+        if stale:
+            refresh_host_summary_in_background(stale)
+        for host in hosts:
+            # Not summarized yet (its refresh runs once its change commits).
+            summaries.setdefault(
+                str(host.mac),
+                HostSummary(
+                    host=host,
+                    hostname=host.hostname,
+                    expires=host.expires,
+                    disabled=bool(host.is_disabled),
+                ),
             )
-            value_qs = dictfetchall(c)
 
         user = self.request.user
         user_change_permissions = Host.objects.filter(pk__in=qs_macs).by_change_perms(
@@ -383,68 +341,14 @@ class HostListJson(PermissionRequiredMixin, BaseDatatableView):
         global_delete_permission = user.has_perm("hosts.delete_host")
         global_change_permission = user.has_perm("hosts.change_host")
 
-        def get_last_mac_stamp(host):
-            mac_stamp = host["mac_stamp"]
-            if mac_stamp:
-                mac_stamp = max(mac_stamp) if isinstance(mac_stamp, list) else mac_stamp
-                return timezone.localtime(mac_stamp).strftime("%Y-%m-%d %I:%M %p")
+        def get_stamp(stamp):
+            if stamp:
+                return timezone.localtime(stamp).strftime("%Y-%m-%d %I:%M %p")
             else:
                 return None
 
-        def get_last_ip_stamp(host):
-            ip_stamp = host["ip_stamp"]
-            ip_stamp = [ip_stamp] if not isinstance(ip_stamp, list) else ip_stamp
-            ip_stamp = [stamp for stamp in ip_stamp if stamp is not None]
-            if ip_stamp:
-                return timezone.localtime(max(ip_stamp)).strftime("%Y-%m-%d %I:%M %p")
-            else:
-                return None
-
-        def get_last_ip(host):
-            if host.is_dynamic:
-                leases = host.leases.all()
-                if leases:
-                    return str(leases[0].address)
-                else:
-                    return None
-            else:
-                addresses = host.addresses.all()
-                if addresses:
-                    return str(addresses[0])
-                else:
-                    return None
-
-        def get_ips(host):
-            addresses = []
-            host["address"] = (
-                [host["address"]]
-                if not isinstance(host["address"], list)
-                else host["address"]
-            )
-            host["lease"] = (
-                [host["lease"]]
-                if not isinstance(host["lease"], list)
-                else host["lease"]
-            )
-            host["ends"] = (
-                [host["ends"]] if not isinstance(host["ends"], list) else host["ends"]
-            )
-            if host["address"]:
-                for address in host["address"]:
-                    if address and address not in addresses:
-                        addresses.append(address)
-            if host["lease"]:
-                for index, lease in enumerate(host["lease"]):
-                    if lease and lease not in addresses:
-                        try:
-                            if (
-                                host["ends"][index]
-                                and host["ends"][index] > timezone.now()
-                            ):
-                                addresses.append(lease)
-                        except IndexError:
-                            pass
-
+        def get_ips(summary):
+            addresses = summary.ip_addresses
             if addresses:
                 if len(addresses) == 1:
                     return "<span>%s</span>" % addresses[0]
@@ -468,11 +372,11 @@ class HostListJson(PermissionRequiredMixin, BaseDatatableView):
             else:
                 return timezone.localtime(expires).strftime("%Y-%m-%d")
 
-        def get_selector(host, change_permissions):
+        def get_selector(mac, change_permissions):
             if change_permissions or global_delete_permission:
                 return (
                     '<input class="action-select" name="selected_hosts" type="checkbox" value="%s" />'
-                    % host["mac"]
+                    % mac
                 )
             else:
                 return ""
@@ -485,53 +389,52 @@ class HostListJson(PermissionRequiredMixin, BaseDatatableView):
         # prepare list with output column data
         # queryset is already paginated here
         json_data = []
-        for host in value_qs:
-            is_disabled = "disabled" if host["disabled"] else ""
+        for mac in qs_macs:
+            host = summaries[mac]
+            is_disabled = "disabled" if host.disabled else ""
 
             if not is_disabled and (
-                global_change_permission or host["mac"] in user_change_permissions
+                global_change_permission or mac in user_change_permissions
             ):
                 change_permissions = True
             else:
                 change_permissions = False
-            host_view_href = reverse_lazy(
-                "core:hosts:view_host", args=(slugify(host["mac"]),)
-            )
+            host_view_href = reverse_lazy("core:hosts:view_host", args=(slugify(mac),))
             host_edit_href = reverse_lazy(
-                "core:hosts:update_host", args=(slugify(host["mac"]),)
+                "core:hosts:update_host", args=(slugify(mac),)
             )
             host_ips = get_ips(host)
-            expires = get_expires(host["expires"])
-            last_mac_stamp = get_last_mac_stamp(host)
-            last_ip_stamp = get_last_ip_stamp(host)
+            expires = get_expires(host.expires)
+            last_mac_stamp = get_stamp(host.last_mac_seen)
+            last_ip_stamp = get_stamp(host.last_ip_seen)
 
-            if not host_ips:
+            if not host.ip_addresses:
                 is_flagged = True
             else:
                 is_flagged = False if last_ip_stamp or last_mac_stamp else True
 
             json_data.append(
                 [
-                    get_selector(host, change_permissions),
+                    get_selector(mac, change_permissions),
                     (
                         '<a href="%(view_href)s" rel="%(hostname)s" id="%(update_href)s"'
                         ' class="host-details %(is_disabled)s" data-toggle="modal">'
                         '<span class="glyphicon glyphicon-chevron-right"></span> %(hostname)s</a>'
                         % {
-                            "hostname": host["hostname"] or "N/A",
+                            "hostname": host.hostname or "N/A",
                             "view_href": host_view_href,
                             "update_href": host_edit_href,
                             "is_disabled": is_disabled,
                         }
                     ),
-                    host["mac"],
+                    mac,
                     expires,
                     host_ips,
-                    host["vendor"],
+                    host.vendor,
                     render_cell(last_mac_stamp, is_flagged, is_disabled),
                     render_cell(last_ip_stamp, is_flagged, is_disabled),
                     '<a href="%s?q=host:%s">DNS Records</a>'
-                    % (reverse_lazy("core:dns:list_dns"), host["hostname"]),
+                    % (reverse_lazy("core:dns:list_dns"), host.hostname),
                     '<a href="%s">%s</a>'
                     % (
                         host_edit_href if change_permissions else host_view_href,
@@ -982,6 +885,27 @@ class HostBulkCreateView(PermissionRequiredMixin, FormView):
 
         return host_vals
 
+    def claim_network_addresses(self, hosts):
+        """
+        Claim, with one query per network, an address for every row naming a
+        network the user may assign to.  Returns ``{network: [Address]}``;
+        rows left without one go through ``add_ip_address``, which reports why.
+        """
+        counts = collections.Counter(
+            row[5].strip() for row in hosts if len(row) > 5 and row[5].strip()
+        )
+        claimed = {}
+        for cidr, count in counts.items():
+            try:
+                network = Network.objects.filter(network=cidr).first()
+            except ValidationError:
+                continue
+            if network and can_assign_to_network(self.request.user, network):
+                claimed[cidr] = claim_free_addresses(
+                    network, count, user=self.request.user
+                )
+        return claimed
+
     def form_valid(self, form):
         hosts = []
         csv_file = form.cleaned_data["csv_file"]
@@ -1016,6 +940,7 @@ class HostBulkCreateView(PermissionRequiredMixin, FormView):
                 )
 
             with transaction.atomic():
+                claimed = self.claim_network_addresses(hosts)
                 for i in range(len(hosts)):
                     try:
                         host = self.host_to_dict(hosts[i])
@@ -1045,6 +970,15 @@ class HostBulkCreateView(PermissionRequiredMixin, FormView):
                         ):
                             host["pool"] = "routable-dynamic"
 
+                        if (
+                            "network" in host
+                            and "ip_address" not in host
+                            and claimed.get(host["network"])
+                        ):
+                            address = claimed[host["network"]].pop(0)
+                            host["ip_address"] = str(address.address)
+                            del host["network"]
+
                         if host["mac"] == "vmware":
                             host["mac"] = Host.objects.find_next_mac(vendor="vmware")
 
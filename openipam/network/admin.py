@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import redirect, render
 from django.conf.urls import url
 from django.contrib.contenttypes.models import ContentType
@@ -40,6 +41,8 @@ from openipam.network.forms import (
     VlanForm,
     BuildingAssignForm,
 )
+from openipam.network.utilization import queue_utilization_refresh
+from openipam.core.search import queue_search_refresh
 from openipam.core.admin import ChangedAdmin, custom_titled_filter
 
 from dal import autocomplete
@@ -116,54 +119,30 @@ class NetworkAdmin(ChangedAdmin):
         form = NetworkReziseForm(request.POST or None, initial={"network": network})
 
         if form.is_valid():
-            # Update primary key
-            Network.objects.filter(network=network).update(
-                network=form.cleaned_data["network"]
-            )
-            new_network = Network.objects.filter(
-                network=form.cleaned_data["network"]
-            ).first()
-
-            addresses = []
-            existing_addresses = [
-                address.address
-                for address in Address.objects.filter(
-                    address__net_contained_or_equal=new_network
-                )
-            ]
-
-            for address in new_network.network:
-                if address not in existing_addresses:
-                    reserved = False
-                    if address in (
-                        new_network.gateway,
-                        new_network.network[0],
-                        new_network.network[-1],
-                    ):
-                        reserved = True
-                    pool = (
-                        DefaultPool.objects.get_pool_default(address)
-                        if not reserved
-                        else None
+            try:
+                with transaction.atomic():
+                    # Update primary key
+                    Network.objects.filter(network=network).update(
+                        network=form.cleaned_data["network"]
                     )
-                    addresses.append(
-                        # TODO: Need to set pool eventually.
-                        Address(
-                            address=address,
-                            network=new_network,
-                            reserved=reserved,
-                            pool=pool,
-                            changed_by=request.user,
-                        )
+                    # update() skips the signals that keep search documents current.
+                    queue_search_refresh(
+                        "network", [network, form.cleaned_data["network"]]
                     )
-            if addresses:
-                Address.objects.bulk_create(addresses)
-
-            messages.success(
-                request, "Network: %s was successfully increased." % new_network.network
-            )
+                    new_network = Network.objects.filter(
+                        network=form.cleaned_data["network"]
+                    ).first()
+
+                    Address.objects.provision_network(new_network, user=request.user)
+            except ValidationError as e:
+                messages.error(request, ", ".join(e.messages))
+            else:
+                messages.success(
+                    request,
+                    "Network: %s was successfully resized." % new_network.network,
+                )
 
-            return redirect("../")
+                return redirect("../")
 
         return render(
             request,
@@ -186,12 +165,12 @@ class NetworkAdmin(ChangedAdmin):
             Lease.objects.filter(
                 address__address__net_contained_or_equal=network.network, abandoned=True
             ).update(abandoned=False, host="000000000000")
+        queue_utilization_refresh(queryset)
 
     def save_model(self, request, obj, form, change):
         super(NetworkAdmin, self).save_model(request, obj, form, change)
 
         if not change:
-            addresses = []
             existing_addresses = [
                 address.address
                 for address in Address.objects.filter(
@@ -205,27 +184,7 @@ class NetworkAdmin(ChangedAdmin):
                     % ",".join(str(e) for e in existing_addresses)
                 )
 
-            for address in obj.network:
-                reserved = False
-                if address in (obj.gateway, obj.network[0], obj.network[-1]):
-                    reserved = True
-                pool = (
-                    DefaultPool.objects.get_pool_default(address)
-                    if not reserved
-                    else None
-                )
-                addresses.append(
-                    # TODO: Need to set pool eventually.
-                    Address(
-                        address=address,
-                        network=obj,
-                        reserved=reserved,
-                        pool=pool,
-                        changed_by=request.user,
-                    )
-                )
-            if addresses:
-                Address.objects.bulk_create(addresses)
+            Address.objects.provision_network(obj, user=request.user)
 
     def get_search_results(self, request, queryset, search_term):
         queryset, use_distinct = super(NetworkAdmin, self).get_search_results(
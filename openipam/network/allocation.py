@@ -0,0 +1,63 @@
+from django.db.models import Count, Min
+
+from openipam.user.utils.permission_closure import closure_q, get_permission_closure
+
+from collections import OrderedDict
+
+
+def can_assign_to_network(user, network):
+    """Whether ``user`` may assign hosts addresses in ``network``."""
+    from openipam.network.models import Network
+
+    closure = get_permission_closure(user)
+    return (
+        Network.objects.filter(closure_q(closure, "dns_networks", "network"))
+        .filter(network=network.network)
+        .exists()
+    )
+
+
+def claim_free_addresses(network, count=1, user=None, host=None):
+    """
+    Claim the ``count`` lowest free addresses of ``network`` (fewer if it
+    runs out) for ``host``, limited to the pools of ``user`` if given.
+
+    The addresses are locked with ``FOR UPDATE SKIP LOCKED``, so concurrent
+    claims in the same network each get different addresses rather than
+    racing for the first one.  Call this in a transaction and assign the
+    addresses before it commits.
+    """
+    from openipam.network.models import Address
+
+    return (
+        Address.objects.filter(network=network)
+        .available(user=user, host=host)
+        .claim(count)
+    )
+
+
+def free_address_counts(networks, user=None):
+    """
+    Return ``{network: {"free": count, "first_free": address}}`` for each
+    of ``networks`` (``Network`` instances or CIDR strings), counting the
+    addresses ``claim_free_addresses`` could hand out, in one aggregate.
+    """
+    from openipam.network.models import Address
+
+    networks = [str(getattr(network, "network", network)) for network in networks]
+    counts = OrderedDict(
+        (network, {"free": 0, "first_free": None}) for network in networks
+    )
+    rows = (
+        Address.objects.filter(network__in=networks)
+        .available(user=user)
+        .order_by()
+        .values_list("network")
+        .annotate(free=Count("address", distinct=True), first_free=Min("address"))
+    )
+    for network, free, first_free in rows:
+        counts[str(network)] = {
+            "free": free,
+            "first_free": str(first_free) if first_free else None,
+        }
+    return counts
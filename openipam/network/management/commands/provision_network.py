@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from openipam.network.models import Address, Network
+from openipam.user.models import User
+
+
+class Command(BaseCommand):
+    help = "Create (or trim) the addresses of a network, reporting each batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("network", help="the network to provision, in CIDR form")
+        parser.add_argument(
+            "-u", "--user", required=True, help="user name to record the changes as"
+        )
+        parser.add_argument(
+            "--batch-size",
+            action="store",
+            dest="batch_size",
+            type=int,
+            default=None,
+            help="addresses to insert per statement",
+        )
+
+    def handle(self, *args, **options):
+        network = Network.objects.filter(network=options["network"]).first()
+        if not network:
+            raise CommandError("Network %s does not exist" % options["network"])
+        user = User.objects.filter(username=options["user"]).first()
+        if not user:
+            raise CommandError("User %s does not exist" % options["user"])
+
+        def progress(done, total):
+            self.stdout.write("%s/%s addresses checked" % (done, total))
+
+        created, deleted = Address.objects.provision_network(
+            network, user=user, batch_size=options["batch_size"], progress=progress
+        )
+        self.stdout.write("%s addresses created, %s deleted" % (created, deleted))
@@ -0,0 +1,19 @@
+from openipam.core.management.base import RefreshCommand
+from openipam.network.models import Network
+from openipam.network.utilization import (
+    refresh_stale_utilization,
+    refresh_utilization,
+)
+
+
+class Command(RefreshCommand):
+    help = "Recount the network utilization rollup and record its history."
+    noun = "networks"
+
+    def refresh_all(self, batch_size):
+        return refresh_utilization(
+            Network.objects.values_list("network", flat=True), batch_size=batch_size
+        )
+
+    def refresh_stale(self, max_age, batch_size):
+        return refresh_stale_utilization(max_age=max_age, batch_size=batch_size)
@@ -1,12 +1,14 @@
 from django.db.models import Model, Manager
+from django.db import connection, transaction
 from django.db.models.query import QuerySet
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 from guardian.shortcuts import get_objects_for_user
 
+from datetime import timedelta
 from functools import reduce
 
 # from netfields import NetManager
@@ -78,23 +80,23 @@ class NetworkQuerySet(QuerySet):
                 return qs
 
     def by_address_type(self, address_type):
-        from openipam.network.models import NetworkRange
+        from openipam.network.prefix_index import prefix_index
 
         # Get assigned ranges
-        assigned_ranges = NetworkRange.objects.filter(address_ranges__isnull=False)
+        assigned_ranges = prefix_index.get_ranges()
 
         # Get specific ranges on a address
-        net_range = address_type.ranges.all() if address_type else None
+        net_range = prefix_index.get_ranges(address_type) if address_type else None
 
         # Try and get from default ranges
         if address_type.is_default:
-            q_list = [
-                Q(network__net_contained_or_equal=net.range) for net in assigned_ranges
-            ]
+            if not assigned_ranges:
+                return self.all()
+            q_list = [Q(network__net_contained_or_equal=net) for net in assigned_ranges]
             return self.exclude(reduce(operator.or_, q_list))
         # Else If address has a range(s)
         elif net_range:
-            q_list = [Q(network__net_contained_or_equal=net.range) for net in net_range]
+            q_list = [Q(network__net_contained_or_equal=net) for net in net_range]
             return self.filter(reduce(operator.or_, q_list))
         else:
             return self.none()
@@ -104,6 +106,31 @@ class NetworkManager(Manager):
     pass
 
 
+class NetworkUtilizationQuerySet(QuerySet):
+    COUNT_FIELDS = (
+        "available",
+        "static",
+        "dynamic",
+        "leased",
+        "reserved",
+        "abandoned",
+        "expired",
+        "total",
+        "unleased",
+    )
+
+    def totals(self):
+        """Sum the counts of every network in this queryset."""
+        totals = self.aggregate(*[Sum(field) for field in self.COUNT_FIELDS])
+        return dict(
+            (field, totals["%s__sum" % field] or 0) for field in self.COUNT_FIELDS
+        )
+
+    def stale(self, max_age):
+        """Rows last refreshed more than ``max_age`` seconds ago."""
+        return self.filter(refreshed__lt=timezone.now() - timedelta(seconds=max_age))
+
+
 class DhcpGroupManager(Manager):
     def get_queryset(self):
         qs = super(DhcpGroupManager, self).get_queryset()
@@ -128,28 +155,122 @@ class AddressTypeManager(Manager):
 
 class AddressQuerySet(QuerySet):
     def release(self, user=None, pool=False):
-        from openipam.network.models import DefaultPool, Pool
-
+        """
+        Release every address in this queryset with a few set-based statements.
+
+        Addresses are unassigned from their host and given the most specific
+        DefaultPool (or ``pool`` if one is given), reserved ones included, as
+        the per-row release always did; leases on addresses left without a
+        pool are removed, as the ``release_leases`` signal does.  (Saving rows
+        one by one, ``set_default_pool`` also replaced an explicit ``pool``
+        with the default on unreserved rows; here ``pool`` is used as given.)
+        ``changed_by`` is set on every row so the addresses_log trigger still
+        records who released them.
+        """
         if not user:
             raise ValidationError("A user is required to delete hosts.")
 
-        # Loop through addresses and release them
-        for address in self:
-            # Get default pool if false
-            if pool is False:
-                obj_pool = DefaultPool.objects.get_pool_default(address=address.address)
-            # Assume an int if not Model
-            elif not isinstance(pool, Model):
-                obj_pool = Pool.objects.get(pk=pool)
+        from openipam.hosts.host_summary import queue_host_summary_refresh
+        from openipam.network.utilization import mark_utilization_dirty
 
-            address.host = None
-            address.pool = obj_pool
-            address.changed_by = user
-            address.changed = timezone.now()
-            address.save()
+        rows = list(self.order_by().values_list("address", "network", "host"))
+        if not rows:
+            return self
+        addresses = [str(address) for address, network, mac in rows]
+
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            if pool is False:
+                # Resolve the longest-prefix DefaultPool for every address in one join.
+                cursor.execute(
+                    """
+                    UPDATE addresses SET
+                        mac = NULL,
+                        pool = defaults.pool_id,
+                        changed = %s,
+                        changed_by = %s
+                    FROM (
+                        SELECT DISTINCT ON (a.address) a.address, dp.pool_id
+                            FROM addresses a
+                            LEFT JOIN default_pools dp ON dp.cidr >>= a.address
+                            WHERE a.address = ANY(%s::inet[])
+                            ORDER BY a.address, masklen(dp.cidr) DESC NULLS LAST
+                    ) AS defaults
+                    WHERE addresses.address = defaults.address
+                """,
+                    [now, user.pk, addresses],
+                )
+            else:
+                pool_id = pool.pk if isinstance(pool, Model) else pool
+                cursor.execute(
+                    """
+                    UPDATE addresses SET
+                        mac = NULL,
+                        pool = %s,
+                        changed = %s,
+                        changed_by = %s
+                    WHERE address = ANY(%s::inet[])
+                """,
+                    [pool_id, now, user.pk, addresses],
+                )
+
+            # Same rule as the release_leases signal: no host and no pool, no lease.
+            cursor.execute(
+                """
+                DELETE FROM leases USING addresses
+                    WHERE leases.address = addresses.address
+                        AND addresses.address = ANY(%s::inet[])
+                        AND addresses.pool IS NULL
+            """,
+                [addresses],
+            )
+            mark_utilization_dirty(
+                networks=set(network for address, network, mac in rows)
+            )
+            queue_host_summary_refresh(set(mac for address, network, mac in rows))
 
         return self
 
+    def available(self, user=None, host=None):
+        """
+        Addresses that can be assigned: not reserved, not on a host, and with
+        no lease or only an ended or abandoned one (or one held by ``host``).
+        With ``user``, only addresses in no pool or in a pool ``user`` may add
+        records to.
+        """
+        leases_q = (
+            Q(leases__isnull=True)
+            | Q(leases__abandoned=True)
+            | Q(leases__ends__lte=timezone.now())
+        )
+        if host is not None:
+            leases_q |= Q(leases__host=host)
+        qs = self.filter(leases_q, host__isnull=True, reserved=False)
+
+        if user is not None:
+            from openipam.user.utils.permission_closure import (
+                closure_q,
+                get_permission_closure,
+            )
+
+            closure = get_permission_closure(user)
+            qs = qs.filter(closure_q(closure, "pools", "pool") | Q(pool__isnull=True))
+        return qs
+
+    def claim(self, count=1):
+        """
+        Lock and return the ``count`` lowest addresses of this queryset with
+        ``SELECT ... FOR UPDATE SKIP LOCKED``, passing over rows another
+        transaction has already claimed instead of waiting on them.  Must run
+        in a transaction, and the rows stay locked until it ends, so assign
+        them before then.
+        """
+        return list(
+            self.order_by("address").select_for_update(skip_locked=True, of=("self",))[
+                :count
+            ]
+        )
+
     def by_dns_change_perms(self, user, pk=None):
         if user.has_perm("network.change_network") or user.has_perm(
             "network.is_owner_network"
@@ -160,22 +281,16 @@ class AddressQuerySet(QuerySet):
             else:
                 return self.all()
         else:
-            host_perms = get_objects_for_user(
-                user, ["hosts.is_owner_host", "hosts.change_host"], any_perm=True
-            ).values_list("pk", flat=True)
-            network_perms = get_objects_for_user(
-                user,
-                [
-                    "network.is_owner_network",
-                    "network.add_records_to_network",
-                    "network.change_network",
-                ],
-                any_perm=True,
-            ).values_list("pk", flat=True)
+            from openipam.user.utils.permission_closure import (
+                closure_q,
+                get_permission_closure,
+            )
+
+            closure = get_permission_closure(user)
 
             qs = self.filter(
-                Q(host__mac__in=list(host_perms))
-                | Q(network__network__in=list(network_perms))
+                closure_q(closure, "hosts", "host")
+                | closure_q(closure, "dns_networks", "network")
             )
 
             if pk:
@@ -185,7 +300,106 @@ class AddressQuerySet(QuerySet):
 
 
 class AddressManager(Manager):
-    pass
+    provision_batch_size = 4096
+
+    def provision_network(self, network, user, batch_size=None, progress=None):
+        """
+        Bring the addresses table in line with ``network.network``.
+
+        Missing addresses are generated in Postgres with ``generate_series`` and
+        inserted ``batch_size`` at a time, with the network, broadcast and
+        gateway addresses reserved and every other address given its most
+        specific DefaultPool by the same join.  Addresses still pointing at
+        ``network`` but outside of it (a shrink) are deleted, unless one of them
+        is in use.  ``progress`` is called with ``(done, total)`` after every
+        batch.  Returns a ``(created, deleted)`` tuple.
+        """
+        from openipam.network.utilization import queue_utilization_refresh
+
+        batch_size = batch_size or self.provision_batch_size
+        cidr = network.network
+        total = cidr.num_addresses
+        params = {
+            "network": str(cidr),
+            "gateway": str(network.gateway) if network.gateway else None,
+            "last": total - 1,
+            "changed": timezone.now(),
+            "changed_by": user.pk,
+        }
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT address FROM addresses
+                    WHERE network = %(network)s AND NOT address <<= %(network)s
+                        AND (mac IS NOT NULL
+                            OR EXISTS (SELECT 1 FROM dns_records r WHERE r.ip_content = addresses.address)
+                            OR EXISTS (SELECT 1 FROM dhcp_dns_records d WHERE d.ip_content = addresses.address))
+                    LIMIT 10
+            """,
+                params,
+            )
+            in_use = [row[0] for row in cursor.fetchall()]
+            if in_use:
+                raise ValidationError(
+                    "Addresses outside of %s are still in use: %s"
+                    % (cidr, ", ".join(str(address) for address in in_use))
+                )
+
+            cursor.execute(
+                """
+                DELETE FROM leases WHERE address IN (
+                    SELECT address FROM addresses
+                        WHERE network = %(network)s AND NOT address <<= %(network)s
+                )
+            """,
+                params,
+            )
+            cursor.execute(
+                """
+                DELETE FROM addresses
+                    WHERE network = %(network)s AND NOT address <<= %(network)s
+            """,
+                params,
+            )
+            deleted = cursor.rowcount
+
+            created = 0
+            for start in range(0, total, batch_size):
+                params["start"] = start
+                params["stop"] = min(start + batch_size, total) - 1
+                cursor.execute(
+                    """
+                    INSERT INTO addresses (address, network, reserved, pool, changed, changed_by)
+                    SELECT candidate.address, %(network)s, candidate.reserved,
+                            CASE WHEN candidate.reserved THEN NULL ELSE dp.pool_id END,
+                            %(changed)s, %(changed_by)s
+                        FROM (
+                            SELECT host(network(%(network)s::cidr) + s.i)::inet AS address,
+                                    (s.i IN (0, %(last)s)
+                                        OR host(network(%(network)s::cidr) + s.i)::inet
+                                            IS NOT DISTINCT FROM %(gateway)s::inet) AS reserved
+                                FROM generate_series(%(start)s::bigint, %(stop)s::bigint) AS s(i)
+                        ) AS candidate
+                        LEFT JOIN LATERAL (
+                            SELECT pool_id FROM default_pools
+                                WHERE cidr >>= candidate.address
+                                ORDER BY masklen(cidr) DESC LIMIT 1
+                        ) AS dp ON TRUE
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM addresses existing
+                                WHERE existing.address = candidate.address
+                        )
+                """,
+                    params,
+                )
+                created += cursor.rowcount
+                if progress:
+                    progress(params["stop"] + 1, total)
+
+            queue_utilization_refresh([cidr])
+
+        return created, deleted
 
 
 # class AddressManager(NetManager):
@@ -335,12 +549,7 @@ class AddressManager(Manager):
 
 class DefaultPoolManager(Manager):
     def get_pool_default(self, address):
+        from openipam.network.prefix_index import prefix_index
+
         # Find most specific DefaultPool for this address and return associated Pool
-        pool = (
-            self.filter(cidr__net_contains_or_equals=address).extra(
-                select={"masklen": "masklen(cidr)"}, order_by=["-masklen"]
-            )
-        ).first()
-        # first one should have the longest mask, which is most specific
-        pool = pool.pool if pool else None
-        return pool
+        return prefix_index.get_pool_default(address)
@@ -0,0 +1,77 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [("network", "0001_initial")]
+
+    operations = [
+        migrations.CreateModel(
+            name="NetworkUtilization",
+            fields=[
+                ("available", models.IntegerField(default=0)),
+                ("static", models.IntegerField(default=0)),
+                ("dynamic", models.IntegerField(default=0)),
+                ("leased", models.IntegerField(default=0)),
+                ("reserved", models.IntegerField(default=0)),
+                ("abandoned", models.IntegerField(default=0)),
+                ("expired", models.IntegerField(default=0)),
+                ("total", models.IntegerField(default=0)),
+                ("unleased", models.IntegerField(default=0)),
+                (
+                    "network",
+                    models.OneToOneField(
+                        db_column="network",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="utilization",
+                        serialize=False,
+                        to="network.Network",
+                    ),
+                ),
+                ("refreshed", models.DateTimeField()),
+            ],
+            options={"db_table": "network_utilization"},
+        ),
+        migrations.CreateModel(
+            name="NetworkUtilizationHistory",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("available", models.IntegerField(default=0)),
+                ("static", models.IntegerField(default=0)),
+                ("dynamic", models.IntegerField(default=0)),
+                ("leased", models.IntegerField(default=0)),
+                ("reserved", models.IntegerField(default=0)),
+                ("abandoned", models.IntegerField(default=0)),
+                ("expired", models.IntegerField(default=0)),
+                ("total", models.IntegerField(default=0)),
+                ("unleased", models.IntegerField(default=0)),
+                ("bucket", models.DateTimeField()),
+                ("refreshed", models.DateTimeField()),
+                (
+                    "network",
+                    models.ForeignKey(
+                        db_column="network",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="utilization_history",
+                        to="network.Network",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "network_utilization_history",
+                "ordering": ("network", "bucket"),
+                "unique_together": {("network", "bucket")},
+            },
+        ),
+    ]
@@ -0,0 +1,13 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("network", "0002_networkutilization")]
+
+    operations = [
+        migrations.AddField(
+            model_name="networkutilization",
+            name="dirty",
+            field=models.BooleanField(default=False),
+        )
+    ]
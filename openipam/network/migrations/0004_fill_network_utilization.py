@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def fill_network_utilization(apps, schema_editor):
+    # The refresh is raw SQL over the live tables, so only the networks are
+    # read through the historical model.
+    from openipam.network.utilization import refresh_utilization
+
+    Network = apps.get_model("network", "Network")
+    refresh_utilization(Network.objects.values_list("network", flat=True))
+
+
+class Migration(migrations.Migration):
+    dependencies = [("network", "0003_networkutilization_dirty")]
+
+    operations = [
+        migrations.RunPython(fill_network_utilization, migrations.RunPython.noop)
+    ]
@@ -1,7 +1,13 @@
 from django.conf import settings
 from django.db import models
 from django.core.exceptions import ValidationError
-from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.utils import timezone
 
 from djorm_pgfulltext.fields import VectorField
@@ -12,6 +18,8 @@ from netfields import InetAddressField, CidrAddressField
 from taggit.models import TaggedItemBase
 from taggit.managers import TaggableManager
 
+from openipam.autocomplete.signals import invalidate_typeahead
+from openipam.core.signals import refresh_search_document
 from openipam.network.managers import (
     LeaseManager,
     PoolManager,
@@ -22,11 +30,16 @@ from openipam.network.managers import (
     AddressQuerySet,
     NetworkManager,
     NetworkQuerySet,
+    NetworkUtilizationQuerySet,
 )
 from openipam.network.signals import (
     validate_address_type,
     release_leases,
     set_default_pool,
+    invalidate_prefix_index,
+    mark_address_utilization_dirty,
+    mark_lease_utilization_dirty,
+    refresh_host_summary_on_change,
 )
 from openipam.user.signals import remove_obj_perms_connected_with_user
 
@@ -59,6 +72,13 @@ class Lease(models.Model):
     def __str__(self):
         return "%s" % self.pk
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Lease, cls).from_db(db, field_names, values)
+        # So a lease handed to another host refreshes both host summaries.
+        instance._loaded_host_id = instance.__dict__.get("host_id")
+        return instance
+
     @property
     def is_expired(self):
         return True if self.ends <= timezone.now() else False
@@ -454,6 +474,13 @@ class Address(models.Model):
     def __str__(self):
         return str(self.address)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Address, cls).from_db(db, field_names, values)
+        # So an address moved to another host refreshes both host summaries.
+        instance._loaded_host_id = instance.__dict__.get("host_id")
+        return instance
+
     @property
     def last_mac_seen(self):
         from openipam.hosts.models import GulRecentArpBymac
@@ -529,9 +556,97 @@ class AddressType(models.Model):
         ordering = ("name",)
 
 
+class UtilizationCounts(models.Model):
+    available = models.IntegerField(default=0)
+    static = models.IntegerField(default=0)
+    dynamic = models.IntegerField(default=0)
+    leased = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    abandoned = models.IntegerField(default=0)
+    expired = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    unleased = models.IntegerField(default=0)
+
+    @property
+    def available_ratio(self):
+        if self.dynamic:
+            return self.available / self.dynamic
+        return 1.0
+
+    class Meta:
+        abstract = True
+
+
+class NetworkUtilization(UtilizationCounts):
+    """
+    Address and lease counts for one network, kept up to date by
+    ``openipam.network.utilization`` instead of being recomputed from the
+    addresses table on every read.
+    """
+
+    # No database constraint, so resizing a network (which rewrites its
+    # primary key) is not blocked; rows left behind are pruned on refresh.
+    network = models.OneToOneField(
+        "Network",
+        primary_key=True,
+        db_column="network",
+        db_constraint=False,
+        related_name="utilization",
+        on_delete=models.CASCADE,
+    )
+    # Set when an address or lease of the network changes, until the
+    # periodic refresh recounts it.
+    dirty = models.BooleanField(default=False)
+    refreshed = models.DateTimeField()
+
+    objects = NetworkUtilizationQuerySet.as_manager()
+
+    def __str__(self):
+        return "%s" % self.network_id
+
+    class Meta:
+        db_table = "network_utilization"
+
+
+class NetworkUtilizationHistory(UtilizationCounts):
+    network = models.ForeignKey(
+        "Network",
+        db_column="network",
+        db_constraint=False,
+        related_name="utilization_history",
+        on_delete=models.CASCADE,
+    )
+    bucket = models.DateTimeField()
+    refreshed = models.DateTimeField()
+
+    def __str__(self):
+        return "%s @ %s" % (self.network_id, self.bucket)
+
+    class Meta:
+        db_table = "network_utilization_history"
+        unique_together = ("network", "bucket")
+        ordering = ("network", "bucket")
+
+
 # Network Signals
 pre_save.connect(set_default_pool, sender=Address)
 m2m_changed.connect(validate_address_type, sender=AddressType.ranges.through)
 post_save.connect(release_leases, sender=Address)
 pre_delete.connect(remove_obj_perms_connected_with_user, sender=Network)
 pre_delete.connect(remove_obj_perms_connected_with_user, sender=DhcpOption)
+for prefix_sender in (DefaultPool, NetworkRange, AddressType, Pool):
+    post_save.connect(invalidate_prefix_index, sender=prefix_sender)
+    post_delete.connect(invalidate_prefix_index, sender=prefix_sender)
+m2m_changed.connect(invalidate_prefix_index, sender=AddressType.ranges.through)
+post_save.connect(mark_address_utilization_dirty, sender=Address)
+post_delete.connect(mark_address_utilization_dirty, sender=Address)
+post_save.connect(mark_lease_utilization_dirty, sender=Lease)
+post_delete.connect(mark_lease_utilization_dirty, sender=Lease)
+post_save.connect(refresh_search_document, sender=Network)
+post_delete.connect(refresh_search_document, sender=Network)
+for summary_sender in (Address, Lease):
+    post_save.connect(refresh_host_summary_on_change, sender=summary_sender)
+    post_delete.connect(refresh_host_summary_on_change, sender=summary_sender)
+for typeahead_sender in (Network, AddressType, DhcpGroup):
+    post_save.connect(invalidate_typeahead, sender=typeahead_sender)
+    post_delete.connect(invalidate_typeahead, sender=typeahead_sender)
@@ -0,0 +1,144 @@
+from openipam.core.utils.local_snapshot import LocalSnapshot
+
+from ipaddress import ip_network
+
+
+# Sentinel for trie nodes that do not terminate a stored prefix.
+_EMPTY = object()
+
+
+class PrefixTrie(object):
+    """
+    Binary radix trie keyed on IPv4 and IPv6 prefixes.
+
+    Each node is a ``[child0, child1, value]`` list so a lookup is at most
+    32 (or 128) list indexes and never touches the database.
+    """
+
+    def __init__(self):
+        self._roots = {4: [None, None, _EMPTY], 6: [None, None, _EMPTY]}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _parse(key):
+        # netfields hands back ipaddress objects, forms and the API hand back strings.
+        return ip_network(str(key), strict=False)
+
+    def insert(self, prefix, value):
+        net = self._parse(prefix)
+        bits = int(net.network_address)
+        max_len = net.max_prefixlen
+
+        node = self._roots[net.version]
+        for i in range(net.prefixlen):
+            bit = (bits >> (max_len - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, _EMPTY]
+            node = node[bit]
+
+        if node[2] is _EMPTY:
+            self._size += 1
+        node[2] = value
+
+    def matches(self, key):
+        """Return the values of every stored prefix containing ``key``, most specific first."""
+        net = self._parse(key)
+        bits = int(net.network_address)
+        max_len = net.max_prefixlen
+
+        node = self._roots[net.version]
+        found = [node[2]] if node[2] is not _EMPTY else []
+        for i in range(net.prefixlen):
+            node = node[(bits >> (max_len - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not _EMPTY:
+                found.append(node[2])
+
+        found.reverse()
+        return found
+
+    def longest_match(self, key, default=None):
+        found = self.matches(key)
+        return found[0] if found else default
+
+
+class _PrefixSnapshot(object):
+    def __init__(self):
+        from openipam.network.models import AddressType, DefaultPool, NetworkRange
+
+        self.pools = PrefixTrie()
+        for default_pool in DefaultPool.objects.select_related("pool"):
+            self.pools.insert(default_pool.cidr, default_pool.pool)
+
+        address_types = {
+            address_type.pk: address_type
+            for address_type in AddressType.objects.select_related("pool")
+        }
+        self.default_address_type = next(
+            (atype for atype in address_types.values() if atype.is_default), None
+        )
+        self.address_types_by_pool = {}
+        for atype in address_types.values():
+            if atype.pool_id and atype.pool_id not in self.address_types_by_pool:
+                self.address_types_by_pool[atype.pool_id] = atype
+
+        # range -> address types assigned to it (possibly none)
+        self.range_types = {
+            str(net_range.range): [] for net_range in NetworkRange.objects.all()
+        }
+        through = AddressType.ranges.through.objects.values_list(
+            "networkrange__range", "addresstype_id"
+        )
+        for net_range, atype_id in through:
+            self.range_types[str(net_range)].append(address_types[atype_id])
+
+        self.ranges = PrefixTrie()
+        for net_range, atypes in self.range_types.items():
+            self.ranges.insert(net_range, (net_range, atypes))
+
+
+class NetworkPrefixIndex(LocalSnapshot):
+    """
+    Process-local longest-prefix-match index over ``DefaultPool.cidr`` and
+    ``NetworkRange.range``, rebuilt after the network signals invalidate it.
+    """
+
+    version_key = "ipam_network_prefix_index_version"
+    recheck_setting = "PREFIX_INDEX_RECHECK_SECONDS"
+
+    def build(self):
+        return _PrefixSnapshot()
+
+    def get_pool_default(self, address):
+        return self.snapshot.pools.longest_match(address)
+
+    def get_address_type(self, address):
+        snapshot = self.snapshot
+        for net_range, atypes in snapshot.ranges.matches(address):
+            if atypes:
+                return atypes[0]
+        return snapshot.default_address_type
+
+    def get_address_type_for_pool(self, pool):
+        return self.snapshot.address_types_by_pool.get(getattr(pool, "pk", pool))
+
+    def get_ranges(self, address_type=None):
+        """
+        Return the CIDRs of the ranges assigned to ``address_type``, or of every
+        range assigned to any address type when ``address_type`` is None.
+        """
+        range_types = self.snapshot.range_types
+        if address_type is None:
+            return [net_range for net_range, atypes in range_types.items() if atypes]
+        return [
+            net_range
+            for net_range, atypes in range_types.items()
+            if address_type.pk in [atype.pk for atype in atypes]
+        ]
+
+
+prefix_index = NetworkPrefixIndex()
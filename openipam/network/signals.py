@@ -20,3 +20,30 @@ def validate_address_type(sender, instance, action, **kwargs):
     if action == "pre_add":
         if instance.pool:
             raise ValidationError("Address Types cannot have both a pool and a range.")
+
+
+def invalidate_prefix_index(sender, **kwargs):
+    from openipam.network.prefix_index import prefix_index
+
+    prefix_index.invalidate()
+
+
+def mark_address_utilization_dirty(sender, instance, **kwargs):
+    from openipam.network.utilization import mark_utilization_dirty
+
+    mark_utilization_dirty(networks=[instance.network_id])
+
+
+def mark_lease_utilization_dirty(sender, instance, **kwargs):
+    from openipam.network.utilization import mark_utilization_dirty
+
+    mark_utilization_dirty(addresses=[instance.address_id])
+
+
+def refresh_host_summary_on_change(sender, instance, **kwargs):
+    from openipam.hosts.host_summary import queue_host_summary_refresh
+
+    # An address or lease moved to another host changes both summaries.
+    queue_host_summary_refresh(
+        [instance.host_id, getattr(instance, "_loaded_host_id", None)]
+    )
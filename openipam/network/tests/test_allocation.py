@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+from openipam.core.tests.test_models import IPAMTestCase
+from openipam.network.allocation import claim_free_addresses, free_address_counts
+from openipam.network.models import Address, Network
+from openipam.user.models import User
+from openipam.user.utils.permission_closure import get_permission_closure
+
+from concurrent.futures import ThreadPoolExecutor
+from ipaddress import ip_network
+
+import threading
+import time
+
+
+class FreeAddressTest(IPAMTestCase):
+    def setUp(self):
+        self.networks = [
+            {"network": "10.10.0.0/29", "name": "alloc-net", "gateway": "10.10.0.1"}
+        ]
+        self.dns_domains = []
+        self.dns_records = []
+        self.hosts = []
+        self.pools = []
+        self.address_types = []
+        return super(FreeAddressTest, self).setUp()
+
+    def test_free_address_counts(self):
+        # .0, the gateway and the broadcast address are reserved.
+        counts = free_address_counts(["10.10.0.0/29"], user=self.user_model)
+        self.assertEqual(counts["10.10.0.0/29"], {"free": 5, "first_free": "10.10.0.2"})
+
+    def test_claim_lowest_addresses(self):
+        network = Network.objects.get(network="10.10.0.0/29")
+        with transaction.atomic():
+            claimed = claim_free_addresses(network, 2, user=self.user_model)
+        self.assertEqual(
+            [str(address) for address in claimed], ["10.10.0.2", "10.10.0.3"]
+        )
+
+        with transaction.atomic():
+            claimed = claim_free_addresses(network, 10)
+        self.assertEqual(len(claimed), 5)
+
+
+class ConcurrentAllocationTest(TransactionTestCase):
+    """Many transactions claiming from one network never get the same address."""
+
+    fixtures = IPAMTestCase.fixtures
+    workers = 8
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="admin", is_superuser=True)
+        self.network = Network.objects.create(
+            network="10.11.0.0/27",
+            name="stress-net",
+            gateway="10.11.0.1",
+            changed_by=self.user,
+        )
+        block = ip_network("10.11.0.0/27")
+        reserved = (block[0], block[1], block[-1])
+        Address.objects.bulk_create(
+            Address(
+                address=str(address),
+                network=self.network,
+                reserved=address in reserved,
+                changed_by=self.user,
+            )
+            for address in block
+        )
+
+    def claim_until_empty(self, barrier):
+        claimed = []
+        barrier.wait()
+        try:
+            while True:
+                with transaction.atomic():
+                    addresses = claim_free_addresses(self.network, user=self.user)
+                    if not addresses:
+                        return claimed
+                    # Hold the lock a moment, so the other workers must skip it.
+                    time.sleep(0.005)
+                    Address.objects.filter(pk=addresses[0].pk).update(reserved=True)
+                claimed.append(str(addresses[0]))
+        finally:
+            connection.close()
+
+    def test_concurrent_claims(self):
+        # Every claim then reads the superuser's closure back from the cache.
+        get_permission_closure(self.user)
+        barrier = threading.Barrier(self.workers)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self.claim_until_empty, barrier)
+                for _ in range(self.workers)
+            ]
+            results = [future.result() for future in futures]
+
+        claimed = [address for result in results for address in result]
+        self.assertEqual(len(claimed), 29)
+        self.assertEqual(len(set(claimed)), len(claimed))
+        self.assertFalse(Address.objects.filter(network=self.network).available())
@@ -9,10 +9,20 @@ from openipam.hosts.models import Host
 # from openipam.dns.models import DnsRecord
 # from openipam.user.models import User
 from openipam.core.tests.test_models import IPAMTestCase
+from openipam.network.models import (
+    Address,
+    DefaultPool,
+    Lease,
+    Network,
+    NetworkUtilization,
+    Pool,
+)
+from openipam.network.utilization import refresh_stale_utilization, refresh_utilization
+
+from django.utils import timezone
 
-# from django.utils import timezone
 # from django.db import IntegrityError
-# import datetime
+import datetime
 
 
 class AddressTest(IPAMTestCase):
@@ -128,3 +138,71 @@ class AddressTest(IPAMTestCase):
         # assign address
         # check stuff
         self.assertEqual(1, 0)
+
+
+class NetworkUtilizationTest(IPAMTestCase):
+    def setUp(self):
+        self.networks = [
+            {"network": "10.0.0.0/29", "name": "utilization", "gateway": "10.0.0.1"}
+        ]
+        self.dns_domains = []
+        self.dns_records = []
+        self.hosts = []
+        self.pools = [
+            {
+                "name": "pool1",
+                "description": "",
+                "allow_unknown": False,
+                "lease_time": 1800,
+                "assignable": False,
+            }
+        ]
+        self.address_types = []
+        return super(NetworkUtilizationTest, self).setUp()
+
+    def test_refresh_utilization(self):
+        pool = Pool.objects.get(name="pool1")
+        Address.objects.filter(address__in=["10.0.0.2", "10.0.0.3"]).update(pool=pool)
+        now = timezone.now()
+        Lease.objects.create(
+            address_id="10.0.0.2",
+            starts=now,
+            ends=now + datetime.timedelta(hours=1),
+        )
+
+        self.assertEqual(refresh_utilization(["10.0.0.0/29"]), 1)
+
+        utilization = NetworkUtilization.objects.get(network="10.0.0.0/29")
+        self.assertEqual(utilization.total, 8)
+        self.assertEqual(utilization.reserved, 3)
+        self.assertEqual(utilization.dynamic, 2)
+        self.assertEqual(utilization.leased, 1)
+        self.assertEqual(utilization.unleased, 1)
+        self.assertEqual(utilization.available, 1)
+        self.assertEqual(utilization.available_ratio, 0.5)
+        self.assertEqual(
+            NetworkUtilization.objects.totals()["total"], utilization.total
+        )
+
+    def test_release_keeps_pool_on_reserved(self):
+        pool = Pool.objects.get(name="pool1")
+        DefaultPool.objects.create(pool=pool, cidr="10.0.0.0/29")
+        now = timezone.now()
+        Lease.objects.create(
+            address_id="10.0.0.1", starts=now, ends=now + datetime.timedelta(hours=1)
+        )
+
+        Address.objects.filter(address="10.0.0.1").release(user=self.user_model)
+        address = Address.objects.get(address="10.0.0.1")
+        self.assertTrue(address.reserved)
+        self.assertEqual(address.pool, pool)
+        self.assertTrue(Lease.objects.filter(address_id="10.0.0.1").exists())
+
+    def test_refresh_dirty_utilization(self):
+        networks = Network.objects.filter(network="10.0.0.0/29")
+        refresh_utilization(networks)
+        self.assertEqual(refresh_stale_utilization(max_age=3600, networks=networks), 0)
+
+        NetworkUtilization.objects.filter(network="10.0.0.0/29").update(dirty=True)
+        self.assertEqual(refresh_stale_utilization(max_age=3600, networks=networks), 1)
+        self.assertFalse(NetworkUtilization.objects.get(network="10.0.0.0/29").dirty)
@@ -0,0 +1,165 @@
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from openipam.conf.ipam_settings import CONFIG
+from openipam.core.utils.on_commit import queue_on_commit
+from openipam.network.managers import NetworkUtilizationQuerySet
+
+from datetime import timedelta
+
+
+COUNT_FIELDS = NetworkUtilizationQuerySet.COUNT_FIELDS
+
+# The counts network_stats_carbon has always reported, in COUNT_FIELDS order.
+COUNT_EXPRESSIONS = (
+    "count((leases.ends < NOW() AND NOT leases.abandoned)"
+    " OR (addresses.pool IS NOT NULL AND leases.address IS NULL) OR NULL)",
+    "count(addresses.mac)",
+    "count(addresses.pool)",
+    "count(leases.address IS NOT NULL AND NOT leases.abandoned"
+    " AND leases.ends > NOW() OR NULL)",
+    "count(addresses.reserved OR NULL)",
+    "count(leases.abandoned OR NULL)",
+    "count(leases.ends < NOW() AND NOT leases.abandoned OR NULL)",
+    "count(addresses.address)",
+    "count(leases.address IS NULL AND addresses.pool IS NOT NULL OR NULL)",
+)
+
+_columns = ", ".join(COUNT_FIELDS)
+_updates = ", ".join("%s = EXCLUDED.%s" % (field, field) for field in COUNT_FIELDS)
+
+REFRESH_QUERY = """
+    INSERT INTO network_utilization (network, {columns}, dirty, refreshed)
+    SELECT networks.network, {counts}, false, %(refreshed)s
+        FROM networks
+        LEFT JOIN addresses ON addresses.network = networks.network
+        LEFT JOIN leases ON leases.address = addresses.address
+        WHERE networks.network = ANY(%(networks)s::cidr[])
+        GROUP BY networks.network
+    ON CONFLICT (network) DO UPDATE SET {updates}, dirty = false,
+        refreshed = EXCLUDED.refreshed
+""".format(
+    columns=_columns, counts=", ".join(COUNT_EXPRESSIONS), updates=_updates
+)
+
+# The last sample taken in a bucket stands for the whole bucket.
+HISTORY_QUERY = """
+    INSERT INTO network_utilization_history (network, bucket, {columns}, refreshed)
+    SELECT network,
+            to_timestamp(floor(extract(epoch FROM refreshed) / %(bucket)s) * %(bucket)s),
+            {columns}, refreshed
+        FROM network_utilization
+        WHERE network = ANY(%(networks)s::cidr[])
+    ON CONFLICT (network, bucket) DO UPDATE SET {updates}, refreshed = EXCLUDED.refreshed
+""".format(
+    columns=_columns, updates=_updates
+)
+
+
+def refresh_utilization(networks, batch_size=None):
+    """
+    Recount ``networks`` (``Network`` instances or CIDR strings) into the
+    network_utilization rollup, and record the counts in the history bucket
+    they fall in.  Networks are counted ``batch_size`` to a transaction, so a
+    full refresh never holds one long scan of the addresses table.  Returns
+    the number of networks refreshed.
+    """
+    batch_size = batch_size or CONFIG.get("NETWORK_UTILIZATION_BATCH_SIZE")
+    networks = sorted(set(str(getattr(net, "network", net)) for net in networks))
+    params = {"bucket": CONFIG.get("NETWORK_UTILIZATION_BUCKET_SECONDS")}
+
+    for i in range(0, len(networks), batch_size):
+        params["networks"] = networks[i : i + batch_size]
+        params["refreshed"] = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(REFRESH_QUERY, params)
+            cursor.execute(HISTORY_QUERY, params)
+
+    return len(networks)
+
+
+def prune_utilization():
+    """
+    Drop rollup rows for networks that no longer exist, and history older
+    than ``NETWORK_UTILIZATION_HISTORY_DAYS``.
+    """
+    from openipam.network.models import NetworkUtilizationHistory
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            DELETE FROM network_utilization WHERE NOT EXISTS (
+                SELECT 1 FROM networks WHERE networks.network = network_utilization.network
+            )
+        """
+        )
+    NetworkUtilizationHistory.objects.filter(
+        bucket__lt=timezone.now()
+        - timedelta(days=CONFIG.get("NETWORK_UTILIZATION_HISTORY_DAYS"))
+    ).delete()
+
+
+def refresh_stale_utilization(max_age=None, batch_size=None, networks=None):
+    """
+    Refresh the networks with no rollup row, or one marked dirty or older
+    than ``max_age`` seconds, oldest first.  Lease counts change without
+    anything in Django hearing about it (the DHCP server writes leases, and
+    leases expire), so this is run periodically.  ``networks`` (a ``Network`` queryset) limits
+    the refresh to those networks; without it, the rollup is also pruned.
+    Returns the number of networks refreshed.
+    """
+    from openipam.network.models import Network
+
+    if max_age is None:
+        max_age = CONFIG.get("NETWORK_UTILIZATION_MAX_AGE_SECONDS")
+    if networks is None:
+        prune_utilization()
+        networks = Network.objects.all()
+
+    stale = (
+        networks.filter(
+            Q(utilization__isnull=True)
+            | Q(utilization__dirty=True)
+            | Q(utilization__refreshed__lt=timezone.now() - timedelta(seconds=max_age))
+        )
+        .order_by(F("utilization__refreshed").asc(nulls_first=True))
+        .values_list("network", flat=True)
+    )
+    return refresh_utilization(stale, batch_size=batch_size)
+
+
+def _mark_dirty(pending):
+    from openipam.network.models import Address, NetworkUtilization
+
+    networks = [value for kind, value in pending if kind == "network"]
+    addresses = [value for kind, value in pending if kind == "address"]
+    NetworkUtilization.objects.filter(
+        Q(network__in=networks)
+        | Q(
+            network__in=Address.objects.filter(address__in=addresses).values("network")
+        ),
+        dirty=False,
+    ).update(dirty=True)
+
+
+def mark_utilization_dirty(networks=(), addresses=()):
+    """
+    Mark the rollup rows of ``networks``, and of the networks holding
+    ``addresses``, dirty once the current transaction commits, for the
+    next ``refresh_stale_utilization`` to recount.  Saving one address or
+    lease costs one small update, rather than a count of its network.
+    """
+    pending = [("network", str(net)) for net in networks if net]
+    pending.extend(("address", str(address)) for address in addresses if address)
+    queue_on_commit("utilization_dirty", pending, _mark_dirty)
+
+
+def queue_utilization_refresh(networks):
+    """
+    Refresh ``networks`` once the current transaction commits.  Networks
+    queued by many saves in one transaction are counted together.
+    """
+    queue_on_commit(
+        "utilization", (str(net) for net in networks if net), refresh_utilization
+    )
@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.utils import timezone
+
+from openipam.conf.ipam_settings import CONFIG
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CACHE_KEY = "ipam_dashboard_stats"
+REFRESH_LOCK_KEY = "ipam_dashboard_stats_refreshing"
+
+WIRELESS_DHCP_GROUPS = ["aruba_wireless", "aruba_wireless_eastern"]
+
+
+def stat_querysets():
+    """
+    Return ``(name, queryset, column)`` for every dashboard stat.  The stat is
+    the number of rows in ``queryset``, or the sum of ``column`` over them.
+    """
+    from openipam.dns.models import DnsRecord
+    from openipam.hosts.models import Host
+    from openipam.network.models import Lease, Network, NetworkUtilization
+
+    now = timezone.now()
+    wireless_networks = Network.objects.filter(
+        dhcp_group__name__in=WIRELESS_DHCP_GROUPS
+    )
+    wireless_utilization = NetworkUtilization.objects.filter(
+        network__in=wireless_networks.values("network")
+    )
+
+    return [
+        ("all_hosts", Host.objects.all(), None),
+        ("expired_hosts", Host.objects.filter(expires__lte=now), None),
+        (
+            "static_hosts",
+            Host.objects.filter(addresses__isnull=False, expires__gte=now).distinct(),
+            None,
+        ),
+        (
+            "dynamic_hosts",
+            Host.objects.filter(pools__isnull=False, expires__gte=now).distinct(),
+            None,
+        ),
+        ("active_leases", Lease.objects.filter(ends__gte=now), None),
+        ("abandoned_leases", Lease.objects.filter(abandoned=True), None),
+        ("networks", Network.objects.all(), None),
+        ("wireless_networks", wireless_networks, None),
+        ("wireless_addresses", wireless_utilization, "total"),
+        ("available_wireless_addresses", wireless_utilization, "available"),
+        (
+            "dns_a_records",
+            DnsRecord.objects.filter(dns_type__name__in=["A", "AAAA"]),
+            None,
+        ),
+        (
+            "dns_cname_records",
+            DnsRecord.objects.filter(dns_type__name="CNAME"),
+            None,
+        ),
+        ("dns_mx_records", DnsRecord.objects.filter(dns_type__name="MX"), None),
+        (
+            "active_users_within_1_year",
+            User.objects.filter(last_login__gte=now - timedelta(days=365)),
+            None,
+        ),
+    ]
+
+
+def compute_stats():
+    """Compute every dashboard stat in a single query."""
+    names = []
+    selects = []
+    params = []
+    for name, queryset, column in stat_querysets():
+        names.append(name)
+        queryset = queryset.order_by().values(column or "pk")
+        try:
+            sql, sql_params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            selects.append("0")
+            continue
+        if column:
+            selects.append(
+                'SELECT coalesce(sum(stat."%s"), 0) FROM (%s) AS stat' % (column, sql)
+            )
+        else:
+            selects.append("SELECT count(*) FROM (%s) AS stat" % sql)
+        params.extend(sql_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT %s" % ", ".join("(%s)" % select for select in selects), params
+        )
+        row = cursor.fetchone()
+    return OrderedDict((name, int(value)) for name, value in zip(names, row))
+
+
+def refresh_stats():
+    started = time.monotonic()
+    entry = {
+        "stats": compute_stats(),
+        "computed_at": time.time(),
+        "compute_time": time.monotonic() - started,
+    }
+    cache.set(CACHE_KEY, entry, CONFIG.get("DASHBOARD_STATS_MAX_STALE_SECONDS"))
+    return entry
+
+
+def _refresh_in_background():
+    try:
+        refresh_stats()
+    except Exception:
+        logger.exception("Dashboard stats refresh failed")
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+        connection.close()
+
+
+def get_dashboard_stats():
+    """
+    Return the dashboard stats, computing them at most once per
+    ``DASHBOARD_STATS_TTL_SECONDS``.
+
+    Once the cached stats are older than that they are still served, while
+    one worker (whichever takes the refresh lock in the cache) recomputes
+    them in a background thread.  The result is a dict with ``stats``,
+    ``computed_at`` (a datetime), ``compute_time`` and ``age`` in seconds.
+    """
+    entry = cache.get(CACHE_KEY)
+    if entry is None:
+        entry = refresh_stats()
+    elif time.time() - entry["computed_at"] > CONFIG.get("DASHBOARD_STATS_TTL_SECONDS"):
+        if cache.add(
+            REFRESH_LOCK_KEY, True, CONFIG.get("DASHBOARD_STATS_REFRESH_TIMEOUT")
+        ):
+            threading.Thread(target=_refresh_in_background, daemon=True).start()
+
+    return {
+        "stats": entry["stats"],
+        "computed_at": datetime.fromtimestamp(entry["computed_at"], tz=timezone.utc),
+        "compute_time": round(entry["compute_time"], 3),
+        "age": round(max(0.0, time.time() - entry["computed_at"]), 3),
+    }
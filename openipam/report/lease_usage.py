@@ -0,0 +1,161 @@
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from openipam.conf.ipam_settings import CONFIG
+from openipam.network.utilization import COUNT_FIELDS, refresh_stale_utilization
+
+from collections import OrderedDict
+from datetime import timedelta
+from functools import reduce
+from netaddr import IPNetwork
+
+import logging
+import operator
+import threading
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_KEY = "ipam_lease_usage_refreshing"
+
+
+def color(ratio):
+    # Convert a number in the range [0,1] to an HTML color code
+    if ratio is None:
+        return "#77f"
+    ratio = min(max(ratio, 0.0), 1.0)
+
+    r = max(ratio * 2.0 - 1, 0.0)
+    g = min(ratio * 2.0, 1.0)
+
+    rgb = (int((1 - r) * 255), int(g * 255), 0)
+    return "#%02x%02x%02x" % rgb
+
+
+def _refresh_in_background(max_age):
+    from openipam.network.models import Network
+
+    try:
+        refresh_stale_utilization(max_age=max_age, networks=Network.objects.all())
+    except Exception:
+        logger.exception("Lease usage refresh failed")
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+        connection.close()
+
+
+def lease_usage(network_blocks=None, network_tags=None, max_age=None):
+    """
+    Return the lease usage of every network, or of the networks inside
+    ``network_blocks`` or in the DHCP groups named by ``network_tags``,
+    ordered by router and network.
+
+    The counts are read from the network_utilization rollup in one query.
+    If any selected network is dirty, or was counted more than ``max_age``
+    seconds ago, one worker (whichever takes the refresh lock in the cache)
+    recounts the stale networks in a background thread, and a later request
+    sees the new counts.  Each item has the
+    fields the subnetparser service returned: ``network``, ``router`` (the
+    network's shared network, which groups the subnets behind one router
+    interface), ``portdesc`` and ``usage``.
+    """
+    from openipam.network.models import Network
+
+    if max_age is None:
+        max_age = CONFIG.get("LEASE_USAGE_MAX_AGE_SECONDS")
+
+    networks = Network.objects.all()
+    if network_blocks:
+        networks = networks.filter(
+            reduce(
+                operator.or_,
+                [Q(network__net_contained_or_equal=block) for block in network_blocks],
+            )
+        )
+    elif network_tags:
+        networks = networks.filter(dhcp_group__name__in=network_tags)
+
+    fields = ["network", "name", "shared_network__name", "dhcp_group__name"]
+    fields += ["utilization__dirty", "utilization__refreshed"]
+    fields += ["utilization__%s" % field for field in COUNT_FIELDS]
+    rows = networks.order_by("shared_network__name", "network").values_list(*fields)
+
+    counted_since = timezone.now() - timedelta(seconds=max_age)
+    stale = False
+    lease_data = []
+    for row in rows:
+        network, name, router, tag, dirty, refreshed = row[:6]
+        stale = stale or dirty is not False or refreshed < counted_since
+        usage = OrderedDict(
+            (field, count or 0) for field, count in zip(COUNT_FIELDS, row[6:])
+        )
+        network = IPNetwork(str(network))
+        ratio = usage["available"] / usage["dynamic"] if usage["dynamic"] else None
+        lease_data.append(
+            OrderedDict(
+                [
+                    ("network", str(network)),
+                    ("router", router or ""),
+                    ("portdesc", name or ""),
+                    ("tag", tag or ""),
+                    ("usage", usage),
+                    ("ratio", ratio),
+                    ("utilized", int((1 - ratio) * 100) if ratio is not None else 0),
+                    ("style", color(ratio)),
+                    ("size", network.size),
+                ]
+            )
+        )
+
+    if stale and cache.add(
+        REFRESH_LOCK_KEY, True, CONFIG.get("LEASE_USAGE_REFRESH_TIMEOUT")
+    ):
+        threading.Thread(
+            target=_refresh_in_background, args=(max_age,), daemon=True
+        ).start()
+    return lease_data
+
+
+def group_lease_usage(lease_data, group_by, network_blocks=None, exclude_free=False):
+    """
+    Group ``lease_usage`` items into the tree the lease usage map draws:
+    ``{"name", "children": [{"name", "children": [network, ...]}]}``.
+
+    ``group_by`` is "router", "tag" (the DHCP group) or "block" (the entry
+    of ``network_blocks`` containing the network).  Networks with no router
+    are grouped as "FREE", and left out with ``exclude_free``.
+    """
+    blocks = [IPNetwork(block) for block in network_blocks or []]
+
+    def group_key(item):
+        if group_by == "block":
+            network = IPNetwork(item["network"])
+            for block in blocks:
+                if network in block:
+                    return str(block)
+            return ""
+        if group_by == "tag":
+            return item["tag"]
+        return item["router"]
+
+    groups = OrderedDict()
+    for item in lease_data:
+        groups.setdefault(group_key(item), []).append(item)
+
+    grouped = {"name": "%ss" % group_by, "children": [], "style": "#000033"}
+    for key in sorted(groups):
+        if not key and exclude_free:
+            continue
+        group = {
+            "name": key.replace(".gw.usu.edu", "") if key else "FREE",
+            "children": [],
+        }
+        for item in groups[key]:
+            child = OrderedDict(item)
+            child["name"] = item["network"]
+            child["desc"] = item["portdesc"]
+            child["value"] = max(item["size"], 256)
+            group["children"].append(child)
+        grouped["children"].append(group)
+    return grouped
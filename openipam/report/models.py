@@ -1,6 +1,5 @@
 from django.conf import settings
 from peewee import (
-    MySQLDatabase,
     Model,
     IntegerField,
     CharField,
@@ -8,9 +7,16 @@ from peewee import (
     PrimaryKeyField,
     DateTimeField,
 )
+from playhouse.pool import PooledMySQLDatabase
 
-database = MySQLDatabase(
+from openipam.conf.ipam_settings import CONFIG
+
+# Connections are pooled per thread, so the weathermap does not reconnect to
+# LibreNMS on every request.
+database = PooledMySQLDatabase(
     "librenms",
+    max_connections=CONFIG.get("LIBRENMS_MAX_CONNECTIONS"),
+    stale_timeout=CONFIG.get("LIBRENMS_STALE_TIMEOUT"),
     **{
         "passwd": settings.OBSERVIUM_AUTH[1],
         "host": "129.123.1.51",
@@ -18,29 +24,6 @@ database = MySQLDatabase(
     }
 )
 
-db_ref_count = 0
-
-
-def database_connect():
-    global db_ref_count
-    try:
-        if db_ref_count == 0:
-            database.connect()
-    finally:
-        db_ref_count += 1
-
-
-def database_close():
-    global db_ref_count
-    try:
-        if db_ref_count == 1:
-            database.close()
-    finally:
-        db_ref_count -= 1
-
-    if db_ref_count < 0:
-        raise Exception("Database closed when not connected.")
-
 
 class UnknownField(object):
     pass
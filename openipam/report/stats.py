@@ -0,0 +1,107 @@
+from django.apps import apps
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from openipam.conf.ipam_settings import CONFIG
+
+from collections import OrderedDict
+from datetime import timedelta
+
+
+PERIODS = ("day", "week", "month")
+
+
+def period_bounds(now=None):
+    """
+    Return ``{period: (start, end)}`` for the day, week (from Monday) and
+    month containing ``now``, in the current time zone.
+    """
+    now = timezone.localtime(now or timezone.now())
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week = day - timedelta(days=day.weekday())
+    month = day.replace(day=1)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+
+    def local(value):
+        # Re-localize, so a DST change inside a period lands on midnight.
+        return timezone.make_aware(value.replace(tzinfo=None))
+
+    return OrderedDict(
+        [
+            ("day", (local(day), local(day + timedelta(days=1)))),
+            ("week", (local(week), local(week + timedelta(days=7)))),
+            ("month", (local(month), local(next_month))),
+        ]
+    )
+
+
+def time_series(queryset, date_field, interval, start, end):
+    """
+    Count the rows of ``queryset`` per ``interval`` ("hour", "day", "week",
+    "month" or "year") of ``date_field`` between ``start`` and ``end``, with
+    one ``date_trunc ... GROUP BY`` query.  Returns ``[(bucket, count)]``
+    ordered by bucket; empty buckets are left out.
+    """
+    rows = (
+        queryset.order_by()
+        .filter(**{"%s__gte" % date_field: start, "%s__lt" % date_field: end})
+        .annotate(bucket=Trunc(date_field, interval))
+        .values("bucket")
+        .annotate(count=Count("pk"))
+        .order_by("bucket")
+    )
+    return [(row["bucket"], row["count"]) for row in rows]
+
+
+def period_counts(queryset, date_field, now=None):
+    """
+    Return ``{"day": n, "week": n, "month": n}``: the rows of ``queryset``
+    whose ``date_field`` falls in the current day, week and month.  The three
+    are summed from one daily ``time_series`` query.
+    """
+    bounds = period_bounds(now)
+    start = min(start for start, end in bounds.values())
+    end = max(end for start, end in bounds.values())
+
+    counts = OrderedDict((period, 0) for period in PERIODS)
+    for bucket, count in time_series(queryset, date_field, "day", start, end):
+        for period, (period_start, period_end) in bounds.items():
+            if period_start <= bucket < period_end:
+                counts[period] += count
+    return counts
+
+
+def cached_period_counts(name, queryset, date_field):
+    """
+    ``period_counts`` cached under ``name`` for ``STATS_CACHE_SECONDS``, and
+    never past the end of the current day, so the counts roll over with
+    their buckets.
+    """
+    now = timezone.now()
+    day_start, day_end = period_bounds(now)["day"]
+    key = "ipam_period_counts_%s_%s" % (name, day_start.date().isoformat())
+
+    counts = cache.get(key)
+    if counts is None:
+        counts = period_counts(queryset, date_field, now=now)
+        timeout = min(
+            CONFIG.get("STATS_CACHE_SECONDS"), (day_end - now).total_seconds()
+        )
+        cache.set(key, counts, max(1, int(timeout)))
+    return counts
+
+
+def allowed_stats_model(app_label, model_name, column):
+    """
+    Return the model for ``app_label.model_name`` if ``column`` may be
+    charted for it (see ``STATS_ALLOWED_COLUMNS``), or None.
+    """
+    label = ("%s.%s" % (app_label, model_name)).lower()
+    if column not in CONFIG.get("STATS_ALLOWED_COLUMNS").get(label, ()):
+        return None
+    try:
+        return apps.get_model(app_label, model_name)
+    except (LookupError, ValueError):
+        return None
@@ -1 +1,188 @@
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from openipam.core.tests.test_models import IPAMTestCase
+from openipam.report.dashboard import (
+    CACHE_KEY,
+    compute_stats,
+    get_dashboard_stats,
+    stat_querysets,
+)
+from openipam.network.utilization import refresh_utilization
+from openipam.report.lease_usage import (
+    REFRESH_LOCK_KEY,
+    group_lease_usage,
+    lease_usage,
+)
+from openipam.report.stats import allowed_stats_model, period_counts, time_series
+from openipam.report.weathermap import PortLinkIndex, WeatherMap
+
+from datetime import datetime, timedelta
+from peewee import SqliteDatabase
+
+import os
+import tempfile
+
+User = get_user_model()
+
+
+class DashboardStatsTest(TestCase):
+    def setUp(self):
+        cache.delete(CACHE_KEY)
+
+    def test_compute_stats(self):
+        stats = compute_stats()
+        self.assertEqual(
+            list(stats), [name for name, queryset, column in stat_querysets()]
+        )
+        for name, queryset, column in stat_querysets():
+            if column is None:
+                self.assertEqual(stats[name], queryset.count())
+
+    def test_get_dashboard_stats_is_cached(self):
+        first = get_dashboard_stats()
+        second = get_dashboard_stats()
+        self.assertEqual(first["computed_at"], second["computed_at"])
+        self.assertEqual(first["stats"], second["stats"])
+        self.assertGreaterEqual(second["age"], 0)
+
+
+class PeriodCountsTest(TestCase):
+    def test_period_counts(self):
+        now = timezone.now()
+        User.objects.create(username="joined-now", date_joined=now)
+        User.objects.create(
+            username="joined-long-ago", date_joined=now - timedelta(days=40)
+        )
+
+        counts = period_counts(User.objects.all(), "date_joined", now=now)
+        self.assertEqual(list(counts), ["day", "week", "month"])
+        self.assertEqual(counts["day"], 1)
+        self.assertEqual(counts["week"], 1)
+        self.assertEqual(counts["month"], 1)
+
+        series = time_series(
+            User.objects.all(),
+            "date_joined",
+            "month",
+            now - timedelta(days=60),
+            now + timedelta(days=1),
+        )
+        self.assertEqual(sum(count for bucket, count in series), 2)
+
+    def test_allowed_stats_model(self):
+        self.assertEqual(allowed_stats_model("user", "user", "date_joined"), User)
+        self.assertIsNone(allowed_stats_model("user", "user", "password"))
+        self.assertIsNone(allowed_stats_model("auth", "group", "name"))
+
+
+class WeatherMapTest(TestCase):
+    config = {
+        "core-a": {"id": [1, 2], "label": "Core A"},
+        "core-b": {"id": [2, 3], "label": "Core B"},
+    }
+
+    def setUp(self):
+        from openipam.report.models import Ports
+
+        # SQLite stands in for the LibreNMS MySQL database.
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.database = SqliteDatabase(self.path)
+        self.database.bind([Ports])
+        self.database.create_tables([Ports])
+        for port_id, rate, status in [(1, 10, "up"), (2, 20, "up"), (3, 30, "down")]:
+            Ports.create(
+                port=port_id,
+                deleted=0,
+                detailed=0,
+                device=1,
+                disabled=0,
+                ifindex=port_id,
+                iflastchange=datetime.now(),
+                ignore=0,
+                ifinoctets=0,
+                ifinoctets_delta=0,
+                ifinoctets_rate=rate,
+                ifoutoctets=0,
+                ifoutoctets_delta=0,
+                ifoutoctets_rate=rate * 2,
+                ifspeed=1000,
+                ifoperstatus=status,
+                poll_period=300,
+                poll_time=1234,
+            )
+        self.database.close()
+
+    def tearDown(self):
+        from openipam.report.models import Ports, database
+
+        database.bind([Ports])
+        os.unlink(self.path)
+
+    def test_port_link_index(self):
+        index = PortLinkIndex(self.config)
+        self.assertEqual(index.port_links[2], ["core-a", "core-b"])
+        self.assertEqual(sorted(index.port_ids), [1, 2, 3])
+        self.assertNotIn("id", index.links["core-a"])
+
+    def test_compute(self):
+        weathermap = WeatherMap("test", lambda: self.config, database=self.database)
+        data = weathermap.compute()
+
+        self.assertEqual(data["core-a"]["Z"], (10 + 20) * 8)
+        self.assertEqual(data["core-a"]["A"], (20 + 40) * 8)
+        self.assertEqual(data["core-b"]["speed"], 2000)
+        self.assertEqual(data["core-a"]["label"], "Core A")
+        self.assertIn("id", self.config["core-a"])
+        self.assertIn("timestamp", data)
+
+    def test_snapshot_is_shared(self):
+        cache.clear()
+        weathermap = WeatherMap("test", lambda: self.config, database=self.database)
+        self.assertIs(weathermap.snapshot(), weathermap.snapshot())
+
+
+class LeaseUsageTest(IPAMTestCase):
+    def setUp(self):
+        self.networks = [
+            {"network": "10.0.0.0/29", "name": "small", "gateway": "10.0.0.1"},
+            {"network": "10.0.1.0/28", "name": "large", "gateway": "10.0.1.1"},
+        ]
+        self.dns_domains = []
+        self.dns_records = []
+        self.hosts = []
+        self.pools = []
+        self.address_types = []
+        super(LeaseUsageTest, self).setUp()
+        cache.delete(REFRESH_LOCK_KEY)
+        refresh_utilization(["10.0.0.0/29", "10.0.1.0/28"])
+
+    def test_lease_usage(self):
+        lease_data = lease_usage(network_blocks=["10.0.0.0/24"])
+        self.assertEqual(
+            [item["network"] for item in lease_data], ["10.0.0.0/29", "10.0.1.0/28"]
+        )
+        # Read from fresh rollup rows, so no refresh was started.
+        self.assertIsNone(cache.get(REFRESH_LOCK_KEY))
+        small = lease_data[0]
+        self.assertEqual(small["portdesc"], "small")
+        self.assertEqual(small["usage"]["total"], 8)
+        self.assertEqual(small["usage"]["reserved"], 3)
+        self.assertIsNone(small["ratio"])
+
+        self.assertEqual(
+            [item["network"] for item in lease_usage(network_blocks=["10.0.1.0/24"])],
+            ["10.0.1.0/28"],
+        )
+
+    def test_group_lease_usage(self):
+        lease_data = lease_usage()
+        grouped = group_lease_usage(lease_data, "router")
+        self.assertEqual([group["name"] for group in grouped["children"]], ["FREE"])
+        self.assertEqual(len(grouped["children"][0]["children"]), 2)
+        self.assertEqual(
+            group_lease_usage(lease_data, "router", exclude_free=True)["children"], []
+        )
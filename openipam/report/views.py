@@ -1,5 +1,4 @@
 from django.utils import timezone
-from django.db.models import Q
 from django.views.generic import TemplateView
 from django.contrib.auth import get_user_model
 
@@ -7,16 +6,12 @@ from datetime import timedelta
 from openipam.conf.ipam_settings import CONFIG_DEFAULTS
 
 from openipam.hosts.models import GulRecentArpBymac, Host
-from openipam.network.models import Address, Lease, Network
 from openipam.dns.models import DnsRecord
-
-from functools import reduce
+from openipam.report.dashboard import get_dashboard_stats
 
 
 from braces.views import GroupRequiredMixin
 
-import operator
-
 User = get_user_model()
 
 
@@ -26,43 +21,19 @@ class IpamStatsView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super(IpamStatsView, self).get_context_data(**kwargs)
 
-        context["dynamic_hosts"] = Host.objects.filter(
-            pools__isnull=False, expires__gte=timezone.now()
-        ).count()
-        context["static_hosts"] = Host.objects.filter(
-            addresses__isnull=False, expires__gte=timezone.now()
-        ).count()
-        context["active_leases"] = Lease.objects.filter(
-            ends__gte=timezone.now()
-        ).count()
-        context["abandoned_leases"] = Lease.objects.filter(abandoned=True).count()
-        context["total_networks"] = Network.objects.all().count()
-        wireless_networks = Network.objects.filter(
-            dhcp_group__name__in=["aruba_wireless", "aruba_wireless_eastern"]
-        )
-        context["wireless_networks"] = wireless_networks.count()
-        wireless_networks_available_qs = [
-            Q(address__net_contained=network.network) for network in wireless_networks
-        ]
-        context["wireless_addresses_total"] = Address.objects.filter(
-            reduce(operator.or_, wireless_networks_available_qs)
-        ).count()
-        context["wireless_addresses_available"] = Address.objects.filter(
-            reduce(operator.or_, wireless_networks_available_qs),
-            leases__ends__lt=timezone.now(),
-        ).count()
-        context["dns_a_records"] = DnsRecord.objects.filter(
-            dns_type__name__in=["A", "AAAA"]
-        ).count()
-        context["dns_cname_records"] = DnsRecord.objects.filter(
-            dns_type__name="CNAME"
-        ).count()
-        context["dns_mx_records"] = DnsRecord.objects.filter(
-            dns_type__name="MX"
-        ).count()
-        context["active_users"] = User.objects.filter(
-            last_login__gte=(timezone.now() - timedelta(days=365))
-        ).count()
+        stats = get_dashboard_stats()["stats"]
+        context["dynamic_hosts"] = stats["dynamic_hosts"]
+        context["static_hosts"] = stats["static_hosts"]
+        context["active_leases"] = stats["active_leases"]
+        context["abandoned_leases"] = stats["abandoned_leases"]
+        context["total_networks"] = stats["networks"]
+        context["wireless_networks"] = stats["wireless_networks"]
+        context["wireless_addresses_total"] = stats["wireless_addresses"]
+        context["wireless_addresses_available"] = stats["available_wireless_addresses"]
+        context["dns_a_records"] = stats["dns_a_records"]
+        context["dns_cname_records"] = stats["dns_cname_records"]
+        context["dns_mx_records"] = stats["dns_mx_records"]
+        context["active_users"] = stats["active_users_within_1_year"]
 
         return context
 
@@ -0,0 +1,128 @@
+from django.core.cache import cache
+
+from openipam.conf.ipam_settings import CONFIG
+
+from collections import OrderedDict
+
+import threading
+import time
+
+
+class PortLinkIndex(object):
+    """
+    Inverted index of a weathermap config: LibreNMS port id to the keys of
+    the links that port carries.  ``links`` holds each link's config without
+    its ``id`` list, as the template for the computed map.
+    """
+
+    def __init__(self, data):
+        self.links = OrderedDict()
+        self.port_links = {}
+        for key, value in data.items():
+            self.links[key] = dict(
+                (name, item) for name, item in value.items() if name != "id"
+            )
+            for port_id in value["id"]:
+                self.port_links.setdefault(port_id, []).append(key)
+
+    @property
+    def port_ids(self):
+        return list(self.port_links)
+
+
+class WeatherMap(object):
+    """
+    Link traffic for one weathermap config, computed from the LibreNMS
+    ``ports`` table at most once per poll interval.
+
+    The computed map is shared through the Django cache under a key for the
+    current poll interval, so every worker (and every concurrent viewer)
+    gets the same snapshot, and only one thread per process queries
+    LibreNMS when it rolls over.
+    """
+
+    def __init__(self, name, get_config, database=None):
+        self.name = name
+        self.get_config = get_config
+        self.database = database
+        self._lock = threading.Lock()
+        self._config = None
+        self._index = None
+        self._snapshot = None
+        self._snapshot_key = None
+
+    @property
+    def poll_interval(self):
+        return CONFIG.get("WEATHERMAP_POLL_SECONDS")
+
+    @property
+    def index(self):
+        config = self.get_config()
+        if self._index is None or config is not self._config:
+            self._index = PortLinkIndex(config)
+            self._config = config
+        return self._index
+
+    def compute(self):
+        from openipam.report.models import Ports, database
+
+        database = self.database or database
+        index = self.index
+        data = OrderedDict((key, dict(link)) for key, link in index.links.items())
+
+        if index.port_ids:
+            with database.connection_context():
+                ports = (
+                    Ports.select(
+                        Ports.port,
+                        Ports.ifinoctets_rate,
+                        Ports.ifoutoctets_rate,
+                        Ports.ifspeed,
+                        Ports.ifoperstatus,
+                        Ports.poll_time,
+                    )
+                    .where(Ports.port << index.port_ids)
+                    .tuples()
+                )
+                for port_id, in_rate, out_rate, speed, oper_status, poll_time in ports:
+                    for key in index.port_links.get(port_id, ()):
+                        value = data[key]
+                        value["A"] = value.get("A", 0) + (out_rate or 0) * 8
+                        value["Z"] = value.get("Z", 0) + (in_rate or 0) * 8
+                        value["speed"] = value.get("speed", 0) + (speed or 0)
+                        value["timestamp"] = poll_time
+                        value["poll_frequency"] = self.poll_interval
+                        value["isUp"] = oper_status == "up"
+
+        data["timestamp"] = int(time.time())
+        return data
+
+    def snapshot(self):
+        interval = self.poll_interval
+        key = "ipam_weathermap_%s_%s" % (self.name, int(time.time() // interval))
+        if self._snapshot_key == key:
+            return self._snapshot
+
+        with self._lock:
+            if self._snapshot_key != key:
+                data = cache.get(key)
+                if data is None:
+                    data = self.compute()
+                    cache.set(key, data, interval)
+                self._snapshot = data
+                self._snapshot_key = key
+            return self._snapshot
+
+
+def _weathermap_config():
+    return CONFIG.get("WEATHERMAP_DATA").get("data")
+
+
+def _buildingmap_config():
+    from openipam.conf.settings import get_buildingmap_data
+
+    return get_buildingmap_data().get("data")
+
+
+weathermap = WeatherMap("links", _weathermap_config)
+buildingmap = WeatherMap("buildings", _buildingmap_config)
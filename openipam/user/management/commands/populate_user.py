@@ -17,4 +17,6 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         username = options["username"] or None
         self.stdout.write("Populating Users...")
-        populate_user_from_ldap(username=username)
+        report = populate_user_from_ldap(username=username)
+        if username is None:
+            self.stdout.write("\n".join(report.lines()))
@@ -8,5 +8,6 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         self.stdout.write("Syncing Users...")
-        sync_active_users()
+        report = sync_active_users()
+        self.stdout.write("\n".join(report.lines()))
         self.stdout.write("Syncing complete.")
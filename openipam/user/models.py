@@ -4,7 +4,13 @@ from django.utils.translation import ugettext_lazy as _
 from django.utils.functional import cached_property
 from django.core.mail import send_mail
 from django.db import models
-from django.db.models.signals import post_save, pre_save, pre_delete
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+    pre_delete,
+)
 from django.db.models import Q
 from django.contrib.auth.models import User as AuthUser, Group as AuthGroup
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, Permission
@@ -12,12 +18,17 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, Permi
 from operator import or_
 from functools import reduce
 
+from openipam.autocomplete.signals import invalidate_typeahead
+from openipam.core.signals import refresh_search_document
 from openipam.user.managers import IPAMUserManager
 from openipam.user.signals import (
     assign_ipam_groups,
     force_usernames_uppercase,
     remove_obj_perms_connected_with_user,
     add_group_souce,
+    invalidate_obj_perm_closure,
+    invalidate_membership_closure,
+    invalidate_all_perm_closures,
 )
 
 
@@ -190,3 +201,16 @@ pre_save.connect(force_usernames_uppercase, sender=User)
 post_save.connect(assign_ipam_groups, sender=User)
 pre_delete.connect(remove_obj_perms_connected_with_user, sender=User)
 post_save.connect(add_group_souce, sender=AuthGroup)
+for perm_sender in ("guardian.UserObjectPermission", "guardian.GroupObjectPermission"):
+    post_save.connect(invalidate_obj_perm_closure, sender=perm_sender)
+    post_delete.connect(invalidate_obj_perm_closure, sender=perm_sender)
+post_save.connect(refresh_search_document, sender=User)
+post_delete.connect(refresh_search_document, sender=User)
+m2m_changed.connect(invalidate_membership_closure, sender=User.groups.through)
+m2m_changed.connect(invalidate_all_perm_closures, sender=User.user_permissions.through)
+m2m_changed.connect(invalidate_all_perm_closures, sender=AuthGroup.permissions.through)
+post_save.connect(invalidate_all_perm_closures, sender="dns.Domain")
+post_delete.connect(invalidate_all_perm_closures, sender="dns.Domain")
+for typeahead_sender in (User, AuthGroup, Permission, "contenttypes.ContentType"):
+    post_save.connect(invalidate_typeahead, sender=typeahead_sender)
+    post_delete.connect(invalidate_typeahead, sender=typeahead_sender)
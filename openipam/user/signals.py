@@ -67,3 +67,38 @@ def add_group_souce(sender, instance, created, **kwargs):
         assert instance.source
     except ObjectDoesNotExist:
         GroupSource.objects.create(group=instance)
+
+
+# Drop cached permission closures when guardian object permissions change.
+def invalidate_obj_perm_closure(sender, instance, **kwargs):
+    from openipam.user.utils.permission_closure import (
+        invalidate_user_closures,
+        invalidate_group_closure,
+    )
+
+    if getattr(instance, "user_id", None):
+        invalidate_user_closures([instance.user_id])
+    elif getattr(instance, "group_id", None):
+        invalidate_group_closure(instance.group)
+
+
+def invalidate_membership_closure(sender, instance, action, reverse, pk_set, **kwargs):
+    from openipam.user.utils.permission_closure import (
+        invalidate_user_closures,
+        invalidate_all_closures,
+    )
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        invalidate_user_closures([instance.pk])
+    elif pk_set:
+        invalidate_user_closures(pk_set)
+    else:
+        invalidate_all_closures()
+
+
+def invalidate_all_perm_closures(sender, **kwargs):
+    from openipam.user.utils.permission_closure import invalidate_all_closures
+
+    invalidate_all_closures()
@@ -14,3 +14,54 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class MirrorLDAPGroupsTest(TestCase):
+    def test_mirror_ldap_groups(self):
+        from django.contrib.auth.models import Group
+        from openipam.user.models import AuthSource, User
+        from openipam.user.utils.ldap_sync import mirror_ldap_groups
+
+        AuthSource.objects.get_or_create(pk=1, defaults={"name": "INTERNAL"})
+        ldap_source = AuthSource.objects.get_or_create(name="LDAP")[0]
+
+        user = User.objects.create(username="ldapuser")
+        static = Group.objects.create(name="static")
+        old = Group.objects.create(name="old")
+        old.source.source = ldap_source
+        old.source.save()
+        user.groups.add(static, old)
+
+        counts = mirror_ldap_groups({user.pk: ["new"]}, ldap_source)
+
+        self.assertEqual(counts["groups created"], 1)
+        self.assertEqual(counts["memberships added"], 1)
+        self.assertEqual(counts["memberships removed"], 1)
+        names = set(user.groups.values_list("name", flat=True))
+        self.assertIn("static", names)
+        self.assertIn("new", names)
+        self.assertNotIn("old", names)
+        self.assertEqual(Group.objects.get(name="new").source.source, ldap_source)
+
+
+class PermissionClosureTest(TestCase):
+    def test_global_permissions_from_cache(self):
+        from django.core.cache import cache
+        from django.db.models import Q
+        from openipam.user.models import User
+        from openipam.user.utils.permission_closure import (
+            _owner_key,
+            closure_q,
+            get_permission_closure,
+            is_all,
+        )
+
+        user = User.objects.create(username="closureadmin", is_superuser=True)
+        get_permission_closure(user)
+        self.assertIsNotNone(cache.get(_owner_key(user)))
+
+        # Read back through the cache, so ALL has been pickled and unpickled.
+        closure = get_permission_closure(user)
+        self.assertTrue(is_all(closure["hosts"]))
+        self.assertTrue(is_all(closure["domain_names"]))
+        self.assertEqual(closure_q(closure, "pools", "pool"), Q(pk__isnull=False))
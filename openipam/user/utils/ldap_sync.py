@@ -0,0 +1,367 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection as db_connection, transaction
+from django.db.models import Q
+
+from openipam.autocomplete.typeahead import typeahead_index
+from openipam.conf.ipam_settings import CONFIG
+from openipam.core.search import queue_search_refresh
+from openipam.user.models import AuthSource, GroupSource
+from openipam.user.utils.permission_closure import invalidate_user_closures
+
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import re
+import time
+
+# Dont require this.
+try:
+    import ldap
+    from ldap.controls import SimplePagedResultsControl
+    from ldap.dn import dn2str, str2dn
+    from ldap.filter import escape_filter_chars
+    from django_auth_ldap.config import MemberDNGroupType
+except ImportError:
+    pass
+
+User = get_user_model()
+
+# Values per OR filter, to keep each LDAP search filter a sensible size.
+FILTER_CHUNK = 200
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _dn_key(dn):
+    # DNs differing only in case or spacing name the same entry.
+    return dn2str(str2dn(dn)).lower()
+
+
+def mirror_ldap_groups(user_groups, source=None):
+    """
+    Set the LDAP group memberships of many users at once.
+
+    ``user_groups`` maps user ids to the names of their LDAP groups.  Missing
+    groups are created, existing ones are marked as LDAP groups, and each
+    user's memberships in LDAP groups are brought in line; memberships in
+    groups from other sources are left alone.  Returns a dict of counts.
+    """
+    source = source or AuthSource.objects.get(name="LDAP")
+    user_groups = {pk: frozenset(names) for pk, names in user_groups.items()}
+    names = frozenset().union(*user_groups.values()) if user_groups else frozenset()
+    counts = OrderedDict(
+        [
+            ("groups created", 0),
+            ("groups moved to LDAP", 0),
+            ("memberships added", 0),
+            ("memberships removed", 0),
+        ]
+    )
+
+    with transaction.atomic():
+        group_ids = dict(Group.objects.filter(name__in=names).values_list("name", "pk"))
+        new_groups = [Group(name=name) for name in sorted(names - set(group_ids))]
+        if new_groups:
+            # bulk_create skips the add_group_souce signal.
+            Group.objects.bulk_create(new_groups)
+            GroupSource.objects.bulk_create(
+                [GroupSource(group=group, source=source) for group in new_groups]
+            )
+            group_ids.update((group.name, group.pk) for group in new_groups)
+            typeahead_index(Group).invalidate()
+        counts["groups created"] = len(new_groups)
+        counts["groups moved to LDAP"] = (
+            GroupSource.objects.filter(group__name__in=names)
+            .exclude(source=source)
+            .update(source=source)
+        )
+
+        Membership = User.groups.through
+        current = defaultdict(dict)
+        for pk, user_id, group_id in Membership.objects.filter(
+            user_id__in=list(user_groups), group__source__source=source
+        ).values_list("pk", "user_id", "group_id"):
+            current[user_id][group_id] = pk
+
+        to_add = []
+        to_remove = []
+        changed_users = set()
+        for user_id, group_names in user_groups.items():
+            target = set(group_ids[name] for name in group_names)
+            for group_id in target - set(current[user_id]):
+                to_add.append(Membership(user_id=user_id, group_id=group_id))
+                changed_users.add(user_id)
+            for group_id, pk in current[user_id].items():
+                if group_id not in target:
+                    to_remove.append(pk)
+                    changed_users.add(user_id)
+
+        Membership.objects.bulk_create(to_add)
+        Membership.objects.filter(pk__in=to_remove).delete()
+        counts["memberships added"] = len(to_add)
+        counts["memberships removed"] = len(to_remove)
+
+        if changed_users:
+            # The m2m_changed signals do not fire for the through model.
+            transaction.on_commit(lambda: invalidate_user_closures(changed_users))
+
+    return counts
+
+
+class SyncReport(object):
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts = OrderedDict()
+        self.failures = []
+
+    def incr(self, name, count=1):
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def lines(self):
+        lines = ["%s: %s" % (name, count) for name, count in self.counts.items()]
+        lines.append("elapsed: %.2fs" % (time.monotonic() - self.started))
+        lines += ["failed: %s (%s)" % failure for failure in self.failures]
+        return lines
+
+
+class LDAPUserSync(object):
+    """
+    Bring users and their LDAP groups in line with the directory in bulk.
+
+    The directory entries of every member of ``groups`` (or of every one of
+    ``users`` when no groups are given) are read with paged searches, diffed
+    in memory against the user rows and memberships, and only changed rows
+    are written.  Group names come from the configured ``GROUP_SEARCH`` and
+    ``GROUP_TYPE``, as they do for ``IPAMLDAPBackend.populate_user``.  Users
+    the searches do not return (no longer in any of the groups, say), and
+    every user when the group type cannot be resolved in bulk, are looked up
+    one at a time on a bounded worker pool, as ``populate_user`` would.
+    """
+
+    def __init__(self, users, groups=None, workers=None, page_size=None):
+        from openipam.core.backends import IPAMLDAPBackend
+
+        self.backend = IPAMLDAPBackend()
+        self.settings = self.backend.settings
+        self.users = users
+        self.groups = groups
+        self.workers = workers or CONFIG.get("LDAP_SYNC_WORKERS")
+        self.page_size = page_size or CONFIG.get("LDAP_SYNC_PAGE_SIZE")
+        self.report = SyncReport()
+
+    def connect(self):
+        conn = ldap.initialize(self.settings.SERVER_URI)
+        for option, value in self.settings.CONNECTION_OPTIONS.items():
+            conn.set_option(option, value)
+        conn.set_option(ldap.OPT_REFERRALS, 0)
+        if self.settings.START_TLS:
+            conn.start_tls_s()
+        conn.simple_bind_s(self.settings.BIND_DN, self.settings.BIND_PASSWORD)
+        return conn
+
+    def paged_search(self, conn, base_dn, scope, filterstr, attrs):
+        control = SimplePagedResultsControl(True, size=self.page_size, cookie="")
+        while True:
+            msgid = conn.search_ext(
+                base_dn, scope, filterstr, attrs, serverctrls=[control]
+            )
+            rtype, rdata, rmsgid, serverctrls = conn.result3(msgid)
+            self.report.incr("ldap pages")
+            for dn, entry in rdata:
+                if dn:
+                    yield dn, entry
+            cookies = [
+                ctrl.cookie
+                for ctrl in serverctrls
+                if ctrl.controlType == SimplePagedResultsControl.controlType
+            ]
+            if not cookies or not cookies[0]:
+                return
+            control.cookie = cookies[0]
+
+    @property
+    def username_attr(self):
+        match = re.search(
+            r"\(([\w-]+)=%\(user\)s\)", self.settings.USER_SEARCH.filterstr
+        )
+        return match.group(1) if match else "uid"
+
+    @property
+    def user_attrs(self):
+        return list(set(self.settings.USER_ATTR_MAP.values())) + [self.username_attr]
+
+    def _search_users(self, conn, filters, entries):
+        user_search = self.settings.USER_SEARCH
+        username_attr = self.username_attr
+        for chunk in _chunks(filters, FILTER_CHUNK):
+            filterstr = "(|%s)" % "".join(chunk)
+            for dn, entry in self.paged_search(
+                conn, user_search.base_dn, user_search.scope, filterstr, self.user_attrs
+            ):
+                values = entry.get(username_attr)
+                if values:
+                    entries[values[0].decode("utf-8").lower()] = (dn, entry)
+
+    def search_entries(self, conn, usernames):
+        """
+        Return ``{username: (dn, entry)}`` for the members of the sync's groups, or
+        for ``usernames`` when the sync has no groups.
+        """
+        entries = {}
+        if self.groups is None:
+            self._search_users(
+                conn,
+                [
+                    "(%s=%s)" % (self.username_attr, escape_filter_chars(username))
+                    for username in sorted(usernames)
+                ],
+                entries,
+            )
+        else:
+            group_search = self.settings.GROUP_SEARCH
+            group_dns = []
+            names = sorted(self.groups.values_list("name", flat=True))
+            for chunk in _chunks(names, FILTER_CHUNK):
+                filterstr = "(&%s(|%s))" % (
+                    group_search.filterstr,
+                    "".join("(cn=%s)" % escape_filter_chars(name) for name in chunk),
+                )
+                group_dns += [
+                    dn
+                    for dn, entry in self.paged_search(
+                        conn,
+                        group_search.base_dn,
+                        group_search.scope,
+                        filterstr,
+                        ["cn"],
+                    )
+                ]
+            self._search_users(
+                conn,
+                ["(memberOf=%s)" % escape_filter_chars(dn) for dn in group_dns],
+                entries,
+            )
+
+        self.report.incr("ldap entries", len(entries))
+        return entries
+
+    @staticmethod
+    def _first(entry, attr):
+        values = entry.get(attr)
+        return values[0].decode("utf-8") if values else ""
+
+    def search_group_names(self, conn, dns):
+        """
+        Return ``{dn: group names}`` for the user ``dns`` (keyed by
+        ``_dn_key``), from one paged search of each ``GROUP_SEARCH`` base
+        for its groups and their members.  Returns None when ``GROUP_TYPE``
+        does not list members by DN (nested or posix groups, say), as their
+        names cannot be resolved in bulk.
+        """
+        group_type = self.settings.GROUP_TYPE
+        group_search = self.settings.GROUP_SEARCH
+        if group_search is None or not isinstance(group_type, MemberDNGroupType):
+            return None
+
+        member_attr = group_type.member_attr
+        name_attr = group_type.name_attr
+        wanted = set(_dn_key(dn) for dn in dns)
+        names = defaultdict(set)
+        for search in getattr(group_search, "searches", [group_search]):
+            for dn, entry in self.paged_search(
+                conn,
+                search.base_dn,
+                search.scope,
+                search.filterstr,
+                [member_attr, name_attr],
+            ):
+                name = self._first(entry, name_attr)
+                if not name:
+                    continue
+                for member in entry.get(member_attr, []):
+                    member = _dn_key(member.decode("utf-8"))
+                    if member in wanted:
+                        names[member].add(name)
+        return names
+
+    def _populate(self, username):
+        try:
+            return username, self.backend.populate_user(username=username), None
+        except Exception as e:
+            return username, None, e
+        finally:
+            # Each worker thread has its own database connection.
+            db_connection.close()
+
+    def run(self):
+        source = AuthSource.objects.get(name="LDAP")
+        users = {user.username.lower(): user for user in self.users}
+        self.report.incr("users", len(users))
+
+        conn = self.connect()
+        try:
+            entries = self.search_entries(conn, list(users))
+            group_names = self.search_group_names(
+                conn, [dn for dn, entry in entries.values()]
+            )
+        finally:
+            conn.unbind_s()
+
+        attr_map = self.settings.USER_ATTR_MAP
+        changed = []
+        user_groups = {}
+        missing = []
+        for key, user in users.items():
+            if key not in entries:
+                missing.append(user.username)
+                continue
+            dn, entry = entries[key]
+            if group_names is None:
+                # populate_user mirrors the groups through the group type.
+                missing.append(user.username)
+                continue
+            user_changed = False
+            for field, attr in attr_map.items():
+                value = self._first(entry, attr)
+                if getattr(user, field) != value:
+                    setattr(user, field, value)
+                    user_changed = True
+            if user_changed:
+                changed.append(user)
+            user_groups[user.pk] = group_names.get(_dn_key(dn), set())
+
+        with transaction.atomic():
+            if changed:
+                User.objects.bulk_update(changed, list(attr_map))
+                # bulk_update sends no signals, so refresh their search
+                # documents and the typeahead index here.
+                queue_search_refresh("user", [user.pk for user in changed])
+                typeahead_index(User).invalidate()
+            self.report.incr("users updated", len(changed))
+            for name, count in mirror_ldap_groups(user_groups, source).items():
+                self.report.incr(name, count)
+
+        if missing:
+            self.report.incr("users looked up individually", len(missing))
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for username, user, error in pool.map(self._populate, missing):
+                    if error is not None:
+                        self.report.failures.append((username, error))
+                    elif user is None:
+                        self.report.incr("users not in LDAP")
+
+        return self.report
+
+
+def relevant_ldap_groups():
+    """LDAP groups that hold any global or object permission."""
+    source = AuthSource.objects.get(name="LDAP")
+    return Group.objects.filter(
+        Q(permissions__isnull=False) | Q(groupobjectpermission__isnull=False),
+        source__source=source,
+    ).distinct()
@@ -0,0 +1,161 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+
+from guardian.models import UserObjectPermission, GroupObjectPermission
+
+from openipam.conf.ipam_settings import CONFIG
+
+import uuid
+
+
+# Stands in for the object set when the user holds the permission globally.
+# Closures round-trip through the cache's pickling, so test it with is_all(),
+# never with ``is``.
+ALL = "__all__"
+
+# closure name -> (app_label, model, codenames granting it)
+CLOSURE_PERMS = {
+    "hosts": ("hosts", "host", ("is_owner_host", "change_host")),
+    "domains": ("dns", "domain", ("is_owner_domain", "change_domain")),
+    "dns_domains": (
+        "dns",
+        "domain",
+        ("is_owner_domain", "add_records_to_domain", "change_domain"),
+    ),
+    "networks": ("network", "network", ("is_owner_network", "change_network")),
+    "dns_networks": (
+        "network",
+        "network",
+        ("is_owner_network", "add_records_to_network", "change_network"),
+    ),
+    "pools": ("network", "pool", ("add_records_to_pool", "change_pool")),
+}
+
+GENERATION_KEY = "ipam_perm_closure_generation"
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _closure_key(kind, pk, generation=None):
+    return "ipam_perm_closure:%s:%s:%s" % (generation or _generation(), kind, pk)
+
+
+def _owner_key(user_or_group):
+    if isinstance(user_or_group, Group):
+        return _closure_key("group", user_or_group.pk)
+    return _closure_key("user", user_or_group.pk)
+
+
+def _build_closure(user_or_group):
+    from openipam.dns.models import Domain
+
+    content_types = {
+        (app_label, model): ContentType.objects.get_by_natural_key(app_label, model)
+        for app_label, model, codenames in CLOSURE_PERMS.values()
+    }
+    ct_filter = Q(content_type__in=list(content_types.values()))
+    columns = ("content_type_id", "permission__codename", "object_pk")
+
+    if isinstance(user_or_group, Group):
+        is_user = False
+        rows = list(
+            GroupObjectPermission.objects.filter(
+                ct_filter, group=user_or_group
+            ).values_list(*columns)
+        )
+    else:
+        is_user = True
+        rows = list(
+            UserObjectPermission.objects.filter(
+                ct_filter, user=user_or_group
+            ).values_list(*columns)
+        )
+        rows += list(
+            GroupObjectPermission.objects.filter(
+                ct_filter, group__user=user_or_group
+            ).values_list(*columns)
+        )
+
+    closure = {}
+    for name, (app_label, model, codenames) in CLOSURE_PERMS.items():
+        # Same shortcut get_objects_for_user takes for global permissions.
+        if is_user and any(
+            user_or_group.has_perm("%s.%s" % (app_label, codename))
+            for codename in codenames
+        ):
+            closure[name] = ALL
+            continue
+        ct_id = content_types[(app_label, model)].pk
+        closure[name] = frozenset(
+            object_pk
+            for row_ct_id, codename, object_pk in rows
+            if row_ct_id == ct_id and codename in codenames
+        )
+
+    if is_all(closure["domains"]):
+        closure["domain_names"] = ALL
+    else:
+        closure["domain_names"] = frozenset(
+            Domain.objects.filter(pk__in=closure["domains"]).values_list(
+                "name", flat=True
+            )
+        )
+
+    return closure
+
+
+def get_permission_closure(user_or_group):
+    """
+    Return the objects a user (directly or through groups) or a group can change.
+
+    The result maps each name in ``CLOSURE_PERMS`` (plus ``domain_names``) to a
+    frozenset of primary keys as strings, or to ``ALL`` when the permission is
+    held globally.  It is cached until a permission signal invalidates it.
+    """
+    key = _owner_key(user_or_group)
+    closure = cache.get(key)
+    if closure is None:
+        closure = _build_closure(user_or_group)
+        cache.set(key, closure, CONFIG.get("PERMISSION_CLOSURE_TIMEOUT"))
+    return closure
+
+
+def is_all(objects):
+    """Whether a closure entry is ``ALL`` rather than a set of primary keys."""
+    return isinstance(objects, str) and objects == ALL
+
+
+def closure_q(closure, name, lookup):
+    """Build ``Q(lookup__in=...)`` from a closure set; ``ALL`` matches every row."""
+    objects = closure[name]
+    if is_all(objects):
+        return Q(pk__isnull=False)
+    return Q(**{"%s__in" % lookup: list(objects)})
+
+
+def invalidate_user_closures(user_ids):
+    generation = _generation()
+    cache.delete_many([_closure_key("user", pk, generation) for pk in user_ids])
+
+
+def invalidate_all_closures():
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_group_closure(group):
+    User = get_user_model()
+
+    generation = _generation()
+    user_ids = User.objects.filter(groups=group).values_list("pk", flat=True)
+    keys = [_closure_key("user", pk, generation) for pk in user_ids]
+    keys.append(_closure_key("group", group.pk, generation))
+    cache.delete_many(keys)
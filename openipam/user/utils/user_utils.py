@@ -1,13 +1,13 @@
 from django.contrib.auth.models import Group as AuthGroup, Permission
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from django.utils import timezone
 from django.conf import settings
 
 from guardian.models import UserObjectPermission
 
 from openipam.core.backends import IPAMLDAPBackend
 from openipam.user.models import AuthSource
+from openipam.user.utils.ldap_sync import LDAPUserSync, relevant_ldap_groups
 
 import gc
 import ldap
@@ -62,14 +62,10 @@ def fix_ldap_groups(test=False):
 
 
 def sync_active_users():
-    source = AuthSource.objects.get(name="LDAP")
-
-    groups = AuthGroup.objects.filter(
-        Q(permissions__isnull=False) | Q(groupobjectpermission__isnull=False),
-        source__source=source,
-    ).distinct()
-
-    populate_user_from_ldap(groups=groups, force=True)
+    """Sync the members of the LDAP groups that hold permissions."""
+    groups = relevant_ldap_groups()
+    users = User.objects.filter(groups__in=groups).distinct()
+    return LDAPUserSync(users, groups=groups).run()
 
 
 def populate_user_from_ldap(username=None, user=None, groups=[], force=False):
@@ -80,16 +76,14 @@ def populate_user_from_ldap(username=None, user=None, groups=[], force=False):
     elif user:
         return ldap_backend.populate_user(username=user.username)
     elif groups:
-        users = User.objects.filter(groups__in=groups)
+        users = User.objects.filter(groups__in=groups).distinct()
     else:
         users = User.objects.all()
 
-    for user in queryset_iterator(users):
-        if not user.first_name or not user.last_name or not user.email or force is True:
-            print(timezone.now(), "Updating user: %s" % user.username)
-            ldap_backend.populate_user(username=user.username)
-        else:
-            print(timezone.now(), "NOT Updating user: %s" % user.username)
+    if force is not True:
+        users = users.filter(Q(first_name="") | Q(last_name="") | Q(email=""))
+
+    return LDAPUserSync(users).run()
 
 
 def queryset_iterator(queryset, chunksize=1000):